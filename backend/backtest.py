@@ -0,0 +1,224 @@
+# ===== backend/backtest.py - REJEU HORS LIGNE DES RECOMMANDATIONS =====
+"""
+Rejoue SetHistory utilisateur par utilisateur, dans l'ordre chronologique, en
+demandant au moteur une recommandation pour chaque série avec les seules séries
+antérieures. Mesure l'écart prédiction / réalité (charge, reps) et la latence de
+chaque appel.
+
+- Les utilisateurs sont répartis par paquets sur un pool de processus ; chaque
+  paquet renvoie des agrégats (sommes, histogramme de latence), jamais les séries.
+- Le pipeline est appelé sur l'historique rejoué en mémoire (_recommend_from_history) :
+  aucune requête ne peut voir le futur. Le modèle de performance est rejoué de même.
+- Les dates de l'historique sont décalées pour que « maintenant » soit la date de la
+  série rejouée (la baseline retient les 14 derniers jours).
+- Les charges de départ par cohorte ne sont pas chargées : elles agrègent aussi des
+  séries postérieures. Le démarrage à froid utilise donc les estimations par défaut.
+
+Usage :
+    python -m backend.backtest --workers 8 [--users-per-task 50] [--limit-users N] [--json]
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional
+import argparse
+import json
+import logging
+import math
+import os
+import time
+
+from sqlalchemy import select
+
+from backend.database import SessionLocal, engine
+from backend.ml_recommendations import FitnessRecommendationEngine, history_cache_row
+from backend.metrics import LatencyHistogram
+from backend.models import Exercise, SetHistory, User
+from backend.performance_model import RLSModel, history_features
+from backend.weight_engine import get_weight_ladder
+
+logger = logging.getLogger(__name__)
+
+# Effort supposé quand la série rejouée est la première de la séance
+DEFAULT_EFFORT = 3
+
+
+class BacktestStats:
+    """Erreurs cumulées (prédiction - réalité) et latences, fusionnables entre processus"""
+
+    def __init__(self):
+        self.users = 0
+        self.sets = 0
+        self.weight_abs = 0.0
+        self.weight_sq = 0.0
+        self.weight_bias = 0.0
+        self.reps_abs = 0.0
+        self.reps_sq = 0.0
+        self.reps_bias = 0.0
+        self.reps_exact = 0
+        self.latency = LatencyHistogram()
+
+    def add(self, predicted_weight: float, actual_weight: float, predicted_reps: int, actual_reps: int, ms: float):
+        weight_error = predicted_weight - actual_weight
+        reps_error = predicted_reps - actual_reps
+        self.sets += 1
+        self.weight_abs += abs(weight_error)
+        self.weight_sq += weight_error ** 2
+        self.weight_bias += weight_error
+        self.reps_abs += abs(reps_error)
+        self.reps_sq += reps_error ** 2
+        self.reps_bias += reps_error
+        self.reps_exact += reps_error == 0
+        self.latency.observe(ms)
+
+    def merge(self, other: "BacktestStats"):
+        for name in ("users", "sets", "weight_abs", "weight_sq", "weight_bias",
+                     "reps_abs", "reps_sq", "reps_bias", "reps_exact"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.latency.merge(other.latency)
+
+    def summary(self) -> Dict:
+        n = self.sets or 1
+        latency = self.latency.snapshot()
+        return {
+            "users": self.users,
+            "sets": self.sets,
+            "weight_mae_kg": round(self.weight_abs / n, 3),
+            "weight_rmse_kg": round(math.sqrt(self.weight_sq / n), 3),
+            "weight_bias_kg": round(self.weight_bias / n, 3),
+            "reps_mae": round(self.reps_abs / n, 3),
+            "reps_rmse": round(math.sqrt(self.reps_sq / n), 3),
+            "reps_bias": round(self.reps_bias / n, 3),
+            "reps_exact_rate": round(self.reps_exact / n, 3),
+            "latency_mean_ms": latency["mean_ms"],
+            "latency_p50_ms": latency["p50_ms"],
+            "latency_p95_ms": latency["p95_ms"],
+            "latency_p99_ms": latency["p99_ms"],
+            "latency_max_ms": latency["max_ms"]
+        }
+
+
+def _replay_user(
+    recommender: FitnessRecommendationEngine,
+    user: User,
+    exercises: Dict[int, Exercise],
+    stats: BacktestStats
+):
+    ladder = get_weight_ladder(user)
+    rows = recommender.db.execute(
+        select(SetHistory.__table__).where(SetHistory.user_id == user.id).order_by(
+            SetHistory.date_performed, SetHistory.id
+        )
+    ).mappings().all()
+
+    past: Dict[int, List[Dict]] = {}  # Par exercice, ordre chronologique
+    models: Dict[int, RLSModel] = {}
+    previous = None
+
+    for row in rows:
+        exercise_id = row["exercise_id"]
+        exercise = exercises.get(exercise_id)
+        if exercise is None:
+            exercise = exercises[exercise_id] = recommender.db.get(Exercise, exercise_id)
+        history = past.setdefault(exercise_id, [])
+        performed = row["date_performed"]
+
+        # L'effort saisi à la série précédente de la séance est l'entrée du moteur
+        current_effort = DEFAULT_EFFORT
+        if previous is not None and row["set_order_in_session"] > 1 \
+                and previous["date_performed"].date() == performed.date():
+            current_effort = previous["effort_level"]
+
+        similar = recommender._filter_history(
+            reversed(history), row["set_number_in_exercise"], row["exercise_order_in_session"]
+        )
+        offset = datetime.utcnow() - performed
+        similar = [{**h, "date": h["date"] + offset} for h in similar]
+
+        started = time.perf_counter()
+        recommendation = recommender._recommend_from_history(
+            user, exercise, similar, row["set_number_in_exercise"], row["fatigue_level"],
+            current_effort, row["rest_before_seconds"], row["exercise_order_in_session"],
+            row["set_order_in_session"], ladder, model=models.get(exercise_id)
+        )
+        elapsed = (time.perf_counter() - started) * 1000
+
+        stats.add(
+            recommendation["weight_recommendation"], row["weight"],
+            recommendation["reps_recommendation"], row["actual_reps"], elapsed
+        )
+
+        # La série devient de l'historique pour les suivantes
+        history.append(history_cache_row(row))
+        models.setdefault(exercise_id, RLSModel()).update(*history_features(row))
+        previous = row
+
+    stats.users += 1
+
+
+def _init_worker():
+    # Ne pas réutiliser les connexions héritées du processus parent
+    engine.dispose(close=False)
+
+
+def replay_users(user_ids: List[int]) -> BacktestStats:
+    """Rejoue un paquet d'utilisateurs (exécuté dans un processus du pool)"""
+    stats = BacktestStats()
+    exercises: Dict[int, Exercise] = {}
+    db = SessionLocal()
+    try:
+        recommender = FitnessRecommendationEngine(db)
+        for user_id in user_ids:
+            user = db.get(User, user_id)
+            if user is not None:
+                _replay_user(recommender, user, exercises, stats)
+                db.expunge(user)
+    finally:
+        db.close()
+    return stats
+
+
+def run(workers: Optional[int] = None, users_per_task: int = 50, limit_users: Optional[int] = None) -> Dict:
+    query = select(SetHistory.user_id).distinct().order_by(SetHistory.user_id)
+    if limit_users:
+        query = query.limit(limit_users)
+    with engine.connect() as connection:
+        user_ids = connection.execute(query).scalars().all()
+
+    tasks = [user_ids[i:i + users_per_task] for i in range(0, len(user_ids), users_per_task)]
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"📦 {len(user_ids)} utilisateurs en {len(tasks)} paquets sur {workers} processus")
+
+    started = time.perf_counter()
+    total = BacktestStats()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for done, future in enumerate(as_completed(pool.submit(replay_users, task) for task in tasks), 1):
+            total.merge(future.result())
+            logger.info(f"📦 Paquet {done}/{len(tasks)} ({total.sets} séries rejouées)")
+    wall = time.perf_counter() - started
+
+    summary = total.summary()
+    summary["wall_seconds"] = round(wall, 2)
+    summary["sets_per_second"] = round(total.sets / wall, 1) if wall else 0.0
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejeu hors ligne de FitnessRecommendationEngine sur SetHistory")
+    parser.add_argument("--workers", type=int, default=None, help="Processus (défaut : nombre de CPU)")
+    parser.add_argument("--users-per-task", type=int, default=50, help="Utilisateurs par paquet")
+    parser.add_argument("--limit-users", type=int, default=None, help="Ne rejouer que les N premiers utilisateurs")
+    parser.add_argument("--json", action="store_true", help="Résultat en JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    summary = run(args.workers, args.users_per_task, args.limit_users)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        for name, value in summary.items():
+            print(f"{name:>18}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# ===== backend/cohort_priors.py - CHARGES DE DÉPART PAR COHORTE =====
+"""
+Table de charges de départ pour le démarrage à froid : quand un utilisateur n'a
+aucun historique sur un exercice, la première recommandation part de la charge
+médiane avec laquelle des utilisateurs comparables ont commencé cet exercice.
+
+Job hors ligne (à planifier, par exemple chaque nuit) :
+    python -m backend.cohort_priors
+
+- Charge de départ d'un utilisateur = médiane de ses STARTING_SETS premières
+  séries chargées sur l'exercice (SetHistory).
+- Cohorte = (exercice, niveau, tranche de poids de corps, tranche d'âge), avec des
+  niveaux plus grossiers pour les cohortes trop petites : sans l'âge, sans le poids
+  de corps, puis l'exercice seul (niveau "*", tranches -1).
+- Une cohorte n'est retenue qu'à partir de MIN_COHORT_USERS utilisateurs.
+
+La table est chargée en mémoire au démarrage : lookup() est une poignée d'accès dict.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import logging
+
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from backend.models import CohortPrior, SetHistory, User
+
+logger = logging.getLogger(__name__)
+
+STARTING_SETS = 3
+MIN_COHORT_USERS = 5
+BODYWEIGHT_BAND_KG = 10
+AGE_BAND_YEARS = 10
+ANY_LEVEL = "*"
+ANY_BAND = -1
+
+CohortKey = Tuple[int, str, int, int]
+
+
+def bodyweight_band(bodyweight: Optional[float]) -> int:
+    if not bodyweight:
+        return ANY_BAND
+    return int(bodyweight // BODYWEIGHT_BAND_KG) * BODYWEIGHT_BAND_KG
+
+
+def age_band(birth_date: Optional[datetime], today: Optional[datetime] = None) -> int:
+    if birth_date is None:
+        return ANY_BAND
+    today = today or datetime.utcnow()
+    age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+    return (age // AGE_BAND_YEARS) * AGE_BAND_YEARS
+
+
+def cohort_keys(exercise_id: int, experience_level: str, bw_band: int, a_band: int) -> Tuple[CohortKey, ...]:
+    """Clés de la plus fine à la plus grossière (ordre de recherche)"""
+    return (
+        (exercise_id, experience_level, bw_band, a_band),
+        (exercise_id, experience_level, bw_band, ANY_BAND),
+        (exercise_id, experience_level, ANY_BAND, ANY_BAND),
+        (exercise_id, ANY_LEVEL, ANY_BAND, ANY_BAND),
+    )
+
+
+class CohortPriorTable:
+    """Table en mémoire clé de cohorte -> charge médiane (remplacée d'un bloc à chaque chargement)"""
+
+    def __init__(self):
+        self._priors: Dict[CohortKey, float] = {}
+        self.loaded_at: Optional[datetime] = None
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, db: Session):
+        rows = db.execute(select(
+            CohortPrior.exercise_id, CohortPrior.experience_level,
+            CohortPrior.bodyweight_band, CohortPrior.age_band, CohortPrior.median_weight
+        )).all()
+        self._priors = {tuple(row[:4]): row.median_weight for row in rows}
+        self.loaded_at = datetime.utcnow()
+        logger.info(f"✅ {len(self._priors)} charges de départ par cohorte chargées")
+
+    def lookup(self, user: User, exercise_id: int) -> Optional[float]:
+        """Charge de départ de la cohorte la plus fine connue, None si l'exercice n'en a aucune"""
+        priors = self._priors
+        for key in cohort_keys(exercise_id, user.experience_level, bodyweight_band(user.weight), age_band(user.birth_date)):
+            weight = priors.get(key)
+            if weight is not None:
+                self.hits += 1
+                return weight
+        self.misses += 1
+        return None
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._priors),
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+cohort_priors = CohortPriorTable()
+
+
+def _starting_loads(connection: Connection) -> Iterator[Tuple[int, str, int, int, float]]:
+    """(exercice, niveau, tranche poids, tranche âge, charge de départ) de chaque paire utilisateur/exercice"""
+    ranked = select(
+        SetHistory.user_id,
+        SetHistory.exercise_id,
+        SetHistory.weight,
+        func.row_number().over(
+            partition_by=(SetHistory.user_id, SetHistory.exercise_id),
+            order_by=(SetHistory.date_performed, SetHistory.id)
+        ).label("rank")
+    ).where(SetHistory.weight > 0).subquery("ranked")
+
+    query = select(
+        ranked.c.user_id, ranked.c.exercise_id, ranked.c.weight,
+        User.weight.label("bodyweight"), User.experience_level, User.birth_date
+    ).join(User, User.id == ranked.c.user_id).where(
+        ranked.c.rank <= STARTING_SETS
+    ).order_by(ranked.c.user_id, ranked.c.exercise_id)
+
+    today = datetime.utcnow()
+    current, weights, profile = None, [], None
+    result = connection.execution_options(stream_results=True, yield_per=5000).execute(query)
+    for row in result:
+        key = (row.user_id, row.exercise_id)
+        if key != current:
+            if weights:
+                yield (*profile, float(np.median(weights)))
+            current, weights = key, []
+            profile = (
+                row.exercise_id, row.experience_level,
+                bodyweight_band(row.bodyweight), age_band(row.birth_date, today)
+            )
+        weights.append(row.weight)
+    if weights:
+        yield (*profile, float(np.median(weights)))
+
+
+def build_priors(engine: Engine) -> int:
+    """Recalcule toute la table cohort_priors ; retourne le nombre de cohortes retenues"""
+    samples: Dict[CohortKey, List[float]] = defaultdict(list)
+    with engine.connect() as reader:
+        for exercise_id, level, bw_band, a_band, start_weight in _starting_loads(reader):
+            for key in cohort_keys(exercise_id, level, bw_band, a_band):
+                samples[key].append(start_weight)
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            "exercise_id": key[0],
+            "experience_level": key[1],
+            "bodyweight_band": key[2],
+            "age_band": key[3],
+            "median_weight": round(float(np.median(weights)), 2),
+            "users": len(weights),
+            "updated_at": now
+        }
+        for key, weights in samples.items()
+        if len(weights) >= MIN_COHORT_USERS
+    ]
+
+    with engine.begin() as writer:
+        writer.execute(delete(CohortPrior))
+        if rows:
+            writer.execute(CohortPrior.__table__.insert(), rows)
+
+    logger.info(f"✅ {len(rows)} cohortes retenues sur {len(samples)} ({MIN_COHORT_USERS} utilisateurs minimum)")
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Charges de départ par cohorte (démarrage à froid)")
+    parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    from backend.database import engine, Base
+    from backend.migrations import run_migrations
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    build_priors(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 # ===== backend/database.py - VERSION REFACTORISÉE =====
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -11,18 +12,127 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./fitness_coach.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
+# Profil d'exécution : "tuned" (défaut) ou "baseline" (valeurs par défaut de la librairie)
+DB_PROFILE = os.getenv("DB_PROFILE", "tuned")
+
+# Pragmas appliqués à chaque connexion SQLite
+SQLITE_PROFILES = {
+    "baseline": {},
+    "tuned": {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),  # Lecteurs et écrivain en parallèle
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),  # Sûr en WAL, un fsync par checkpoint
+        "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),  # Attendre le verrou au lieu d'échouer
+        "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-20000")),  # Négatif = en KiB (~20 Mo)
+        "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(128 * 1024 * 1024))),
+    },
+}
+
+# Options du pool de connexions PostgreSQL
+POSTGRES_PROFILES = {
+    "baseline": {},
+    "tuned": {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_pre_ping": True,  # Détecter les connexions coupées par Render
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800")),
+    },
+}
+
+
+def get_async_database_url(url: str = DATABASE_URL) -> str:
+    """Convertit l'URL synchrone en URL utilisant un driver asyncio"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql+psycopg2://"):
+        return url.replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+    return url
+
+
+def _apply_sqlite_pragmas(engine, pragmas: dict):
+    """Applique les pragmas du profil à chaque nouvelle connexion SQLite"""
+    if not pragmas:
+        return
+
+    in_memory = engine.url.database in (None, "", ":memory:")
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                # Le WAL n'a pas de sens pour une base en mémoire
+                if in_memory and name in ("journal_mode", "mmap_size"):
+                    continue
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def create_db_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE):
+    """Crée le moteur SQLAlchemy avec le profil d'exécution demandé"""
+    if url.startswith("sqlite"):
+        if profile not in SQLITE_PROFILES:
+            raise ValueError(f"Profil de base de données inconnu: {profile}")
+
+        db_engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False}  # Nécessaire pour SQLite
+        )
+        _apply_sqlite_pragmas(db_engine, SQLITE_PROFILES[profile])
+        return db_engine
+
+    if profile not in POSTGRES_PROFILES:
+        raise ValueError(f"Profil de base de données inconnu: {profile}")
+
+    return create_engine(url, **POSTGRES_PROFILES[profile])
+
+
+def create_async_db_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE):
+    """Crée le moteur asyncio (AsyncEngine) avec le même profil que le moteur synchrone"""
+    async_url = get_async_database_url(url)
+
+    if url.startswith("sqlite"):
+        if profile not in SQLITE_PROFILES:
+            raise ValueError(f"Profil de base de données inconnu: {profile}")
+
+        db_engine = create_async_engine(async_url)
+        # Les événements de connexion sont portés par le moteur synchrone sous-jacent
+        _apply_sqlite_pragmas(db_engine.sync_engine, SQLITE_PROFILES[profile])
+        return db_engine
+
+    if profile not in POSTGRES_PROFILES:
+        raise ValueError(f"Profil de base de données inconnu: {profile}")
+
+    return create_async_engine(async_url, **POSTGRES_PROFILES[profile])
+
+
+def dialect_insert(bind, table):
+    """
+    insert() du dialecte de `bind` (moteur, connexion ou session), qui expose
+    on_conflict_do_nothing / on_conflict_do_update sur SQLite comme sur PostgreSQL
+    """
+    dialect = bind.get_bind().dialect if hasattr(bind, "get_bind") else bind.dialect
+    if dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
 # Créer le moteur de base de données
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args={"check_same_thread": False}  # Nécessaire pour SQLite
-    )
-else:
-    engine = create_engine(DATABASE_URL)
+engine = create_db_engine(DATABASE_URL, DB_PROFILE)
+
+# Moteur asyncio pour les routes "async def" (ne bloque pas la boucle d'événements)
+async_engine = create_async_db_engine(DATABASE_URL, DB_PROFILE)
 
 # Session locale
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Session asyncio (expire_on_commit=False : les objets restent lisibles après commit)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
 # Base pour les modèles
 Base = declarative_base()
 
@@ -32,4 +142,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency asyncio pour FastAPI
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -4,6 +4,7 @@ import json
 from sqlalchemy.orm import Session
 from .models import User
 from .database import get_db
+from .weight_engine import bar_loads, solve_min_plates_batch
 
 class EquipmentService:
     
@@ -13,9 +14,12 @@ class EquipmentService:
         user = db.query(User).filter(User.id == user_id).first()
         if not user or not user.equipment_config:
             return []
-            
-        config = user.equipment_config
         
+        return EquipmentService.available_weights_for_config(user.equipment_config, exercise_type)
+    
+    @staticmethod
+    def available_weights_for_config(config: dict, exercise_type: str) -> List[float]:
+        """Poids réalisables à partir d'une configuration déjà chargée (sans accès base)"""
         if exercise_type == 'dumbbells':
             return EquipmentService._calculate_dumbbell_weights(config)
         elif exercise_type == 'barbell':
@@ -39,13 +43,11 @@ class EquipmentService:
             config.get('barres', {}).get('courte', {}).get('count', 0) >= 2):
             
             base_weight = 2.5 * 2  # Paire de barres courtes
-            plate_combinations = EquipmentService._get_plate_combinations(
+            weights.update(bar_loads(
+                base_weight,
                 config.get('disques', {}).get('weights', {}), 
-                max_per_side=50  # Limite raisonnable
-            )
-            
-            for plate_weight in plate_combinations:
-                weights.add(base_weight + plate_weight)
+                max_load_per_side=50  # Limite raisonnable
+            ).tolist())
         
         return sorted(list(weights))
     
@@ -55,129 +57,105 @@ class EquipmentService:
         weights.add(bar_weight)  # Barre seule
         
         if config.get('disques', {}).get('weights'):
-            plate_combinations = EquipmentService._get_plate_combinations(
+            weights.update(bar_loads(
+                bar_weight,
                 config['disques']['weights'], 
-                max_per_side=200  # Limite raisonnable
-            )
-            
-            for plate_weight in plate_combinations:
-                weights.add(bar_weight + plate_weight)
+                max_load_per_side=200  # Limite raisonnable
+            ).tolist())
         
         return sorted(list(weights))
     
-    @staticmethod
-    def _get_plate_combinations(available_plates: dict, max_per_side: float) -> List[float]:
-        """Générer toutes les combinaisons possibles de disques"""
-        combinations = set([0])  # Commencer avec 0 (barre seule)
-        
-        for weight_str, count in available_plates.items():
-            weight = float(weight_str)
-            if count < 2:  # Il faut au moins 2 disques (un par côté)
-                continue
-                
-            max_pairs = count // 2
-            new_combinations = set()
-            
-            for existing_weight in combinations:
-                for pairs in range(1, max_pairs + 1):
-                    total_plate_weight = existing_weight + (weight * pairs * 2)
-                    if total_plate_weight <= max_per_side * 2:
-                        new_combinations.add(total_plate_weight)
-            
-            combinations.update(new_combinations)
-        
-        return sorted(list(combinations))
-    
     @staticmethod
     def get_equipment_visualization(db: Session, user_id: int, exercise_type: str, target_weight: float) -> dict:
         """Retourner la visualisation exacte pour un poids donné"""
+        setups = EquipmentService.get_equipment_visualizations(db, user_id, exercise_type, [target_weight])
+        return setups[0] if setups else {}
+    
+    @staticmethod
+    def get_equipment_visualizations(db: Session, user_id: int, exercise_type: str, target_weights: List[float]) -> List[dict]:
+        """Visualisations de toutes les charges d'une séance, résolues en un seul appel"""
         user = db.query(User).filter(User.id == user_id).first()
         if not user or not user.equipment_config:
-            return {}
-            
-        config = user.equipment_config
+            return [{} for _ in target_weights]
         
+        return EquipmentService.visualizations_for_config(user.equipment_config, exercise_type, target_weights)
+    
+    @staticmethod
+    def visualizations_for_config(config: dict, exercise_type: str, target_weights: List[float]) -> List[dict]:
+        """Visualisations à partir d'une configuration déjà chargée (sans accès base)"""
         if exercise_type == 'dumbbells':
-            return EquipmentService._get_dumbbell_setup(config, target_weight)
+            return EquipmentService._get_dumbbell_setups(config, target_weights)
         elif exercise_type in ['barbell', 'ez_curl']:
             bar_weight = 20 if exercise_type == 'barbell' else 10
-            return EquipmentService._get_barbell_setup(config, target_weight, bar_weight)
+            return EquipmentService._get_barbell_setups(config, target_weights, bar_weight)
         
-        return {}
+        return [{} for _ in target_weights]
     
     @staticmethod
-    def _get_dumbbell_setup(config: dict, target_weight: float) -> dict:
-        # Vérifier d'abord les dumbbells fixes
-        if config.get('dumbbells', {}).get('weights'):
-            for weight in config['dumbbells']['weights']:
-                if abs(weight * 2 - target_weight) < 0.1:
-                    return {
-                        'type': 'fixed_dumbbells',
-                        'weight_each': weight,
-                        'total_weight': target_weight
-                    }
-        
-        # Sinon, barres courtes + disques
+    def _get_dumbbell_setups(config: dict, target_weights: List[float]) -> List[dict]:
+        fixed_weights = config.get('dumbbells', {}).get('weights') or []
         base_weight = 2.5 * 2
-        plate_weight_needed = target_weight - base_weight
         
-        if plate_weight_needed >= 0:
-            plate_distribution = EquipmentService._calculate_optimal_plates(
-                config.get('disques', {}).get('weights', {}), 
-                plate_weight_needed / 2  # Par haltère
-            )
-            
-            return {
-                'type': 'short_barbells',
-                'bar_weight_each': 2.5,
-                'plates_per_dumbbell': plate_distribution,
-                'total_weight': target_weight
-            }
-        
-        return {}
+        # Charges non couvertes par les haltères fixes : barres courtes + disques, résolues en lot
+        plate_targets = [
+            t for t in target_weights
+            if t >= base_weight and not any(abs(w * 2 - t) < 0.1 for w in fixed_weights)
+        ]
+        solutions = dict(zip(plate_targets, solve_min_plates_batch(
+            config.get('disques', {}).get('weights', {}),
+            base_weight,
+            plate_targets
+        )))
+        
+        setups = []
+        for target_weight in target_weights:
+            # Vérifier d'abord les dumbbells fixes
+            fixed = next((w for w in fixed_weights if abs(w * 2 - target_weight) < 0.1), None)
+            if fixed is not None:
+                setups.append({
+                    'type': 'fixed_dumbbells',
+                    'weight_each': fixed,
+                    'total_weight': target_weight
+                })
+            elif target_weight in solutions:
+                # Sinon, barres courtes + disques (le moins de disques possible par haltère)
+                solution = solutions[target_weight]
+                setups.append({
+                    'type': 'short_barbells',
+                    'bar_weight_each': 2.5,
+                    'plates_per_dumbbell': solution.as_dicts(),
+                    'total_weight': target_weight,
+                    'achieved_weight': solution.total_weight,
+                    'exact': solution.exact
+                })
+            else:
+                setups.append({})
+        
+        return setups
     
     @staticmethod
-    def _get_barbell_setup(config: dict, target_weight: float, bar_weight: float) -> dict:
-        plate_weight_needed = target_weight - bar_weight
-        
-        if plate_weight_needed >= 0:
-            plate_distribution = EquipmentService._calculate_optimal_plates(
-                config.get('disques', {}).get('weights', {}), 
-                plate_weight_needed / 2  # Par côté
-            )
+    def _get_barbell_setups(config: dict, target_weights: List[float], bar_weight: float) -> List[dict]:
+        plate_targets = [t for t in target_weights if t >= bar_weight]
+        solutions = dict(zip(plate_targets, solve_min_plates_batch(
+            config.get('disques', {}).get('weights', {}),
+            bar_weight,
+            plate_targets
+        )))
+        
+        setups = []
+        for target_weight in target_weights:
+            solution = solutions.get(target_weight)
+            if solution is None:
+                setups.append({})
+                continue
             
-            return {
+            setups.append({
                 'type': 'barbell',
                 'bar_weight': bar_weight,
-                'plates_per_side': plate_distribution,
-                'total_weight': target_weight
-            }
-        
-        return {}
-    
-    @staticmethod
-    def _calculate_optimal_plates(available_plates: dict, target_per_side: float) -> List[dict]:
-        """Algorithme glouton pour distribuer les disques de façon optimale"""
-        result = []
-        remaining = target_per_side
-        
-        # Trier par poids décroissant
-        sorted_plates = sorted(
-            [(float(w), count) for w, count in available_plates.items()],
-            key=lambda x: x[0],
-            reverse=True
-        )
-        
-        for weight, available_count in sorted_plates:
-            max_usable = available_count // 2  # Paires seulement
-            while remaining >= weight and max_usable > 0:
-                existing = next((p for p in result if p['weight'] == weight), None)
-                if existing:
-                    existing['count'] += 1
-                else:
-                    result.append({'weight': weight, 'count': 1})
-                
-                remaining -= weight
-                max_usable -= 1
+                'plates_per_side': solution.as_dicts(),
+                'total_weight': target_weight,
+                'achieved_weight': solution.total_weight,
+                'exact': solution.exact
+            })
         
-        return result
\ No newline at end of file
+        return setups
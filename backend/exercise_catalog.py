@@ -0,0 +1,205 @@
+# ===== backend/exercise_catalog.py - CATALOGUE D'EXERCICES EN MÉMOIRE =====
+"""
+Catalogue immuable des exercices, chargé une fois au démarrage depuis la table Exercise.
+
+La table est une donnée de référence statique : plutôt que de la requêter à chaque
+appel, le processus garde un instantané figé avec des index précalculés (tuples).
+Un rechargement construit un nouveau catalogue puis remplace la référence globale
+en une seule affectation : les lecteurs voient l'ancien ou le nouveau, jamais un mélange.
+
+Les index par groupe musculaire et par équipement sont construits à partir des tables
+d'association exercise_muscle_groups / exercise_equipment, que le chargeur maintient
+synchronisées avec les colonnes JSON d'Exercise.
+"""
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+import threading
+import logging
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.models import Exercise, ExerciseMuscleGroup, ExerciseEquipment
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CatalogExercise:
+    """Copie figée d'une ligne Exercise, détachée de toute session"""
+    id: int
+    name: str
+    muscle_groups: Tuple[str, ...]
+    equipment_required: Tuple[str, ...]
+    difficulty: str
+    default_sets: int
+    default_reps_min: int
+    default_reps_max: int
+    base_rest_time_seconds: int
+    instructions: Optional[str]
+    exercise_type: Optional[str]
+    intensity_factor: float
+
+    @property
+    def rest_time_seconds(self) -> int:
+        """Alias attendu par ExerciseResponse et les programmes"""
+        return self.base_rest_time_seconds
+
+    @classmethod
+    def from_model(cls, exercise: Exercise) -> "CatalogExercise":
+        return cls(
+            id=exercise.id,
+            name=exercise.name,
+            muscle_groups=tuple(exercise.muscle_groups or ()),
+            equipment_required=tuple(exercise.equipment_required or ()),
+            difficulty=exercise.difficulty,
+            default_sets=exercise.default_sets if exercise.default_sets is not None else 3,
+            default_reps_min=exercise.default_reps_min if exercise.default_reps_min is not None else 8,
+            default_reps_max=exercise.default_reps_max if exercise.default_reps_max is not None else 12,
+            base_rest_time_seconds=exercise.base_rest_time_seconds if exercise.base_rest_time_seconds is not None else 60,
+            instructions=exercise.instructions,
+            exercise_type=exercise.exercise_type,
+            intensity_factor=exercise.intensity_factor if exercise.intensity_factor is not None else 1.0,
+        )
+
+
+def _group_by(exercises: Tuple[CatalogExercise, ...], keys_of) -> Mapping[str, Tuple[CatalogExercise, ...]]:
+    """Construit un index clé -> tuple d'exercices (ordre du catalogue conservé)"""
+    groups: Dict[str, List[CatalogExercise]] = {}
+    for exercise in exercises:
+        for key in keys_of(exercise):
+            if key is not None:
+                groups.setdefault(key, []).append(exercise)
+    return MappingProxyType({key: tuple(values) for key, values in groups.items()})
+
+
+def _group_links(
+    by_id: Mapping[int, CatalogExercise],
+    links: Iterable[Tuple[int, str]]
+) -> Mapping[str, Tuple[CatalogExercise, ...]]:
+    """Construit un index clé -> tuple d'exercices depuis des lignes (exercise_id, clé)"""
+    groups: Dict[str, List[CatalogExercise]] = {}
+    for exercise_id, key in links:
+        exercise = by_id.get(exercise_id)
+        if exercise is not None:
+            groups.setdefault(key, []).append(exercise)
+    return MappingProxyType({
+        key: tuple(sorted(values, key=lambda e: e.id)) for key, values in groups.items()
+    })
+
+
+class ExerciseCatalog:
+    """Instantané immuable des exercices avec index précalculés"""
+
+    __slots__ = ("exercises", "by_id", "by_muscle_group", "by_equipment", "by_difficulty", "by_type")
+
+    def __init__(
+        self,
+        exercises: Iterable[CatalogExercise],
+        muscle_links: Optional[Iterable[Tuple[int, str]]] = None,
+        equipment_links: Optional[Iterable[Tuple[int, str]]] = None
+    ):
+        self.exercises: Tuple[CatalogExercise, ...] = tuple(sorted(exercises, key=lambda e: e.id))
+        self.by_id: Mapping[int, CatalogExercise] = MappingProxyType({e.id: e for e in self.exercises})
+
+        # Relations normalisées si fournies, sinon dérivées des champs de l'exercice
+        if muscle_links is not None:
+            self.by_muscle_group = _group_links(self.by_id, muscle_links)
+        else:
+            self.by_muscle_group = _group_by(self.exercises, lambda e: e.muscle_groups)
+
+        if equipment_links is not None:
+            self.by_equipment = _group_links(self.by_id, equipment_links)
+        else:
+            self.by_equipment = _group_by(self.exercises, lambda e: e.equipment_required)
+        self.by_difficulty = _group_by(self.exercises, lambda e: (e.difficulty,))
+        self.by_type = _group_by(self.exercises, lambda e: (e.exercise_type,))
+
+    def __len__(self) -> int:
+        return len(self.exercises)
+
+    def get(self, exercise_id: int) -> Optional[CatalogExercise]:
+        return self.by_id.get(exercise_id)
+
+    def for_muscle_group(self, muscle_group: str) -> Tuple[CatalogExercise, ...]:
+        return self.by_muscle_group.get(muscle_group, ())
+
+
+_catalog = ExerciseCatalog(())
+_reload_lock = threading.Lock()
+
+
+def get_catalog() -> ExerciseCatalog:
+    """Catalogue courant (lecture sans verrou : la référence est remplacée atomiquement)"""
+    return _catalog
+
+
+def sync_exercise_relations(db: Session) -> int:
+    """
+    Aligne exercise_muscle_groups / exercise_equipment sur les colonnes JSON d'Exercise.
+    Ne touche que les lignes qui diffèrent ; retourne le nombre de lignes modifiées.
+    """
+    exercises = db.query(Exercise.id, Exercise.muscle_groups, Exercise.equipment_required).all()
+
+    wanted_muscles = {(e.id, mg) for e in exercises for mg in (e.muscle_groups or [])}
+    wanted_equipment = {(e.id, eq) for e in exercises for eq in (e.equipment_required or [])}
+
+    existing_muscles = set(db.query(ExerciseMuscleGroup.exercise_id, ExerciseMuscleGroup.muscle_group).all())
+    existing_equipment = set(db.query(ExerciseEquipment.exercise_id, ExerciseEquipment.equipment).all())
+
+    changes = 0
+    for exercise_id, muscle_group in existing_muscles - wanted_muscles:
+        db.query(ExerciseMuscleGroup).filter(
+            ExerciseMuscleGroup.exercise_id == exercise_id,
+            ExerciseMuscleGroup.muscle_group == muscle_group
+        ).delete(synchronize_session=False)
+        changes += 1
+    for exercise_id, equipment in existing_equipment - wanted_equipment:
+        db.query(ExerciseEquipment).filter(
+            ExerciseEquipment.exercise_id == exercise_id,
+            ExerciseEquipment.equipment == equipment
+        ).delete(synchronize_session=False)
+        changes += 1
+
+    missing_muscles = wanted_muscles - existing_muscles
+    missing_equipment = wanted_equipment - existing_equipment
+    db.add_all(ExerciseMuscleGroup(exercise_id=i, muscle_group=mg) for i, mg in missing_muscles)
+    db.add_all(ExerciseEquipment(exercise_id=i, equipment=eq) for i, eq in missing_equipment)
+    changes += len(missing_muscles) + len(missing_equipment)
+
+    if not changes:
+        return 0
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # Un autre worker a synchronisé les mêmes lignes en parallèle
+        db.rollback()
+        return 0
+
+    logger.info(f"✅ Relations exercices synchronisées: {changes} lignes modifiées")
+    return changes
+
+
+def reload_catalog(db: Session) -> ExerciseCatalog:
+    """Synchronise les relations, recharge le catalogue et le publie atomiquement"""
+    global _catalog
+
+    # Le verrou sérialise uniquement les rechargements concurrents
+    with _reload_lock:
+        sync_exercise_relations(db)
+
+        # Groupes musculaires et équipements lus via les tables d'association indexées
+        muscle_links = db.query(ExerciseMuscleGroup.exercise_id, ExerciseMuscleGroup.muscle_group).all()
+        equipment_links = db.query(ExerciseEquipment.exercise_id, ExerciseEquipment.equipment).all()
+
+        catalog = ExerciseCatalog(
+            (CatalogExercise.from_model(e) for e in db.query(Exercise).all()),
+            muscle_links=muscle_links,
+            equipment_links=equipment_links
+        )
+        _catalog = catalog
+
+    logger.info(f"✅ Catalogue d'exercices chargé: {len(catalog)} exercices")
+    return catalog
@@ -0,0 +1,95 @@
+# ===== backend/history_export.py - EXPORT DE L'HISTORIQUE D'ENTRAÎNEMENT =====
+"""
+Export de tout l'historique d'un utilisateur : une ligne par série, jointe à sa
+séance et au nom de l'exercice, en CSV ou NDJSON.
+
+La requête est lue par paquets (yield_per, curseur serveur sur PostgreSQL) et
+chaque paquet est encodé puis envoyé avant de lire le suivant : la mémoire reste
+constante quelle que soit la taille de l'historique, aucun objet ORM n'est créé.
+"""
+from datetime import datetime
+from typing import Any, Callable, Iterator, Literal
+import csv
+import io
+import json
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.database import SessionLocal
+from backend.models import Exercise, Workout, WorkoutSet
+
+ExportFormat = Literal["csv", "ndjson"]
+
+# Séries lues (et encodées) par paquet
+EXPORT_CHUNK_ROWS = 1000
+
+EXPORT_COLUMNS = (
+    Workout.id.label("workout_id"),
+    Workout.type.label("workout_type"),
+    Workout.status.label("workout_status"),
+    Workout.started_at.label("workout_started_at"),
+    Workout.completed_at.label("workout_completed_at"),
+    WorkoutSet.id.label("set_id"),
+    WorkoutSet.exercise_id,
+    Exercise.name.label("exercise_name"),
+    WorkoutSet.set_number,
+    WorkoutSet.reps,
+    WorkoutSet.weight,
+    WorkoutSet.duration_seconds,
+    WorkoutSet.rest_time_seconds,
+    WorkoutSet.target_reps,
+    WorkoutSet.target_weight,
+    WorkoutSet.fatigue_level,
+    WorkoutSet.effort_level,
+    WorkoutSet.completed_at.label("set_completed_at"),
+)
+EXPORT_FIELDS = tuple(column.key for column in EXPORT_COLUMNS)
+
+# Starlette ajoute "; charset=utf-8" aux types text/*
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def export_query(user_id: int):
+    """Séries de l'utilisateur dans l'ordre chronologique des séances"""
+    return select(*EXPORT_COLUMNS).join(
+        WorkoutSet, WorkoutSet.workout_id == Workout.id
+    ).outerjoin(
+        Exercise, Exercise.id == WorkoutSet.exercise_id
+    ).where(
+        Workout.user_id == user_id
+    ).order_by(Workout.started_at, Workout.id, WorkoutSet.id)
+
+
+def _value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def stream_export(
+    user_id: int,
+    format: ExportFormat,
+    session_factory: Callable[[], Session] = SessionLocal,
+    chunk_rows: int = EXPORT_CHUNK_ROWS
+) -> Iterator[bytes]:
+    """Octets de l'export, un morceau par paquet de séries (session propre au générateur)"""
+    with session_factory() as db:
+        connection = db.connection(execution_options={"stream_results": True, "yield_per": chunk_rows})
+        result = connection.execute(export_query(user_id))
+
+        if format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_FIELDS)
+            for partition in result.partitions():
+                writer.writerows([_value(v) for v in row] for row in partition)
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+            # En-tête seul si aucune série
+            if buffer.tell():
+                yield buffer.getvalue().encode("utf-8")
+        else:
+            for partition in result.partitions():
+                yield "".join(
+                    json.dumps(dict(zip(EXPORT_FIELDS, map(_value, row))), ensure_ascii=False) + "\n" for row in partition
+                ).encode("utf-8")
@@ -1,20 +1,42 @@
 # ===== backend/main.py - VERSION REFACTORISÉE =====
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+from typing import List, Optional, Dict, Any, Iterator, Literal
+from datetime import date, datetime, timedelta
 from contextlib import asynccontextmanager
 import json
 import os
 import logging
 
 from backend.database import engine, get_db, SessionLocal
-from backend.models import Base, User, Exercise, Program, Workout, WorkoutSet
-from backend.schemas import UserCreate, UserResponse, ProgramCreate, WorkoutCreate, SetCreate, ExerciseResponse
+from backend.exercise_catalog import get_catalog, reload_catalog, CatalogExercise
+from backend.migrations import run_migrations
+from backend.ml_cache import (
+    history_cache, recommendation_cache, workout_context_cache,
+    WorkoutContext, invalidate_exercise, invalidate_user
+)
+from backend.models import Base, User, Exercise, Program, Workout, WorkoutSet, UserPerformanceModel
+from backend.schemas import UserCreate, UserResponse, ProgramCreate, WorkoutCreate, SetCreate, ExerciseResponse, BatchRecommendationRequest, WorkoutSync, workout_sync_adapter
+from backend.weight_engine import equipment_key, get_weight_ladder, weight_ladder_for_key
+from backend.write_behind import set_history_writer, WRITE_BEHIND_ENABLED
+from backend.performance_model import performance_models
+from backend.cohort_priors import cohort_priors
+from backend.user_stats import add_volume, add_completed_workout, set_volume, reset_stats, read_user_stats
+from backend.progress_rollup import refresh_days, delete_user_rollup, volume_by_bucket, records_since, ProgressBucket
+from backend.personal_records import (
+    update_records, publish_records, discard_records, get_records, delete_user_records, record_cache
+)
+from backend.history_export import stream_export, ExportFormat, MEDIA_TYPES
+from backend.metrics import StageTimer, recommendation_latency, SERVER_TIMING_ENABLED
+from backend.routes import router as equipment_router
+from backend.workout_sync import ingest_workout, build_set_values, build_performance_data, WorkoutSyncConflict
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,6 +44,9 @@ logger = logging.getLogger(__name__)
 # Créer les tables
 Base.metadata.create_all(bind=engine)
 
+# Appliquer les migrations (index, colonnes) aux bases déjà déployées
+run_migrations(engine)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Charger les exercices si nécessaire
@@ -29,9 +54,18 @@ async def lifespan(app: FastAPI):
     try:
         if db.query(Exercise).count() == 0:
             await load_exercises(db)
+        # Catalogue en mémoire servi à toutes les routes
+        reload_catalog(db)
+        # Charges de départ par cohorte (job backend.cohort_priors)
+        cohort_priors.load(db)
     finally:
         db.close()
+    
+    if WRITE_BEHIND_ENABLED:
+        set_history_writer.start()
     yield
+    # Écrire l'historique ML encore en file avant l'arrêt
+    set_history_writer.stop()
 
 async def load_exercises(db: Session):
     """Charge les exercices depuis exercises.json"""
@@ -56,13 +90,18 @@ async def load_exercises(db: Session):
                     default_sets=exercise_data.get("default_sets", 3),
                     default_reps_min=exercise_data.get("default_reps_min", 8),
                     default_reps_max=exercise_data.get("default_reps_max", 12),
-                    rest_time_seconds=exercise_data.get("rest_time_seconds", 60),
-                    instructions=exercise_data.get("instructions", "")
+                    base_rest_time_seconds=exercise_data.get("base_rest_time_seconds", 60),
+                    instructions=exercise_data.get("instructions", ""),
+                    exercise_type=exercise_data.get("exercise_type"),
+                    intensity_factor=exercise_data.get("intensity_factor", 1.0)
                 )
                 db.add(exercise)
             
             db.commit()
             logger.info(f"✅ Chargé {len(exercises_data)} exercices")
+            
+            # Publier le nouveau catalogue (remplacement atomique)
+            reload_catalog(db)
         else:
             logger.warning("❌ Fichier exercises.json non trouvé")
             
@@ -80,6 +119,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Routes asyncio (AsyncSession) : visualisation des charges par type d'équipement
+app.include_router(equipment_router)
+
 # ===== ENDPOINTS UTILISATEUR =====
 
 @app.post("/api/users", response_model=UserResponse)
@@ -111,6 +153,8 @@ def update_user(user_id: int, user_data: Dict[str, Any], db: Session = Depends(g
             setattr(user, key, value)
     
     db.commit()
+    # Équipement ou poids de corps modifiés : recommandations et contextes de séance périmés
+    invalidate_user(user_id)
     db.refresh(user)
     return user
 
@@ -121,8 +165,17 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
     
+    # Ne pas laisser l'écriture différée réinsérer de l'historique après la suppression
+    set_history_writer.flush()
+    db.query(UserPerformanceModel).filter(UserPerformanceModel.user_id == user_id).delete()
+    reset_stats(db, user_id)
+    delete_user_rollup(db, user_id)
+    delete_user_records(db, user_id)
     db.delete(user)
     db.commit()
+    invalidate_user(user_id)
+    performance_models.invalidate_user(user_id)
+    record_cache.invalidate_user(user_id)
     return {"message": "Profil supprimé avec succès"}
 
 @app.delete("/api/users/{user_id}/history")
@@ -134,7 +187,12 @@ def clear_user_history(user_id: int, db: Session = Depends(get_db)):
     
     # Supprimer toutes les séances et leurs sets
     db.query(Workout).filter(Workout.user_id == user_id).delete()
+    reset_stats(db, user_id)
+    delete_user_rollup(db, user_id)
+    delete_user_records(db, user_id)
     db.commit()
+    invalidate_user(user_id)
+    record_cache.invalidate_user(user_id)
     return {"message": "Historique vidé avec succès"}
 
 # ===== ENDPOINTS EXERCICES =====
@@ -146,12 +204,12 @@ def get_exercises(
     db: Session = Depends(get_db)
 ):
     """Récupérer les exercices disponibles, filtrés par équipement utilisateur"""
-    query = db.query(Exercise)
+    catalog = get_catalog()
     
     if muscle_group:
-        query = query.filter(Exercise.muscle_groups.contains([muscle_group]))
-    
-    exercises = query.all()
+        exercises = catalog.for_muscle_group(muscle_group)
+    else:
+        exercises = catalog.exercises
     
     # Filtrer par équipement disponible si user_id fourni
     if user_id:
@@ -195,7 +253,7 @@ def get_available_equipment(equipment_config: Dict[str, Any]) -> List[str]:
     
     return available
 
-def can_perform_exercise(exercise: Exercise, available_equipment: List[str]) -> bool:
+def can_perform_exercise(exercise: CatalogExercise, available_equipment: List[str]) -> bool:
     """Vérifie si un exercice peut être réalisé avec l'équipement disponible"""
     required = exercise.equipment_required
     
@@ -224,7 +282,7 @@ def create_program(user_id: int, program: ProgramCreate, db: Session = Depends(g
     db.query(Program).filter(Program.user_id == user_id).update({"is_active": False})
     
     # Générer les exercices du programme basé sur les focus_areas
-    exercises = generate_program_exercises(user, program, db)
+    exercises = generate_program_exercises(user, program)
     
     db_program = Program(
         user_id=user_id,
@@ -254,16 +312,15 @@ def get_active_program(user_id: int, db: Session = Depends(get_db)):
     
     return program
 
-def generate_program_exercises(user: User, program: ProgramCreate, db: Session) -> List[Dict[str, Any]]:
+def generate_program_exercises(user: User, program: ProgramCreate) -> List[Dict[str, Any]]:
     """Génère une liste d'exercices pour le programme basé sur les zones focus"""
     available_equipment = get_available_equipment(user.equipment_config)
+    catalog = get_catalog()
     
     # Récupérer exercices par zone focus
     all_exercises = []
     for focus_area in program.focus_areas:
-        muscle_exercises = db.query(Exercise).filter(
-            Exercise.muscle_groups.contains([focus_area])
-        ).all()
+        muscle_exercises = catalog.for_muscle_group(focus_area)
         
         # Filtrer par équipement disponible et niveau d'expérience
         available_exercises = []
@@ -336,6 +393,34 @@ def start_workout(user_id: int, workout: WorkoutCreate, db: Session = Depends(ge
     db.refresh(db_workout)
     return {"message": "Séance démarrée", "workout": db_workout}
 
+@app.post("/api/users/{user_id}/workouts/sync")
+async def sync_workout(user_id: int, request: Request):
+    """Synchroniser en une requête une séance complète enregistrée hors ligne"""
+    # Corps brut validé en une passe par le TypeAdapter (pas de double parsing)
+    try:
+        payload = workout_sync_adapter.validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    
+    return await run_in_threadpool(_ingest_synced_workout, user_id, payload)
+
+def _ingest_synced_workout(user_id: int, payload: WorkoutSync):
+    db = SessionLocal()
+    try:
+        if not db.query(User.id).filter(User.id == user_id).first():
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        
+        catalog = get_catalog()
+        for set_data in payload.sets:
+            if not catalog.get(set_data.exercise_id):
+                raise HTTPException(status_code=404, detail=f"Exercice {set_data.exercise_id} non trouvé")
+        
+        return ingest_workout(db, user_id, payload)
+    except WorkoutSyncConflict:
+        raise HTTPException(status_code=409, detail="Identifiant de séance déjà utilisé")
+    finally:
+        db.close()
+
 @app.get("/api/users/{user_id}/workouts/active")
 def get_active_workout(user_id: int, db: Session = Depends(get_db)):
     """Récupérer la séance active"""
@@ -348,101 +433,175 @@ def get_active_workout(user_id: int, db: Session = Depends(get_db)):
 
 @app.post("/api/workouts/{workout_id}/sets")
 def add_set(workout_id: int, set_data: SetCreate, db: Session = Depends(get_db)):
-    """Ajouter une série à la séance avec enregistrement ML"""
-    workout = db.query(Workout).filter(Workout.id == workout_id).first()
+    """Ajouter une série à la séance avec enregistrement ML (et détection des records battus)"""
+    # Instructions sur les tables (Core) : pas de contexte ORM sur le chemin le plus fréquent
+    workouts, sets = Workout.__table__, WorkoutSet.__table__
+    workout = db.execute(select(
+        workouts.c.user_id, workouts.c.overall_fatigue_start, workouts.c.status, workouts.c.completed_at
+    ).where(workouts.c.id == workout_id)).first()
     if not workout:
         raise HTTPException(status_code=404, detail="Séance non trouvée")
     
-    # Importer le moteur de recommandations
-    from backend.ml_recommendations import FitnessRecommendationEngine
-    ml_engine = FitnessRecommendationEngine(db)
-    
-    db_set = WorkoutSet(
-        workout_id=workout_id,
-        exercise_id=set_data.exercise_id,
-        set_number=set_data.set_number,
-        reps=set_data.reps,
-        weight=set_data.weight,
-        duration_seconds=set_data.duration_seconds,
-        rest_time_seconds=set_data.rest_time_seconds,
-        target_reps=set_data.target_reps,
-        target_weight=set_data.target_weight,
-        fatigue_level=set_data.fatigue_level,
-        effort_level=set_data.effort_level,
-        ml_weight_suggestion=set_data.ml_weight_suggestion,
-        ml_reps_suggestion=set_data.ml_reps_suggestion,
-        ml_confidence=set_data.ml_confidence,
-        user_followed_ml_weight=set_data.user_followed_ml_weight,
-        user_followed_ml_reps=set_data.user_followed_ml_reps,
-        exercise_order_in_session=set_data.exercise_order_in_session,
-        set_order_in_session=set_data.set_order_in_session
-    )
+    from backend.ml_recommendations import build_history_values, history_cache_row
     
-    db.add(db_set)
-    db.commit()
-    db.refresh(db_set)
+    set_values = build_set_values(workout_id, set_data)
     
     # Enregistrer pour l'apprentissage ML
-    if set_data.fatigue_level and set_data.effort_level:
-        performance_data = {
-            "weight": set_data.weight or 0,
-            "actual_reps": set_data.reps,
-            "target_reps": set_data.target_reps or set_data.reps,
-            "fatigue_level": set_data.fatigue_level,
-            "effort_level": set_data.effort_level,
-            "exercise_order": set_data.exercise_order_in_session or 1,
-            "set_order_global": set_data.set_order_in_session or 1,
-            "set_number": set_data.set_number,
-            "rest_before_seconds": set_data.rest_time_seconds,
-            "session_fatigue_start": workout.overall_fatigue_start
-        }
-        
-        ml_engine.record_set_performance(
-            workout.user_id, 
-            set_data.exercise_id, 
-            performance_data
+    history_values = None
+    performance_data = build_performance_data(set_data, workout.overall_fatigue_start)
+    if performance_data:
+        history_values = build_history_values(workout.user_id, set_data.exercise_id, performance_data)
+    
+    # Un seul commit, pas de refresh
+    try:
+        db_set = db.execute(
+            insert(sets).values(**set_values).returning(*sets.columns)
+        ).mappings().one()
+        add_volume(db, workout.user_id, set_volume(set_data.weight, set_data.reps))
+        new_records = update_records(
+            db, workout.user_id, set_data.exercise_id, set_data.weight, set_data.reps,
+            db_set["id"], db_set["completed_at"]
         )
+        # Série ajoutée après la fin de la séance : son jour de progression change
+        if workout.status == "completed" and workout.completed_at:
+            refresh_days(db, workout.user_id, [workout.completed_at.date()])
+        db.commit()
+    except Exception:
+        db.rollback()
+        discard_records(db)
+        raise
+    publish_records(db)
+    
+    if history_values:
+        # Historique ML et modèle de performance : écrits par le writer, hors transaction de la série
+        history_values["workout_set_id"] = db_set["id"]
+        set_history_writer.enqueue(history_values)
+        history_cache.append(workout.user_id, set_data.exercise_id, history_cache_row(history_values))
+        invalidate_exercise(workout.user_id, set_data.exercise_id)
     
-    return db_set
+    return {**db_set, "new_records": new_records}
 
 @app.post("/api/workouts/{workout_id}/recommendations")
 def get_set_recommendations(
     workout_id: int, 
     request: Dict[str, Any], 
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """Obtenir des recommandations ML pour la prochaine série"""
-    workout = db.query(Workout).filter(Workout.id == workout_id).first()
-    if not workout:
+    timer = StageTimer(recommendation_latency)
+    try:
+        return _set_recommendations(workout_id, request, db, timer)
+    finally:
+        timer.finish()
+        if SERVER_TIMING_ENABLED:
+            response.headers["Server-Timing"] = timer.server_timing()
+
+def _set_recommendations(workout_id: int, request: Dict[str, Any], db: Session, timer: StageTimer):
+    with timer.stage("context"):
+        context = get_workout_context(db, workout_id)
+    if not context:
         raise HTTPException(status_code=404, detail="Séance non trouvée")
     
-    user = workout.user
-    exercise = db.query(Exercise).filter(Exercise.id == request["exercise_id"]).first()
+    exercise = get_catalog().get(request["exercise_id"])
     if not exercise:
         raise HTTPException(status_code=404, detail="Exercice non trouvé")
     
-    # Récupérer les poids disponibles
-    weights_data = get_available_weights(user.id, db)
-    available_weights = weights_data["available_weights"]
+    from backend.ml_recommendations import FitnessRecommendationEngine, recommendation_key
+    
+    set_number = request.get("set_number", 1)
+    current_fatigue = request.get("current_fatigue", 3)
+    current_effort = request.get("previous_effort", 3)
+    last_rest_duration = request.get("last_rest_duration")
+    exercise_order = request.get("exercise_order", 1)
+    set_order_global = request.get("set_order_global", 1)
+    
+    # Requête identique déjà servie (écran rouvert, nouvel essai du client) : aucune requête SQL
+    cache_key = recommendation_key(
+        context.user_id, context.equipment_key, exercise, set_number, exercise_order,
+        set_order_global, current_fatigue, current_effort, last_rest_duration
+    )
+    with timer.stage("cache"):
+        cached = recommendation_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    with timer.stage("user"):
+        user = db.get(User, context.user_id)
+    
+    # Récupérer les poids disponibles (échelle mise en cache par configuration)
+    with timer.stage("weights"):
+        weight_ladder = weight_ladder_for_key(context.equipment_key, context.bodyweight)
     
     # Importer et utiliser le moteur ML
-    from backend.ml_recommendations import FitnessRecommendationEngine
     ml_engine = FitnessRecommendationEngine(db)
     
     recommendations = ml_engine.get_set_recommendations(
         user=user,
         exercise=exercise,
-        set_number=request.get("set_number", 1),
-        current_fatigue=request.get("current_fatigue", 3),
-        current_effort=request.get("previous_effort", 3),
-        last_rest_duration=request.get("last_rest_duration"),
-        exercise_order=request.get("exercise_order", 1),
-        set_order_global=request.get("set_order_global", 1),
-        available_weights=available_weights
+        set_number=set_number,
+        current_fatigue=current_fatigue,
+        current_effort=current_effort,
+        last_rest_duration=last_rest_duration,
+        exercise_order=exercise_order,
+        set_order_global=set_order_global,
+        available_weights=weight_ladder,
+        timer=timer
     )
     
+    # Ne pas mémoriser le repli par défaut (erreur passagère)
+    if recommendations.get("weight_recommendation") is not None:
+        recommendation_cache.put(cache_key, recommendations)
+    
     return recommendations
 
+def get_workout_context(db: Session, workout_id: int) -> Optional[WorkoutContext]:
+    """Utilisateur, équipement et poids de corps d'une séance (mis en cache)"""
+    context = workout_context_cache.get(workout_id)
+    if context is None:
+        row = db.query(User.id, User.equipment_config, User.weight).join(
+            Workout, Workout.user_id == User.id
+        ).filter(Workout.id == workout_id).first()
+        if not row:
+            return None
+        context = WorkoutContext(row.id, equipment_key(row.equipment_config), row.weight)
+        workout_context_cache.put(workout_id, context)
+    return context
+
+@app.post("/api/workouts/{workout_id}/recommendations/batch")
+def get_batch_set_recommendations(
+    workout_id: int,
+    request: BatchRecommendationRequest,
+    db: Session = Depends(get_db)
+):
+    """Obtenir en un appel les recommandations ML de toute une séance planifiée"""
+    workout = db.query(Workout).filter(Workout.id == workout_id).first()
+    if not workout:
+        raise HTTPException(status_code=404, detail="Séance non trouvée")
+    
+    catalog = get_catalog()
+    exercises = {}
+    for slot in request.slots:
+        exercise = catalog.get(slot.exercise_id)
+        if not exercise:
+            raise HTTPException(status_code=404, detail=f"Exercice {slot.exercise_id} non trouvé")
+        exercises[exercise.id] = exercise
+    
+    user = workout.user
+    
+    from backend.ml_recommendations import FitnessRecommendationEngine
+    ml_engine = FitnessRecommendationEngine(db)
+    
+    # Une seule échelle de poids et un seul préchargement d'historique pour tous les slots
+    recommendations = ml_engine.get_batch_recommendations(
+        user=user,
+        slots=[slot.dict() for slot in request.slots],
+        exercises=exercises,
+        available_weights=get_weight_ladder(user)
+    )
+    
+    return {"recommendations": recommendations}
+
 @app.put("/api/workouts/{workout_id}/fatigue")
 def update_workout_fatigue(
     workout_id: int, 
@@ -470,6 +629,8 @@ def complete_workout(workout_id: int, db: Session = Depends(get_db)):
     if not workout:
         raise HTTPException(status_code=404, detail="Séance non trouvée")
     
+    already_completed = workout.status == "completed"
+    previous_completed_at = workout.completed_at
     workout.status = "completed"
     workout.completed_at = datetime.utcnow()
     
@@ -478,6 +639,16 @@ def complete_workout(workout_id: int, db: Session = Depends(get_db)):
         duration = workout.completed_at - workout.started_at
         workout.total_duration_minutes = int(duration.total_seconds() / 60)
     
+    # Séance écrite avant les agrégats : un recalcul de la ligne de stats doit la voir
+    db.flush()
+    # Agrégat des statistiques dans la même transaction (comptée une seule fois, date toujours à jour)
+    add_completed_workout(db, workout.user_id, {
+        column.name: getattr(workout, column.name) for column in Workout.__table__.columns
+    }, newly_completed=not already_completed)
+    # Agrégat quotidien de progression : jour de fin (et l'ancien si la séance était déjà terminée)
+    refresh_days(db, workout.user_id, [
+        day.date() for day in (previous_completed_at, workout.completed_at) if day
+    ])
     db.commit()
     return {"message": "Séance terminée", "workout": workout}
 
@@ -485,70 +656,92 @@ def complete_workout(workout_id: int, db: Session = Depends(get_db)):
 
 @app.get("/api/users/{user_id}/stats")
 def get_user_stats(user_id: int, db: Session = Depends(get_db)):
-    """Récupérer les statistiques de l'utilisateur"""
-    # Séances totales
-    total_workouts = db.query(func.count(Workout.id)).filter(
-        Workout.user_id == user_id,
-        Workout.status == "completed"
-    ).scalar()
+    """Récupérer les statistiques de l'utilisateur (agrégat user_stats, lecture par clé)"""
+    return read_user_stats(db, user_id)
+
+@app.get("/api/users/{user_id}/records")
+def get_personal_records(user_id: int, db: Session = Depends(get_db)):
+    """Records personnels de l'utilisateur, par exercice"""
+    catalog = get_catalog()
+    return [
+        {
+            "exercise_id": exercise_id,
+            "name": catalog.get(exercise_id).name if catalog.get(exercise_id) else f"Exercice #{exercise_id}",
+            "records": records
+        }
+        for exercise_id, records in get_records(db, user_id).items()
+    ]
+
+@app.get("/api/users/{user_id}/export")
+def export_user_history(user_id: int, format: ExportFormat = "csv", db: Session = Depends(get_db)):
+    """Exporter tout l'historique (une ligne par série), en flux CSV ou NDJSON"""
+    if db.get(User, user_id) is None:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
     
-    # Dernière séance
-    last_workout = db.query(Workout).filter(
-        Workout.user_id == user_id,
-        Workout.status == "completed"
-    ).order_by(desc(Workout.completed_at)).first()
+    return StreamingResponse(
+        stream_export(user_id, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="historique_{user_id}.{format}"'}
+    )
+
+@app.get("/api/users/{user_id}/progress")
+def get_progress_data(
+    user_id: int,
+    days: int = 30,
+    bucket: ProgressBucket = "day",
+    format: Literal["json", "ndjson"] = "json",
+    db: Session = Depends(get_db)
+):
+    """
+    Récupérer les données de progression (agrégat quotidien daily_exercise_volume),
+    regroupées par jour, semaine ou mois. format=ndjson : une ligne JSON par groupe
+    puis par exercice, envoyées au fil de la lecture
+    """
+    since = (datetime.utcnow() - timedelta(days=days)).date()
+    
+    if format == "ndjson":
+        return StreamingResponse(
+            _stream_progress(user_id, since, bucket), media_type="application/x-ndjson"
+        )
     
-    # Volume total (poids x reps)
-    total_volume = db.query(
-        func.sum(WorkoutSet.weight * WorkoutSet.reps)
-    ).join(Workout).filter(
-        Workout.user_id == user_id,
-        WorkoutSet.weight.isnot(None)
-    ).scalar() or 0
+    # Volume par groupe de jours
+    volumes = db.execute(volume_by_bucket(db, user_id, since, bucket)).all()
     
-    # Historique récent (3 dernières séances)
-    recent_workouts = db.query(Workout).filter(
-        Workout.user_id == user_id,
-        Workout.status == "completed"
-    ).order_by(desc(Workout.completed_at)).limit(3).all()
+    # Progression par exercice (records), noms résolus via le catalogue
+    exercise_records = db.execute(records_since(user_id, since)).all()
+    
+    catalog = get_catalog()
     
     return {
-        "total_workouts": total_workouts,
-        "last_workout_date": last_workout.completed_at if last_workout else None,
-        "total_volume_kg": round(total_volume, 1),
-        "recent_workouts": recent_workouts
+        "bucket": bucket,
+        "daily_volume": [_progress_volume(row) for row in volumes],
+        "exercise_records": [_progress_record(row, catalog) for row in exercise_records]
     }
 
-@app.get("/api/users/{user_id}/progress")
-def get_progress_data(user_id: int, days: int = 30, db: Session = Depends(get_db)):
-    """Récupérer les données de progression"""
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
-    
-    # Volume par jour
-    daily_volume = db.query(
-        func.date(Workout.completed_at).label('date'),
-        func.sum(WorkoutSet.weight * WorkoutSet.reps).label('volume')
-    ).join(WorkoutSet).filter(
-        Workout.user_id == user_id,
-        Workout.completed_at >= cutoff_date,
-        WorkoutSet.weight.isnot(None)
-    ).group_by(func.date(Workout.completed_at)).all()
-    
-    # Progression par exercice (records)
-    exercise_records = db.query(
-        Exercise.name,
-        func.max(WorkoutSet.weight).label('max_weight'),
-        func.max(WorkoutSet.reps).label('max_reps')
-    ).join(WorkoutSet).join(Workout).filter(
-        Workout.user_id == user_id,
-        Workout.completed_at >= cutoff_date
-    ).group_by(Exercise.id, Exercise.name).all()
-    
+def _progress_volume(row) -> Dict[str, Any]:
+    return {"date": str(row.date), "volume": float(row.volume or 0), "set_count": int(row.set_count or 0)}
+
+def _progress_record(row, catalog) -> Dict[str, Any]:
+    exercise = catalog.get(row.exercise_id)
     return {
-        "daily_volume": [{"date": str(dv.date), "volume": float(dv.volume or 0)} for dv in daily_volume],
-        "exercise_records": [{"name": er.name, "max_weight": float(er.max_weight or 0), "max_reps": er.max_reps} for er in exercise_records]
+        "name": exercise.name if exercise else f"Exercice #{row.exercise_id}",
+        "max_weight": float(row.max_weight or 0),
+        "max_reps": row.max_reps
     }
 
+# Lignes lues par aller-retour du curseur en mode ndjson
+PROGRESS_STREAM_ROWS = 500
+
+def _stream_progress(user_id: int, since: date, bucket: str) -> Iterator[bytes]:
+    """Lignes NDJSON lues par curseur serveur (session propre : la réponse survit à la requête)"""
+    catalog = get_catalog()
+    with SessionLocal() as db:
+        connection = db.connection(execution_options={"stream_results": True, "yield_per": PROGRESS_STREAM_ROWS})
+        for row in connection.execute(volume_by_bucket(db, user_id, since, bucket)):
+            yield (json.dumps({"type": "volume", **_progress_volume(row)}) + "\n").encode()
+        for row in connection.execute(records_since(user_id, since)):
+            yield (json.dumps({"type": "record", **_progress_record(row, catalog)}) + "\n").encode()
+
 # ===== CALCULS POIDS DISPONIBLES =====
 
 @app.get("/api/users/{user_id}/available-weights")
@@ -558,107 +751,22 @@ def get_available_weights(user_id: int, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
     
-    equipment = user.equipment_config
-    available_weights = []
-    
-    # 1. POIDS DU CORPS
-    bodyweight = user.weight
-    available_weights.append(bodyweight)
-    
-    # 2. HALTÈRES FIXES
-    if equipment.get("dumbbells", {}).get("available"):
-        dumbbell_weights = equipment["dumbbells"].get("weights", [])
-        # Poids individuels
-        available_weights.extend(dumbbell_weights)
-        # Paires d'haltères (pour exercices bilatéraux)
-        available_weights.extend([w * 2 for w in dumbbell_weights])
-    
-    # 3. BARRE + DISQUES
-    if equipment.get("barbell", {}).get("available") and equipment.get("plates", {}).get("available"):
-        barbell_weight = equipment["barbell"].get("weight", 20)
-        plates = equipment["plates"].get("weights", [])
-        
-        # Générer toutes les combinaisons possibles de disques (symétriques)
-        plate_combinations = generate_plate_combinations(plates)
-        for combo_weight in plate_combinations:
-            available_weights.append(barbell_weight + combo_weight * 2)  # Disques des deux côtés
-    
-    # 4. KETTLEBELLS
-    if equipment.get("kettlebells", {}).get("available"):
-        kb_weights = equipment["kettlebells"].get("weights", [])
-        # Poids individuels
-        available_weights.extend(kb_weights)
-        # Paires de kettlebells
-        available_weights.extend([w * 2 for w in kb_weights])
-    
-    # 5. ÉLASTIQUES (tensions équivalentes)
-    if equipment.get("resistance_bands", {}).get("available"):
-        band_tensions = equipment["resistance_bands"].get("tensions", [])
-        available_weights.extend(band_tensions)
-        
-        # Si combinables, ajouter les sommes possibles
-        if equipment["resistance_bands"].get("combinable", False):
-            available_weights.extend(generate_band_combinations(band_tensions))
-    
-    # 6. BARRES DE TRACTION/DIPS (poids du corps + lest)
-    for equipment_type in ["pull_up_bar", "dip_bar"]:
-        if equipment.get(equipment_type, {}).get("available"):
-            available_weights.append(bodyweight)  # Poids du corps
-            
-            if equipment[equipment_type].get("can_add_weight", False):
-                additional_weights = equipment[equipment_type].get("additional_weights", [])
-                for weight in additional_weights:
-                    available_weights.append(bodyweight + weight)
-    
-    # 7. MACHINES (gammes de poids spécifiques)
-    machine_types = ["cable_machine", "leg_press", "lat_pulldown", "chest_press"]
-    for machine_type in machine_types:
-        if equipment.get(machine_type, {}).get("available"):
-            max_weight = equipment[machine_type].get("max_weight", 100)
-            increment = equipment[machine_type].get("increment", 5)
-            
-            # Générer tous les poids possibles de 0 à max par incréments
-            machine_weights = [i * increment for i in range(0, int(max_weight / increment) + 1)]
-            available_weights.extend(machine_weights)
-    
-    # Trier, dédupliquer et arrondir
-    available_weights = sorted(list(set([round(w, 1) for w in available_weights if w > 0])))
-    
-    return {"available_weights": available_weights}
+    return {"available_weights": get_weight_ladder(user).tolist()}
 
-def generate_plate_combinations(plates: List[float]) -> List[float]:
-    """Génère toutes les combinaisons possibles de disques"""
-    if not plates:
-        return [0]
-    
-    combinations = set([0])  # Barre seule
-    
-    # Pour chaque disque, ajouter toutes les quantités possibles (0 à nombre max raisonnable)
-    for plate in plates:
-        new_combinations = set()
-        for existing in combinations:
-            # Ajouter 0, 1, 2, 3, 4 disques de ce poids (quantité raisonnable)
-            for count in range(5):  
-                new_combinations.add(existing + plate * count)
-        combinations.update(new_combinations)
-    
-    return list(combinations)
+# ===== MÉTRIQUES INTERNES =====
 
-def generate_band_combinations(tensions: List[float]) -> List[float]:
-    """Génère les combinaisons possibles d'élastiques"""
-    if not tensions:
-        return []
-    
-    combinations = set()
-    
-    # Combinaisons de 2 élastiques maximum (réaliste)
-    for i, tension1 in enumerate(tensions):
-        for j, tension2 in enumerate(tensions[i:], i):
-            if i == j:
-                continue  # Éviter la duplication simple
-            combinations.add(tension1 + tension2)
-    
-    return list(combinations)
+@app.get("/api/internal/metrics")
+def get_internal_metrics():
+    """Compteurs des caches en mémoire et latences par étape de ce processus"""
+    return {
+        "history_cache": history_cache.stats(),
+        "set_history_writer": set_history_writer.stats(),
+        "recommendation_cache": recommendation_cache.stats(),
+        "performance_models": performance_models.stats(),
+        "cohort_priors": cohort_priors.stats(),
+        "recommendation_latency": recommendation_latency.snapshot(),
+        "weight_ladder_cache": weight_ladder_for_key.cache_info()._asdict()
+    }
 
 # ===== FICHIERS STATIQUES =====
 
@@ -0,0 +1,126 @@
+# ===== backend/metrics.py - LATENCES PAR ÉTAPE =====
+"""
+Histogrammes de latence par étape du pipeline de recommandation (un jeu par processus).
+
+Chaque requête chronomètre ses étapes avec un StageTimer ; les durées sont versées
+dans le registre à la fin de la requête (un verrou par requête, pas par étape).
+Les histogrammes sont à seaux fixes (ms) : mémoire constante, quantiles approchés
+par la borne haute du seau.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+import os
+import threading
+import time
+
+# Bornes hautes des seaux, en millisecondes (le dernier seau est illimité)
+BUCKETS_MS: Tuple[float, ...] = (
+    0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500
+)
+
+# Ajouter l'en-tête Server-Timing aux réponses de recommandation
+SERVER_TIMING_ENABLED = os.getenv("ML_SERVER_TIMING", "0") == "1"
+
+
+class LatencyHistogram:
+    """Compteurs par seau + somme et maximum (non thread-safe : le registre verrouille)"""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms: float):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def merge(self, other: "LatencyHistogram"):
+        """Cumule un autre histogramme (mêmes seaux), par exemple celui d'un autre processus"""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        threshold = q * self.count
+        cumulative = 0
+        for bound, n in zip(BUCKETS_MS, self.counts):
+            cumulative += n
+            if cumulative >= threshold:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.5), 3),
+            "p95_ms": round(self.quantile(0.95), 3),
+            "p99_ms": round(self.quantile(0.99), 3),
+            "max_ms": round(self.max, 3),
+            "buckets_ms": dict(zip([*map(str, BUCKETS_MS), "+Inf"], self.counts))
+        }
+
+
+class LatencyRegistry:
+    """Histogrammes nommés, créés à la première observation"""
+
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe_many(self, durations: Dict[str, float]):
+        with self._lock:
+            for name, ms in durations.items():
+                histogram = self._histograms.get(name)
+                if histogram is None:
+                    histogram = self._histograms[name] = LatencyHistogram()
+                histogram.observe(ms)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: h.snapshot() for name, h in self._histograms.items()}
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+class StageTimer:
+    """Durées des étapes d'une requête ; sans registre, ne fait que chronométrer"""
+
+    __slots__ = ("registry", "durations", "_started")
+
+    def __init__(self, registry: Optional[LatencyRegistry] = None):
+        self.registry = registry
+        self.durations: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.durations[name] = self.durations.get(name, 0.0) + elapsed
+
+    def finish(self):
+        """Ajoute la durée totale et verse toutes les durées dans le registre"""
+        self.durations["total"] = (time.perf_counter() - self._started) * 1000
+        if self.registry is not None:
+            self.registry.observe_many(self.durations)
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={ms:.3f}" for name, ms in self.durations.items())
+
+
+recommendation_latency = LatencyRegistry()
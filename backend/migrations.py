@@ -0,0 +1,155 @@
+# ===== backend/migrations.py - MIGRATIONS DE SCHÉMA VERSIONNÉES =====
+"""
+Mini-runner de migrations appliqué au démarrage.
+
+Base.metadata.create_all ne crée que les tables manquantes : il n'ajoute ni index
+ni colonne aux tables déjà déployées. Chaque migration est une fonction idempotente
+identifiée par un numéro de version ; les versions appliquées sont tracées dans
+la table schema_migrations.
+"""
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData, select, inspect
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from sqlalchemy.engine import Connection, Engine
+from typing import Callable, List, Tuple
+from datetime import datetime
+import logging
+
+from backend.models import (
+    Program, Workout, WorkoutSet, SetHistory, ProjectionCheckpoint,
+    UserPerformanceModel, CohortPrior, UserStats, DailyExerciseVolume, PersonalRecord
+)
+
+logger = logging.getLogger(__name__)
+
+# Table de suivi isolée des modèles métier
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _create_model_indexes(connection: Connection, model, *index_names: str):
+    """
+    Crée les index nommés déclarés dans models.py s'ils n'existent pas encore.
+    Les noms sont listés explicitement : une migration ne doit pas dépendre des
+    index (et colonnes) ajoutés au modèle par des migrations ultérieures.
+    """
+    for index in model.__table__.indexes:
+        if index.name in index_names:
+            index.create(bind=connection, checkfirst=True)
+
+
+def _add_missing_columns(connection: Connection, model, *column_names: str):
+    """Ajoute (ALTER TABLE ... ADD COLUMN) les colonnes du modèle absentes de la table"""
+    table = model.__table__
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    for name in column_names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        column_type = column.type.compile(dialect=connection.dialect)
+        connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {name} {column_type}')
+
+
+def _migration_001_hot_path_indexes(connection: Connection):
+    _create_model_indexes(connection, Program, "ix_programs_user_active")
+    _create_model_indexes(connection, Workout, "ix_workouts_user_status", "ix_workouts_user_completed_at")
+    _create_model_indexes(connection, WorkoutSet, "ix_workout_sets_workout_id", "ix_workout_sets_exercise_id")
+    _create_model_indexes(connection, SetHistory, "ix_set_history_context")
+
+
+def _migration_002_workout_client_uuid(connection: Connection):
+    _add_missing_columns(connection, Workout, "client_uuid")
+    _create_model_indexes(connection, Workout, "ux_workouts_client_uuid")
+
+
+def _migration_003_set_history_projection(connection: Connection):
+    _add_missing_columns(connection, SetHistory, "workout_set_id")
+    _create_model_indexes(connection, SetHistory, "ux_set_history_workout_set_id")
+    ProjectionCheckpoint.__table__.create(bind=connection, checkfirst=True)
+
+
+def _migration_004_user_performance_models(connection: Connection):
+    UserPerformanceModel.__table__.create(bind=connection, checkfirst=True)
+
+
+def _migration_005_cohort_priors(connection: Connection):
+    CohortPrior.__table__.create(bind=connection, checkfirst=True)
+
+
+def _migration_006_user_stats(connection: Connection):
+    # Lignes créées à la première lecture (ou par python -m backend.user_stats --repair)
+    UserStats.__table__.create(bind=connection, checkfirst=True)
+
+
+def _migration_007_daily_exercise_volume(connection: Connection):
+    # Historique existant : python -m backend.progress_rollup --backfill
+    DailyExerciseVolume.__table__.create(bind=connection, checkfirst=True)
+
+
+def _migration_008_personal_records(connection: Connection):
+    # Records de l'historique existant : python -m backend.personal_records --backfill
+    PersonalRecord.__table__.create(bind=connection, checkfirst=True)
+
+
+def _migration_009_user_stats_recent_ids(connection: Connection):
+    # recent_workouts passe des colonnes sérialisées aux id : lignes recalculées à la prochaine lecture
+    connection.execute(UserStats.__table__.delete())
+
+
+# (version, description, fonction) — toujours ajouter à la fin, ne jamais renuméroter
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Index composites sur les chemins de requête critiques", _migration_001_hot_path_indexes),
+    (2, "Identifiant client des séances synchronisées hors ligne", _migration_002_workout_client_uuid),
+    (3, "Lien SetHistory -> WorkoutSet et points de reprise des projections", _migration_003_set_history_projection),
+    (4, "Modèles de performance par utilisateur et exercice", _migration_004_user_performance_models),
+    (5, "Charges de départ par cohorte pour le démarrage à froid", _migration_005_cohort_priors),
+    (6, "Agrégat des statistiques utilisateur", _migration_006_user_stats),
+    (7, "Agrégat quotidien du volume par exercice", _migration_007_daily_exercise_volume),
+    (8, "Records personnels par exercice", _migration_008_personal_records),
+    (9, "Agrégat user_stats : séances récentes par id", _migration_009_user_stats_recent_ids),
+]
+
+
+def get_applied_versions(connection: Connection) -> set:
+    return set(connection.execute(select(schema_migrations.c.version)).scalars().all())
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Applique dans l'ordre les migrations manquantes, retourne les versions appliquées"""
+    migration_metadata.create_all(bind=engine)
+
+    with engine.connect() as connection:
+        applied = get_applied_versions(connection)
+
+    newly_applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+
+        try:
+            # Une transaction par migration : la version n'est enregistrée que si tout réussit
+            with engine.begin() as connection:
+                migrate(connection)
+                connection.execute(schema_migrations.insert().values(
+                    version=version,
+                    description=description,
+                    applied_at=datetime.utcnow()
+                ))
+        except (IntegrityError, OperationalError, ProgrammingError) as e:
+            # Plusieurs workers démarrent en même temps : un autre a peut-être appliqué la migration
+            with engine.connect() as connection:
+                if version in get_applied_versions(connection):
+                    continue
+            logger.error(f"❌ Migration {version} échouée: {e}")
+            raise
+
+        newly_applied.append(version)
+        logger.info(f"✅ Migration {version} appliquée: {description}")
+
+    return newly_applied
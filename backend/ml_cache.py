@@ -0,0 +1,273 @@
+# ===== backend/ml_cache.py - CACHE D'HISTORIQUE POUR LES RECOMMANDATIONS =====
+"""
+Caches en mémoire du moteur de recommandations (un jeu par processus).
+
+SetHistoryCache : cache LRU borné de l'historique récent par (user_id, exercise_id).
+
+Pendant une séance, le même utilisateur redemande une recommandation pour le même
+exercice toutes les 1 à 3 minutes : l'historique est lu une fois depuis SetHistory
+puis servi depuis la mémoire. record_set_performance met le cache à jour en
+écriture directe (write-through), il n'est donc jamais en retard sur ce processus.
+
+Chaque entrée garde au plus `rows_per_key` séries, de la plus récente à la plus
+ancienne. `complete` indique que l'entrée contient tout l'historique de la paire :
+sinon, un filtre qui ne trouve pas assez de lignes doit retomber sur la base.
+
+RecommendationCache : résultats de get_set_recommendations mémoïsés par entrées
+(l'utilisateur rouvre l'écran de série, le client réessaie). Invalidé par
+(user_id, exercise_id) dès qu'une série est enregistrée, borné en âge par un TTL
+(la baseline dépend de la date via sa fenêtre de 14 jours).
+
+WorkoutContextCache : séance -> (utilisateur, équipement, poids de corps), pour
+construire la clé de recommandation sans requête.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Set, Tuple
+import threading
+import time
+import os
+
+HistoryKey = Tuple[int, int]
+
+
+class CachedHistory(NamedTuple):
+    """Séries récentes (dicts, plus récente en tête) et exhaustivité de l'entrée"""
+    rows: Tuple[Dict, ...]
+    complete: bool
+
+
+class SetHistoryCache:
+    """LRU thread-safe, plafonné en nombre total de lignes (proxy de la mémoire)"""
+
+    def __init__(self, max_rows: int = 50_000, rows_per_key: int = 200):
+        self.max_rows = max_rows
+        self.rows_per_key = rows_per_key
+        self._entries: "OrderedDict[HistoryKey, CachedHistory]" = OrderedDict()
+        self._row_count = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: int, exercise_id: int) -> Optional[CachedHistory]:
+        key = (user_id, exercise_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, user_id: int, exercise_id: int, rows: Iterable[Dict], complete: bool):
+        """Remplace l'entrée par des lignes lues en base (plus récente en tête)"""
+        rows = tuple(rows)
+        if len(rows) > self.rows_per_key:
+            rows, complete = rows[:self.rows_per_key], False
+        with self._lock:
+            self._store((user_id, exercise_id), CachedHistory(rows, complete))
+
+    def append(self, user_id: int, exercise_id: int, row: Dict):
+        """
+        Write-through d'une nouvelle série. Sans entrée en cache, rien à faire :
+        la prochaine lecture chargera la ligne depuis la base.
+        """
+        key = (user_id, exercise_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            rows = (row,) + entry.rows
+            complete = entry.complete
+            if len(rows) > self.rows_per_key:
+                rows, complete = rows[:self.rows_per_key], False
+            self._store(key, CachedHistory(rows, complete))
+
+    def invalidate(self, user_id: int, exercise_id: int):
+        with self._lock:
+            entry = self._entries.pop((user_id, exercise_id), None)
+            if entry is not None:
+                self._row_count -= len(entry.rows)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                self._row_count -= len(self._entries.pop(key).rows)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._row_count = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "rows": self._row_count,
+                "max_rows": self.max_rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions
+            }
+
+    def _store(self, key: HistoryKey, entry: CachedHistory):
+        # Appelé sous verrou
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._row_count -= len(previous.rows)
+        self._entries[key] = entry
+        self._row_count += len(entry.rows)
+
+        # Éviction des paires les moins récemment utilisées au-delà du plafond
+        while self._row_count > self.max_rows and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._row_count -= len(evicted.rows)
+            self.evictions += 1
+
+
+class RecommendationCache:
+    """
+    LRU à TTL des recommandations. La clé commence par (user_id, exercise_id) :
+    un index secondaire permet d'invalider toutes les entrées d'une paire.
+    """
+
+    def __init__(self, max_entries: int = 20_000, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._by_pair: Dict[HistoryKey, Set[Tuple]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Copie : l'appelant peut modifier la réponse sans altérer le cache
+            return dict(entry[1])
+
+    def put(self, key: Tuple, value: Dict[str, Any]):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, dict(value))
+            self._by_pair.setdefault(key[:2], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, user_id: int, exercise_id: int):
+        with self._lock:
+            keys = self._by_pair.pop((user_id, exercise_id), ())
+            for key in keys:
+                self._entries.pop(key, None)
+            self.invalidations += len(keys)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for pair in [p for p in self._by_pair if p[0] == user_id]:
+                for key in self._by_pair.pop(pair):
+                    self._entries.pop(key, None)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_pair.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "invalidations": self.invalidations
+            }
+
+    def _remove(self, key: Tuple):
+        # Appelé sous verrou
+        self._entries.pop(key, None)
+        pair_keys = self._by_pair.get(key[:2])
+        if pair_keys is not None:
+            pair_keys.discard(key)
+            if not pair_keys:
+                del self._by_pair[key[:2]]
+
+
+class WorkoutContext(NamedTuple):
+    """Ce dont la clé de recommandation a besoin d'une séance"""
+    user_id: int
+    equipment_key: str
+    bodyweight: float
+
+
+class WorkoutContextCache:
+    """LRU séance -> WorkoutContext, invalidé par utilisateur"""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, WorkoutContext]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, workout_id: int) -> Optional[WorkoutContext]:
+        with self._lock:
+            context = self._entries.get(workout_id)
+            if context is not None:
+                self._entries.move_to_end(workout_id)
+            return context
+
+    def put(self, workout_id: int, context: WorkoutContext):
+        with self._lock:
+            self._entries[workout_id] = context
+            self._entries.move_to_end(workout_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for workout_id in [w for w, c in self._entries.items() if c.user_id == user_id]:
+                del self._entries[workout_id]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Caches partagés par le processus (chaque worker uvicorn a les siens)
+history_cache = SetHistoryCache(
+    max_rows=int(os.getenv("ML_HISTORY_CACHE_MAX_ROWS", "50000")),
+    rows_per_key=int(os.getenv("ML_HISTORY_CACHE_ROWS_PER_KEY", "200"))
+)
+
+recommendation_cache = RecommendationCache(
+    max_entries=int(os.getenv("ML_RECOMMENDATION_CACHE_ENTRIES", "20000")),
+    ttl_seconds=float(os.getenv("ML_RECOMMENDATION_CACHE_TTL_SECONDS", "600"))
+)
+
+workout_context_cache = WorkoutContextCache()
+
+
+def invalidate_exercise(user_id: int, exercise_id: int):
+    """Nouvelle série enregistrée : les recommandations de la paire sont périmées"""
+    recommendation_cache.invalidate(user_id, exercise_id)
+
+
+def invalidate_user(user_id: int):
+    """Profil, équipement ou historique modifié : oublier tout ce qui concerne l'utilisateur"""
+    history_cache.invalidate_user(user_id)
+    recommendation_cache.invalidate_user(user_id)
+    workout_context_cache.invalidate_user(user_id)
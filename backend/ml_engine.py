@@ -6,7 +6,9 @@ from typing import List, Dict, Any
 from datetime import datetime, timedelta
 from backend.models import User, Exercise, Workout, Set, AdaptiveTargets, ProgramExercise, UserCommitment
 import logging
-import itertools
+
+from backend.weight_engine import dumbbell_ladder
+from backend.cohort_priors import cohort_priors
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -186,8 +188,10 @@ class FitnessMLEngine:
                 ratio = value
                 break
         
-        # Calcul du poids de base
-        base_weight = body_weight * ratio
+        # Calcul du poids de base : charge de départ de la cohorte, sinon ratio du poids corporel
+        base_weight = cohort_priors.lookup(user, exercise.id)
+        if base_weight is None:
+            base_weight = body_weight * ratio
         # Vérifier le poids minimum de la barre pour les exercices avec barbell
         if any('barbell' in eq for eq in exercise.equipment):
             min_bar_weight = 20  # Barre olympique par défaut
@@ -215,44 +219,13 @@ class FitnessMLEngine:
         # Si dumbbells, ajuster au poids disponible le plus proche
         if "dumbbells" in exercise.equipment and user.equipment_config:
             target_weight = base_weight * experience_mult * goal_mult / 2
-            available_weights = []
             
-            # Ajouter les haltères fixes si disponibles
-            dumbbell_config = user.equipment_config.get("dumbbells", {})
-            if dumbbell_config.get("available", False) and dumbbell_config.get("weights"):
-                available_weights.extend(dumbbell_config["weights"])
-            
-            # Ajouter AUSSI l'équivalence barres courtes + disques
-            barres_courtes = user.equipment_config.get("barres", {}).get("courte", {})
-            disques_config = user.equipment_config.get("disques", {})
-            if (barres_courtes.get("available", False) and 
-                barres_courtes.get("count", 0) >= 2 and 
-                disques_config.get("available", False)):
-                
-                # Calculer avec barre courte + disques disponibles
-                barre_weight = barres_courtes.get("weight", 2.5)
-                available_plates = []
-                for weight_str, count in disques_config.get("weights", {}).items():
-                    weight = float(weight_str)
-                    # On peut utiliser jusqu'à la moitié des disques (pour faire une paire)
-                    available_plates.extend([weight] * (count // 2))
-                
-                # Ajouter la barre seule
-                available_weights.append(barre_weight)
-                
-                # Ajouter toutes les combinaisons possibles
-                if available_plates:
-                    plate_combinations = set()
-                    for i in range(1, min(len(available_plates) + 1, 5)):  # Limiter la complexité
-                        for combo in itertools.combinations(available_plates, i):
-                            plate_combinations.add(barre_weight + sum(combo))
-                    available_weights.extend(list(plate_combinations))
+            # Haltères fixes + barres courtes chargées (échelle construite une fois par configuration)
+            ladder = dumbbell_ladder(user.equipment_config)
             
             # Trouver le poids le plus proche parmi TOUTES les options
-            if available_weights:
-                available_weights = sorted(set(available_weights))  # Unique et trié
-                closest_weight = min(available_weights, key=lambda x: abs(x - target_weight))
-                return closest_weight * 2  # Paire
+            if ladder:
+                return ladder.nearest(target_weight) * 2  # Paire
             
             # Sinon, utiliser équivalence barres courtes + disques
             barres_courtes = user.equipment_config.get("barres", {}).get("courte", {})
@@ -274,11 +247,7 @@ class FitnessMLEngine:
                     target_plate_weight = max(0, target_weight - barre_weight)
                     closest_plate = min(available_plates, key=lambda x: abs(x - target_plate_weight))
                     return (barre_weight + closest_plate) * 2  # Paire
-            
-            # Trouver le poids le plus proche SI disponible
-            if available_weights:  # Maintenant safe !
-                closest_weight = min(available_weights, key=lambda x: abs(x - target_weight))
-                return closest_weight * 2  # Multiplié par 2 pour la paire
+
         
         # Arrondir à 2.5kg près
         return round(base_weight * experience_mult * goal_mult / 2.5) * 2.5
@@ -348,34 +317,12 @@ class FitnessMLEngine:
             # Arrondir au poids disponible le plus proche
             if "dumbbells" in exercise.equipment and user.equipment_config:
                 target_per_dumbbell = next_weight / 2
-                available = []
-                
-                # Ajouter haltères fixes
-                dumbbell_config = user.equipment_config.get("dumbbells", {})
-                if dumbbell_config.get("available", False) and dumbbell_config.get("weights"):
-                    available.extend(dumbbell_config["weights"])
                 
-                # Ajouter barres courtes + disques
-                barres_courtes = user.equipment_config.get("barres", {}).get("courte", {})
-                disques_config = user.equipment_config.get("disques", {})
-                if (barres_courtes.get("available", False) and 
-                    barres_courtes.get("count", 0) >= 2 and 
-                    disques_config.get("available", False)):
-                    
-                    barre_weight = barres_courtes.get("weight", 2.5)
-                    available.append(barre_weight)
-                    
-                    # Ajouter quelques combinaisons courantes
-                    for weight_str, count in disques_config.get("weights", {}).items():
-                        if count >= 2:  # Paire nécessaire
-                            plate_weight = float(weight_str)
-                            available.append(barre_weight + plate_weight)
-                            available.append(barre_weight + plate_weight * 2)
+                # Haltères fixes + barres courtes chargées
+                ladder = dumbbell_ladder(user.equipment_config)
                 
-                if available:
-                    available = sorted(set(available))
-                    closest = min(available, key=lambda x: abs(x - target_per_dumbbell))
-                    next_weight = closest * 2
+                if ladder:
+                    next_weight = ladder.nearest(target_per_dumbbell) * 2
                 else:
                     # Arrondir à 2.5kg près
                     next_weight = round(next_weight / 2.5) * 2.5
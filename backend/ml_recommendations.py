@@ -1,15 +1,92 @@
 # ===== backend/ml_recommendations.py - MOTEUR ML RECOMMANDATIONS =====
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, desc
-from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import func, and_, desc, select
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Union
 from datetime import datetime, timedelta
-import statistics
 import logging
 
+import numpy as np
+
 from backend.models import User, Exercise, WorkoutSet, SetHistory, Workout
+from backend.weight_engine import WeightLadder
+from backend.ml_cache import CachedHistory, history_cache, invalidate_exercise
+from backend.ml_stats import weighted_quantile, recency_weights, pad_rows
+from backend.write_behind import set_history_writer
+from backend.cohort_priors import cohort_priors
+from backend.metrics import StageTimer
+from backend.performance_model import RLSModel, performance_models, features, blend_reps
 
 logger = logging.getLogger(__name__)
 
+# Nombre de séries similaires prises en compte pour une recommandation
+HISTORY_LIMIT = 30
+
+
+def build_history_values(
+    user_id: int,
+    exercise_id: int,
+    set_data: Dict,
+    date_performed: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """Valeurs d'une ligne SetHistory, prêtes pour un insert Core"""
+    return {
+        "user_id": user_id,
+        "exercise_id": exercise_id,
+        "weight": set_data["weight"],
+        "reps": set_data["actual_reps"],
+        "fatigue_level": set_data["fatigue_level"],
+        "effort_level": set_data["effort_level"],
+        "exercise_order_in_session": set_data["exercise_order"],
+        "set_order_in_session": set_data["set_order_global"],
+        "set_number_in_exercise": set_data["set_number"],
+        "rest_before_seconds": set_data.get("rest_before_seconds"),
+        "session_fatigue_start": set_data.get("session_fatigue_start"),
+        "success": set_data["actual_reps"] >= set_data.get("target_reps", 1),
+        "actual_reps": set_data["actual_reps"],
+        "date_performed": date_performed or datetime.utcnow()
+    }
+
+
+def history_cache_row(values: Mapping[str, Any]) -> Dict:
+    """Forme compacte d'une ligne SetHistory utilisée par le pipeline et le cache"""
+    return {
+        "weight": values["weight"],
+        "reps": values["actual_reps"],
+        "fatigue": values["fatigue_level"],
+        "effort": values["effort_level"],
+        "success": values["success"],
+        "rest_before": values["rest_before_seconds"],
+        "date": values["date_performed"],
+        "set_number": values["set_number_in_exercise"],
+        "exercise_order": values["exercise_order_in_session"]
+    }
+
+
+def recommendation_key(
+    user_id: int,
+    equipment_key: str,
+    exercise: Exercise,
+    set_number: int,
+    exercise_order: int,
+    set_order_global: int,
+    current_fatigue: int,
+    current_effort: int,
+    last_rest_duration: Optional[int]
+) -> Tuple:
+    """
+    Clé de mémoïsation de get_set_recommendations ; commence par (user_id, exercise_id)
+    pour l'invalidation par paire. Le repos est réduit à sa tranche d'ajustement (seule
+    valeur utilisée par le pipeline) ; le rang global de série reste exact car
+    l'ajustement de fatigue en dépend linéairement.
+    """
+    rest_band = FitnessRecommendationEngine._calculate_rest_adjustment(
+        last_rest_duration, exercise.base_rest_time_seconds
+    )
+    return (
+        user_id, exercise.id, set_number, exercise_order, set_order_global,
+        current_fatigue, current_effort, rest_band, hash(equipment_key)
+    )
+
 
 class FitnessRecommendationEngine:
     """
@@ -30,10 +107,12 @@ class FitnessRecommendationEngine:
         last_rest_duration: Optional[int] = None,  # en secondes
         exercise_order: int = 1,
         set_order_global: int = 1,
-        available_weights: List[float] = None
+        available_weights: Union[WeightLadder, List[float], None] = None,
+        timer: Optional[StageTimer] = None
     ) -> Dict[str, any]:
         """
         Génère des recommandations de poids/reps pour la prochaine série
+        (durée de chaque étape dans `timer` s'il est fourni)
         
         Returns:
         {
@@ -46,17 +125,113 @@ class FitnessRecommendationEngine:
         }
         """
         
+        timer = timer or StageTimer()
         try:
             # 1. Récupérer l'historique pertinent
-            historical_data = self._get_historical_context(
-                user, exercise, set_number, exercise_order
+            with timer.stage("history"):
+                historical_data = self._get_historical_context(
+                    user, exercise, set_number, exercise_order
+                )
+            with timer.stage("model"):
+                model = performance_models.get_many(self.db, user.id, [exercise.id])[exercise.id]
+            
+            return self._recommend_from_history(
+                user, exercise, historical_data, set_number, current_fatigue, current_effort,
+                last_rest_duration, exercise_order, set_order_global, available_weights,
+                model=model, timer=timer
             )
             
-            # 2. Calculer la baseline (performance "normale" attendue)
-            baseline_weight, baseline_reps = self._calculate_baseline(
-                user, exercise, historical_data
+        except Exception as e:
+            logger.error(f"Erreur recommandations pour user {user.id}, exercise {exercise.id}: {e}")
+            return self._fallback_recommendation(exercise)
+    
+    def get_batch_recommendations(
+        self,
+        user: User,
+        slots: List[Dict],
+        exercises: Dict[int, Exercise],
+        available_weights: Union[WeightLadder, List[float], None] = None
+    ) -> List[Dict[str, any]]:
+        """
+        Recommandations pour toute une séance planifiée.
+        
+        Chaque slot contient exercise_id, set_number, exercise_order (et optionnellement
+        current_fatigue, previous_effort, last_rest_duration, set_order_global).
+        L'historique des exercices absents du cache est chargé en une seule requête IN.
+        """
+        history_by_exercise = self._cached_history(user.id, {slot["exercise_id"] for slot in slots})
+        
+        slot_histories = [
+            self._similar_history(
+                user.id, slot["exercise_id"], history_by_exercise[slot["exercise_id"]],
+                slot.get("set_number", 1), slot.get("exercise_order", 1)
             )
+            for slot in slots
+        ]
+        # Baselines de tous les slots en un seul calcul vectorisé
+        baselines = self._calculate_baselines(
+            user, [(exercises[slot["exercise_id"]], history) for slot, history in zip(slots, slot_histories)]
+        )
+        
+        models = performance_models.get_many(self.db, user.id, exercises.keys())
+        
+        recommendations = []
+        for slot, historical_data, baseline in zip(slots, slot_histories, baselines):
+            exercise = exercises[slot["exercise_id"]]
+            set_number = slot.get("set_number", 1)
+            exercise_order = slot.get("exercise_order", 1)
+            
+            try:
+                recommendation = self._recommend_from_history(
+                    user, exercise, historical_data, set_number,
+                    slot.get("current_fatigue", 3),
+                    slot.get("previous_effort", 3),
+                    slot.get("last_rest_duration"),
+                    exercise_order,
+                    slot.get("set_order_global", 1),
+                    available_weights,
+                    baseline,
+                    models.get(exercise.id)
+                )
+            except Exception as e:
+                logger.error(f"Erreur recommandations pour user {user.id}, exercise {exercise.id}: {e}")
+                recommendation = self._fallback_recommendation(exercise)
             
+            recommendations.append({
+                "exercise_id": exercise.id,
+                "set_number": set_number,
+                "exercise_order": exercise_order,
+                **recommendation
+            })
+        
+        return recommendations
+    
+    def _recommend_from_history(
+        self,
+        user: User,
+        exercise: Exercise,
+        historical_data: List[Dict],
+        set_number: int,
+        current_fatigue: int,
+        current_effort: int,
+        last_rest_duration: Optional[int],
+        exercise_order: int,
+        set_order_global: int,
+        available_weights: Union[WeightLadder, List[float], None],
+        baseline: Optional[Tuple[float, int]] = None,
+        model: Optional[RLSModel] = None,
+        timer: Optional[StageTimer] = None
+    ) -> Dict[str, any]:
+        """Étapes 2 à 9 du pipeline, à partir d'un historique (et éventuellement d'une baseline) déjà calculé"""
+        timer = timer or StageTimer()
+        
+        # 2. Calculer la baseline (performance "normale" attendue)
+        with timer.stage("baseline"):
+            if baseline is None:
+                baseline = self._calculate_baseline(user, exercise, historical_data)
+            baseline_weight, baseline_reps = baseline
+        
+        with timer.stage("adjustments"):
             # 3. Ajustements basés sur la fatigue actuelle
             fatigue_adjustment = self._calculate_fatigue_adjustment(
                 current_fatigue, exercise_order, set_order_global
@@ -75,13 +250,22 @@ class FitnessRecommendationEngine:
             # 6. Appliquer les ajustements
             recommended_weight = baseline_weight * fatigue_adjustment * effort_adjustment * rest_adjustment
             recommended_reps = int(baseline_reps * (2 - fatigue_adjustment) * (2 - effort_adjustment))
-            
-            # 7. Valider avec les poids disponibles
+        
+        # 7. Valider avec les poids disponibles
+        with timer.stage("closest_weight"):
             if available_weights:
                 recommended_weight = self._find_closest_available_weight(
                     recommended_weight, available_weights
                 )
-            
+        
+        # 7b. Modèle appris : reps atteignables à cette charge dans ce contexte (produit scalaire)
+        with timer.stage("model_blend"):
+            recommended_reps = blend_reps(recommended_reps, model, features(
+                recommended_weight, current_fatigue, current_effort, last_rest_duration,
+                exercise_order, set_order_global
+            ))
+        
+        with timer.stage("reasoning"):
             # 8. Calculer la confiance et le raisonnement
             confidence = self._calculate_confidence(historical_data, current_fatigue, current_effort)
             reasoning = self._generate_reasoning(
@@ -92,31 +276,30 @@ class FitnessRecommendationEngine:
             # 9. Déterminer les changements par rapport à la baseline
             weight_change = self._determine_change(recommended_weight, baseline_weight, 0.05)
             reps_change = self._determine_change(recommended_reps, baseline_reps, 0.1)
-            
-            return {
-                "weight_recommendation": round(recommended_weight, 1),
-                "reps_recommendation": max(1, recommended_reps),
-                "confidence": confidence,
-                "reasoning": reasoning,
-                "weight_change": weight_change,
-                "reps_change": reps_change,
-                "baseline_weight": baseline_weight,
-                "baseline_reps": baseline_reps
-            }
-            
-        except Exception as e:
-            logger.error(f"Erreur recommandations pour user {user.id}, exercise {exercise.id}: {e}")
-            # Fallback sur les valeurs par défaut
-            return {
-                "weight_recommendation": None,
-                "reps_recommendation": exercise.default_reps_min,
-                "confidence": 0.0,
-                "reasoning": "Données insuffisantes pour une recommandation",
-                "weight_change": "same",
-                "reps_change": "same",
-                "baseline_weight": None,
-                "baseline_reps": exercise.default_reps_min
-            }
+        
+        return {
+            "weight_recommendation": round(recommended_weight, 1),
+            "reps_recommendation": max(1, recommended_reps),
+            "confidence": confidence,
+            "reasoning": reasoning,
+            "weight_change": weight_change,
+            "reps_change": reps_change,
+            "baseline_weight": baseline_weight,
+            "baseline_reps": baseline_reps
+        }
+    
+    def _fallback_recommendation(self, exercise: Exercise) -> Dict[str, any]:
+        """Fallback sur les valeurs par défaut"""
+        return {
+            "weight_recommendation": None,
+            "reps_recommendation": exercise.default_reps_min,
+            "confidence": 0.0,
+            "reasoning": "Données insuffisantes pour une recommandation",
+            "weight_change": "same",
+            "reps_change": "same",
+            "baseline_weight": None,
+            "baseline_reps": exercise.default_reps_min
+        }
     
     def _get_historical_context(
         self, 
@@ -126,12 +309,35 @@ class FitnessRecommendationEngine:
         exercise_order: int
     ) -> List[Dict]:
         """Récupère l'historique pertinent pour cet exercice dans des contextes similaires"""
-        
-        # Récupérer les 30 dernières séries de cet exercice dans des conditions similaires
+        entry = self._cached_history(user.id, [exercise.id])[exercise.id]
+        return self._similar_history(user.id, exercise.id, entry, set_number, exercise_order)
+    
+    def _similar_history(
+        self,
+        user_id: int,
+        exercise_id: int,
+        entry: CachedHistory,
+        set_number: int,
+        exercise_order: int
+    ) -> List[Dict]:
+        """Filtre l'historique en cache ; retombe sur la base si la fenêtre en cache ne suffit pas"""
+        similar = self._filter_history(entry.rows, set_number, exercise_order)
+        if entry.complete or len(similar) == HISTORY_LIMIT:
+            return similar
+        return self._query_similar_history(user_id, exercise_id, set_number, exercise_order)
+    
+    def _query_similar_history(
+        self,
+        user_id: int,
+        exercise_id: int,
+        set_number: int,
+        exercise_order: int
+    ) -> List[Dict]:
+        # Récupérer les HISTORY_LIMIT dernières séries de cet exercice dans des conditions similaires
         similar_sets = self.db.query(SetHistory).filter(
             and_(
-                SetHistory.user_id == user.id,
-                SetHistory.exercise_id == exercise.id,
+                SetHistory.user_id == user_id,
+                SetHistory.exercise_id == exercise_id,
                 SetHistory.set_number_in_exercise == set_number,
                 # Position similaire dans la séance (±1)
                 SetHistory.exercise_order_in_session.between(
@@ -139,19 +345,87 @@ class FitnessRecommendationEngine:
                     exercise_order + 1
                 )
             )
-        ).order_by(desc(SetHistory.date_performed)).limit(30).all()
-        
-        return [
-            {
-                "weight": s.weight,
-                "reps": s.actual_reps,
-                "fatigue": s.fatigue_level,
-                "effort": s.effort_level,
-                "success": s.success,
-                "rest_before": s.rest_before_seconds,
-                "date": s.date_performed
-            } for s in similar_sets
-        ]
+        ).order_by(desc(SetHistory.date_performed)).limit(HISTORY_LIMIT).all()
+        
+        return [self._history_row_to_dict(s) for s in similar_sets]
+    
+    def _cached_history(self, user_id: int, exercise_ids) -> Dict[int, CachedHistory]:
+        """Historique récent par exercice, depuis le cache ou en une requête pour les absents"""
+        entries = {}
+        missing = []
+        for exercise_id in exercise_ids:
+            entry = history_cache.get(user_id, exercise_id)
+            if entry is None:
+                missing.append(exercise_id)
+            else:
+                entries[exercise_id] = entry
+        
+        if missing:
+            # Lire ses propres écritures : les lignes encore en file d'écriture différée d'abord
+            set_history_writer.flush()
+            entries.update(self._load_recent_history(user_id, missing))
+        return entries
+    
+    def _load_recent_history(self, user_id: int, exercise_ids: List[int]) -> Dict[int, CachedHistory]:
+        """
+        Charge les rows_per_key dernières séries de chaque exercice (fonction fenêtre
+        ROW_NUMBER par exercice) et les place dans le cache
+        """
+        per_key = history_cache.rows_per_key
+        rank = func.row_number().over(
+            partition_by=SetHistory.exercise_id,
+            order_by=desc(SetHistory.date_performed)
+        ).label("rank")
+        ranked = select(SetHistory, rank).where(
+            SetHistory.user_id == user_id,
+            SetHistory.exercise_id.in_(exercise_ids)
+        ).subquery()
+        recent = aliased(SetHistory, ranked)
+        
+        # Une ligne de plus que la capacité pour savoir si l'historique est complet
+        rows = self.db.query(recent).filter(ranked.c.rank <= per_key + 1).order_by(
+            recent.exercise_id, desc(recent.date_performed)
+        ).all()
+        
+        rows_by_exercise: Dict[int, List[Dict]] = {exercise_id: [] for exercise_id in exercise_ids}
+        for row in rows:
+            rows_by_exercise[row.exercise_id].append(self._history_row_to_dict(row))
+        
+        entries = {}
+        for exercise_id, exercise_rows in rows_by_exercise.items():
+            complete = len(exercise_rows) <= per_key
+            entries[exercise_id] = CachedHistory(tuple(exercise_rows[:per_key]), complete)
+            history_cache.put(user_id, exercise_id, exercise_rows, complete)
+        return entries
+    
+    def _filter_history(
+        self,
+        rows: Iterable[Dict],
+        set_number: int,
+        exercise_order: int
+    ) -> List[Dict]:
+        """Applique en mémoire le filtre de _query_similar_history à un historique préchargé"""
+        low, high = max(1, exercise_order - 1), exercise_order + 1
+        similar = []
+        for row in rows:
+            if row["set_number"] == set_number and low <= row["exercise_order"] <= high:
+                similar.append(row)
+                if len(similar) == HISTORY_LIMIT:
+                    break
+        return similar
+    
+    def _history_row_to_dict(self, s: SetHistory) -> Dict:
+        return {
+            "weight": s.weight,
+            "reps": s.actual_reps,
+            "fatigue": s.fatigue_level,
+            "effort": s.effort_level,
+            "success": s.success,
+            "rest_before": s.rest_before_seconds,
+            "date": s.date_performed,
+            "set_number": s.set_number_in_exercise,
+            "exercise_order": s.exercise_order_in_session
+        }
     
     def _calculate_baseline(
         self, 
@@ -160,11 +434,40 @@ class FitnessRecommendationEngine:
         historical_data: List[Dict]
     ) -> Tuple[float, int]:
         """Calcule la performance baseline basée sur l'historique récent"""
-        
-        if not historical_data:
-            # Pas d'historique : utiliser les valeurs par défaut de l'exercice
-            return self._estimate_initial_weight(user, exercise), exercise.default_reps_min
-        
+        return self._calculate_baselines(user, [(exercise, historical_data)])[0]
+    
+    def _calculate_baselines(
+        self,
+        user: User,
+        items: List[Tuple[Exercise, List[Dict]]]
+    ) -> List[Tuple[float, int]]:
+        """
+        Baselines de plusieurs (exercice, historique) en un seul calcul : les échantillons
+        sont empilés dans une matrice (une ligne par item) et la médiane pondérée par la
+        récence est calculée sur toutes les lignes à la fois.
+        """
+        samples = [self._baseline_sample(historical_data) for _, historical_data in items]
+        
+        width = max((len(sample) for sample in samples), default=0)
+        weights = pad_rows([[h["weight"] for h in sample] for sample in samples], width=width)
+        reps = pad_rows([[h["reps"] for h in sample] for sample in samples], width=width)
+        # Pondération décroissante pour les données plus anciennes (poids nul sur le remplissage)
+        recency = pad_rows([recency_weights(len(sample)) for sample in samples], width=width)
+        
+        median_weights = weighted_quantile(weights, recency)
+        median_reps = weighted_quantile(reps, recency)
+        
+        baselines = []
+        for (exercise, _), weight, rep_count in zip(items, median_weights, median_reps):
+            if np.isnan(weight):
+                # Pas d'historique exploitable : utiliser les valeurs par défaut de l'exercice
+                baselines.append((self._estimate_initial_weight(user, exercise), exercise.default_reps_min))
+            else:
+                baselines.append((float(weight), int(rep_count)))
+        return baselines
+    
+    def _baseline_sample(self, historical_data: List[Dict]) -> List[Dict]:
+        """Séries réussies retenues pour la baseline, de la plus récente à la plus ancienne"""
         # Filtrer les séries réussies des 14 derniers jours pour plus de pertinence
         recent_cutoff = datetime.utcnow() - timedelta(days=14)
         recent_successful = [
@@ -176,28 +479,16 @@ class FitnessRecommendationEngine:
             # Utiliser tout l'historique si pas assez de données récentes
             recent_successful = [h for h in historical_data if h["success"]]
         
-        if recent_successful:
-            # Moyenne pondérée (plus récent = plus important)
-            weights = []
-            reps = []
-            
-            for i, h in enumerate(recent_successful):
-                # Pondération décroissante pour les données plus anciennes
-                weight_factor = 1.0 / (1 + i * 0.1)
-                weights.extend([h["weight"]] * int(weight_factor * 10))
-                reps.extend([h["reps"]] * int(weight_factor * 10))
-            
-            baseline_weight = statistics.median(weights)
-            baseline_reps = int(statistics.median(reps))
-            
-            return baseline_weight, baseline_reps
-        
-        # Fallback
-        return self._estimate_initial_weight(user, exercise), exercise.default_reps_min
+        return recent_successful
     
     def _estimate_initial_weight(self, user: User, exercise: Exercise) -> float:
         """Estime un poids initial pour un nouvel exercice"""
-        # Estimations basées sur le poids de corps et le niveau
+        # Charge de départ médiane des utilisateurs comparables, si la cohorte est connue
+        prior = cohort_priors.lookup(user, exercise.id)
+        if prior is not None:
+            return prior
+        
+        # Sinon, estimations basées sur le poids de corps et le niveau
         bodyweight = user.weight
         
         level_multipliers = {
@@ -276,8 +567,8 @@ class FitnessRecommendationEngine:
         
         return effort_adjustments.get(previous_effort, 1.0)
     
+    @staticmethod
     def _calculate_rest_adjustment(
-        self, 
         actual_rest: Optional[int], 
         recommended_rest: int
     ) -> float:
@@ -303,14 +594,17 @@ class FitnessRecommendationEngine:
     def _find_closest_available_weight(
         self, 
         target_weight: float, 
-        available_weights: List[float]
+        available_weights: Union[WeightLadder, List[float]]
     ) -> float:
         """Trouve le poids disponible le plus proche du poids cible"""
         
         if not available_weights:
             return target_weight
         
-        return min(available_weights, key=lambda x: abs(x - target_weight))
+        if not isinstance(available_weights, WeightLadder):
+            available_weights = WeightLadder(available_weights)
+        
+        return available_weights.nearest(target_weight)
     
     def _calculate_confidence(
         self, 
@@ -400,25 +694,14 @@ class FitnessRecommendationEngine:
     ):
         """Enregistre la performance d'une série pour l'apprentissage futur"""
         
+        values = build_history_values(user_id, exercise_id, set_data)
         try:
-            history_record = SetHistory(
-                user_id=user_id,
-                exercise_id=exercise_id,
-                weight=set_data["weight"],
-                reps=set_data["actual_reps"],
-                fatigue_level=set_data["fatigue_level"],
-                effort_level=set_data["effort_level"],
-                exercise_order_in_session=set_data["exercise_order"],
-                set_order_in_session=set_data["set_order_global"],
-                set_number_in_exercise=set_data["set_number"],
-                rest_before_seconds=set_data.get("rest_before_seconds"),
-                session_fatigue_start=set_data.get("session_fatigue_start"),
-                success=set_data["actual_reps"] >= set_data.get("target_reps", 1),
-                actual_reps=set_data["actual_reps"]
-            )
+            # Ligne et modèle de performance écrits par le writer d'historique
+            set_history_writer.enqueue(values)
             
-            self.db.add(history_record)
-            self.db.commit()
+            # Write-through : les prochaines recommandations voient cette série sans relire la base
+            history_cache.append(user_id, exercise_id, history_cache_row(values))
+            invalidate_exercise(user_id, exercise_id)
             
             logger.info(f"Performance enregistrée: user {user_id}, exercise {exercise_id}")
             
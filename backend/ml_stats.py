@@ -0,0 +1,71 @@
+# ===== backend/ml_stats.py - STATISTIQUES PONDÉRÉES VECTORISÉES =====
+"""
+Quantiles pondérés NumPy, sans réplication des valeurs.
+
+Une ligne = un échantillon pondéré. En 2D, chaque ligne est traitée indépendamment
+(un exercice ou un slot de séance par ligne) : les lignes plus courtes sont complétées
+avec un poids nul, qui n'influence pas le résultat.
+"""
+from typing import Optional, Sequence
+import numpy as np
+
+# Pondération de récence : la i-ème série la plus récente pèse 1 / (1 + 0.1 × i)
+RECENCY_DECAY = 0.1
+
+
+def recency_weights(count: int, decay: float = RECENCY_DECAY) -> np.ndarray:
+    return 1.0 / (1.0 + decay * np.arange(count, dtype=float))
+
+
+def weighted_quantile(values, weights, q: float = 0.5) -> np.ndarray:
+    """
+    Quantile pondéré le long du dernier axe.
+
+    Retourne la plus petite valeur dont le poids cumulé atteint q × poids total ;
+    si ce seuil tombe exactement entre deux valeurs, leur moyenne (comme
+    statistics.median pour des poids égaux). NaN pour une ligne de poids total nul.
+    """
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    if values.shape != weights.shape:
+        raise ValueError("values et weights doivent avoir la même forme")
+
+    squeeze = values.ndim == 1
+    values = np.atleast_2d(values)
+    weights = np.atleast_2d(weights)
+    if values.shape[-1] == 0:
+        result = np.full(values.shape[0], np.nan)
+        return result[0] if squeeze else result
+
+    order = np.argsort(values, axis=-1, kind="stable")
+    sorted_values = np.take_along_axis(values, order, axis=-1)
+    cumulative = np.cumsum(np.take_along_axis(weights, order, axis=-1), axis=-1)
+
+    total = cumulative[:, -1]
+    target = q * total
+    tolerance = 1e-9 * np.maximum(total, 1.0)
+    last = values.shape[-1] - 1
+
+    # Premier indice dont le poids cumulé atteint la cible
+    lower = np.minimum((cumulative < (target - tolerance)[:, None]).sum(axis=-1), last)
+    # Premier indice qui la dépasse strictement (valeur suivante à poids non nul)
+    upper = np.minimum((cumulative <= (target + tolerance)[:, None]).sum(axis=-1), last)
+
+    rows = np.arange(values.shape[0])
+    on_boundary = np.abs(cumulative[rows, lower] - target) <= tolerance
+    result = np.where(
+        on_boundary,
+        (sorted_values[rows, lower] + sorted_values[rows, upper]) / 2,
+        sorted_values[rows, lower]
+    )
+    result = np.where(total > 0, result, np.nan)
+    return result[0] if squeeze else result
+
+
+def pad_rows(rows: Sequence[Sequence[float]], fill: float = 0.0, width: Optional[int] = None) -> np.ndarray:
+    """Empile des séquences de longueurs différentes en une matrice complétée par `fill`"""
+    width = max((len(row) for row in rows), default=0) if width is None else width
+    matrix = np.full((len(rows), width), fill, dtype=float)
+    for i, row in enumerate(rows):
+        matrix[i, :len(row)] = row
+    return matrix
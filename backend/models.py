@@ -1,5 +1,5 @@
 # ===== backend/models.py - VERSION REFACTORISÉE =====
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, JSON, Boolean, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from backend.database import Base
@@ -39,6 +39,33 @@ class Exercise(Base):
     # Métadonnées pour le ML
     exercise_type = Column(String)  # compound, isolation, cardio
     intensity_factor = Column(Float, default=1.0)  # Facteur d'intensité pour ajuster le repos
+    
+    muscle_group_links = relationship("ExerciseMuscleGroup", cascade="all, delete-orphan")
+    equipment_links = relationship("ExerciseEquipment", cascade="all, delete-orphan")
+
+
+class ExerciseMuscleGroup(Base):
+    """Relation normalisée exercice <-> groupe musculaire (miroir indexé de muscle_groups)"""
+    __tablename__ = "exercise_muscle_groups"
+    
+    exercise_id = Column(Integer, ForeignKey("exercises.id", ondelete="CASCADE"), primary_key=True)
+    muscle_group = Column(String, primary_key=True)
+    
+    __table_args__ = (
+        Index("ix_exercise_muscle_groups_muscle_group", "muscle_group", "exercise_id"),
+    )
+
+
+class ExerciseEquipment(Base):
+    """Relation normalisée exercice <-> équipement requis (miroir indexé de equipment_required)"""
+    __tablename__ = "exercise_equipment"
+    
+    exercise_id = Column(Integer, ForeignKey("exercises.id", ondelete="CASCADE"), primary_key=True)
+    equipment = Column(String, primary_key=True)
+    
+    __table_args__ = (
+        Index("ix_exercise_equipment_equipment", "equipment", "exercise_id"),
+    )
 
 
 class Program(Base):
@@ -55,6 +82,10 @@ class Program(Base):
     is_active = Column(Boolean, default=True)
     
     user = relationship("User", back_populates="programs")
+    
+    __table_args__ = (
+        Index("ix_programs_user_active", "user_id", "is_active"),  # Programme actif
+    )
 
 
 class Workout(Base):
@@ -74,9 +105,18 @@ class Workout(Base):
     overall_fatigue_start = Column(Integer, nullable=True)  # 1-5
     overall_fatigue_end = Column(Integer, nullable=True)  # 1-5
     
+    # Identifiant généré par le client hors ligne (synchronisation idempotente)
+    client_uuid = Column(String(36), nullable=True)
+    
     user = relationship("User", back_populates="workouts")
     program = relationship("Program")
     sets = relationship("WorkoutSet", back_populates="workout", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index("ix_workouts_user_status", "user_id", "status"),  # Séance active
+        Index("ix_workouts_user_completed_at", "user_id", "completed_at"),  # Stats et progression
+        Index("ux_workouts_client_uuid", "client_uuid", unique=True),  # Synchronisation hors ligne
+    )
 
 
 class WorkoutSet(Base):
@@ -114,6 +154,11 @@ class WorkoutSet(Base):
     
     workout = relationship("Workout", back_populates="sets")
     exercise = relationship("Exercise")
+    
+    __table_args__ = (
+        Index("ix_workout_sets_workout_id", "workout_id"),
+        Index("ix_workout_sets_exercise_id", "exercise_id"),
+    )
 
 
 class SetHistory(Base):
@@ -145,5 +190,101 @@ class SetHistory(Base):
     
     date_performed = Column(DateTime, default=datetime.utcnow)
     
+    # WorkoutSet source de la ligne (référence logique, sans contrainte : la projection est reconstructible)
+    workout_set_id = Column(Integer, nullable=True)
+    
     user = relationship("User")
-    exercise = relationship("Exercise")
\ No newline at end of file
+    exercise = relationship("Exercise")
+    
+    __table_args__ = (
+        # Filtre 4 colonnes + tri de FitnessRecommendationEngine._get_historical_context
+        Index(
+            "ix_set_history_context",
+            "user_id", "exercise_id", "set_number_in_exercise",
+            "exercise_order_in_session", "date_performed"
+        ),
+        # Une ligne d'historique au plus par série (projection idempotente)
+        Index("ux_set_history_workout_set_id", "workout_set_id", unique=True),
+    )
+
+
+class UserPerformanceModel(Base):
+    """Modèle linéaire en ligne (moindres carrés récursifs) des reps atteignables, par utilisateur et exercice"""
+    __tablename__ = "user_performance_models"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    exercise_id = Column(Integer, ForeignKey("exercises.id", ondelete="CASCADE"), primary_key=True)
+    
+    theta = Column(JSON, nullable=False)  # Coefficients, dans l'ordre de performance_model.FEATURE_NAMES
+    covariance = Column(JSON, nullable=False)  # Matrice P aplatie (ligne par ligne)
+    samples = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UserStats(Base):
+    """Agrégat des statistiques du tableau de bord, tenu à jour à chaque série et séance terminée"""
+    __tablename__ = "user_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    total_workouts = Column(Integer, nullable=False, default=0)  # Séances terminées
+    total_volume_kg = Column(Float, nullable=False, default=0.0)  # Somme poids x reps de toutes les séries
+    last_workout_date = Column(DateTime, nullable=True)
+    recent_workouts = Column(JSON, nullable=False, default=list)  # Id des 3 dernières séances terminées (relues à la lecture)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class DailyExerciseVolume(Base):
+    """Agrégat quotidien par utilisateur et exercice des séries des séances terminées (jour = completed_at)"""
+    __tablename__ = "daily_exercise_volume"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    exercise_id = Column(Integer, ForeignKey("exercises.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    
+    volume = Column(Float, nullable=False, default=0.0)  # Somme poids x reps
+    set_count = Column(Integer, nullable=False, default=0)
+    max_weight = Column(Float, nullable=False, default=0.0)
+    max_reps = Column(Integer, nullable=False, default=0)
+    best_e1rm = Column(Float, nullable=False, default=0.0)  # 1RM estimé (Epley) de la meilleure série
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_daily_exercise_volume_user_day", "user_id", "day"),  # Progression sur une période
+    )
+
+
+class PersonalRecord(Base):
+    """Record personnel d'un utilisateur sur un exercice, par type (max_weight, max_reps, best_e1rm, best_volume_set)"""
+    __tablename__ = "personal_records"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    exercise_id = Column(Integer, ForeignKey("exercises.id", ondelete="CASCADE"), primary_key=True)
+    record_type = Column(String, primary_key=True)
+    
+    value = Column(Float, nullable=False)
+    workout_set_id = Column(Integer, nullable=True)  # Série du record (référence logique)
+    achieved_at = Column(DateTime, nullable=True)
+
+
+class CohortPrior(Base):
+    """Charge de départ médiane d'une cohorte d'utilisateurs sur un exercice (démarrage à froid)"""
+    __tablename__ = "cohort_priors"
+    
+    exercise_id = Column(Integer, ForeignKey("exercises.id", ondelete="CASCADE"), primary_key=True)
+    # "*" / -1 : cohorte agrégée sur toutes les valeurs de la dimension
+    experience_level = Column(String, primary_key=True)
+    bodyweight_band = Column(Integer, primary_key=True)  # Borne basse de la tranche de poids (kg)
+    age_band = Column(Integer, primary_key=True)  # Borne basse de la tranche d'âge (années)
+    
+    median_weight = Column(Float, nullable=False)
+    users = Column(Integer, nullable=False)  # Utilisateurs agrégés
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ProjectionCheckpoint(Base):
+    """Dernier id source traité par une projection (reprise après interruption)"""
+    __tablename__ = "projection_checkpoints"
+    
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,302 @@
+# ===== backend/performance_model.py - MODÈLE DE PERFORMANCE PAR UTILISATEUR =====
+"""
+Modèle linéaire compact, par (utilisateur, exercice), des répétitions atteignables
+à une charge donnée, appris en ligne sur SetHistory.
+
+    reps ≈ θ · [1, charge, fatigue, effort, repos (min), ordre exercice, ordre série]
+
+Les coefficients sont mis à jour à chaque série enregistrée par moindres carrés
+récursifs (RLS) avec oubli exponentiel (λ = 0.99 : les ~100 dernières séries
+dominent). Une mise à jour coûte O(d²) avec d = 7 : aucun réentraînement global.
+θ et la matrice P sont stockés dans user_performance_models ; un cache en mémoire
+sert l'inférence, qui n'est qu'un produit scalaire.
+
+Réentraînement complet (après une reconstruction de SetHistory, par exemple) :
+    python -m backend.performance_model --retrain
+"""
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Mapping, Optional, Sequence, Tuple
+import argparse
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.engine import Connection, Engine
+
+from backend.database import dialect_insert
+from backend.ml_cache import invalidate_exercise
+from backend.models import SetHistory, UserPerformanceModel
+
+logger = logging.getLogger(__name__)
+
+FEATURE_NAMES = ("bias", "weight", "fatigue", "effort", "rest_minutes", "exercise_order", "set_order")
+N_FEATURES = len(FEATURE_NAMES)
+
+FORGETTING = float(os.getenv("ML_RLS_FORGETTING", "0.99"))
+INITIAL_VARIANCE = 100.0
+# Borne de la trace de P : sans excitation d'une variable, l'oubli la fait croître sans fin
+MAX_COVARIANCE_TRACE = 1e6
+DEFAULT_REST_SECONDS = 90
+
+# Le modèle ne participe qu'à partir de MIN_SAMPLES séries, avec un poids croissant jusqu'à MAX_BLEND
+MIN_SAMPLES = 8
+MAX_BLEND = 0.6
+
+PairKey = Tuple[int, int]
+
+
+def features(
+    weight: float,
+    fatigue: int,
+    effort: int,
+    rest_seconds: Optional[int],
+    exercise_order: int,
+    set_order: int
+) -> np.ndarray:
+    return np.array([
+        1.0,
+        weight or 0.0,
+        fatigue,
+        effort,
+        (rest_seconds if rest_seconds is not None else DEFAULT_REST_SECONDS) / 60,
+        exercise_order,
+        set_order
+    ], dtype=float)
+
+
+def history_features(row: Mapping) -> Tuple[np.ndarray, float]:
+    """(x, y) d'une ligne SetHistory (valeurs de colonnes)"""
+    x = features(
+        row["weight"], row["fatigue_level"], row["effort_level"], row["rest_before_seconds"],
+        row["exercise_order_in_session"], row["set_order_in_session"]
+    )
+    return x, float(row["actual_reps"])
+
+
+class RLSModel:
+    """Moindres carrés récursifs avec facteur d'oubli"""
+
+    __slots__ = ("theta", "P", "samples")
+
+    def __init__(self, theta: Optional[np.ndarray] = None, P: Optional[np.ndarray] = None, samples: int = 0):
+        self.theta = np.zeros(N_FEATURES) if theta is None else theta
+        self.P = np.eye(N_FEATURES) * INITIAL_VARIANCE if P is None else P
+        self.samples = samples
+
+    def predict(self, x: np.ndarray) -> float:
+        return float(self.theta @ x)
+
+    def update(self, x: np.ndarray, y: float, forgetting: float = FORGETTING):
+        Px = self.P @ x
+        gain = Px / (forgetting + x @ Px)
+        self.theta = self.theta + gain * (y - self.theta @ x)
+        self.P = (self.P - np.outer(gain, Px)) / forgetting
+
+        trace = np.trace(self.P)
+        if trace > MAX_COVARIANCE_TRACE:
+            self.P *= MAX_COVARIANCE_TRACE / trace
+        self.samples += 1
+
+    @classmethod
+    def from_row(cls, row) -> "RLSModel":
+        return cls(
+            np.asarray(row.theta, dtype=float),
+            np.asarray(row.covariance, dtype=float).reshape(N_FEATURES, N_FEATURES),
+            row.samples
+        )
+
+    def to_values(self, user_id: int, exercise_id: int) -> Dict:
+        return {
+            "user_id": user_id,
+            "exercise_id": exercise_id,
+            "theta": self.theta.tolist(),
+            "covariance": self.P.ravel().tolist(),
+            "samples": self.samples,
+            "updated_at": datetime.utcnow()
+        }
+
+
+def blend_reps(heuristic_reps: int, model: Optional[RLSModel], x: np.ndarray) -> int:
+    """Mélange les reps heuristiques et la prédiction du modèle selon son nombre d'échantillons"""
+    if model is None or model.samples < MIN_SAMPLES:
+        return heuristic_reps
+    predicted = min(50.0, max(1.0, model.predict(x)))
+    alpha = MAX_BLEND * min(1.0, model.samples / (4 * MIN_SAMPLES))
+    return int(round(alpha * predicted + (1 - alpha) * heuristic_reps))
+
+
+class PerformanceModelStore:
+    """Modèles en mémoire (None = pas encore de modèle), à TTL pour suivre les autres workers"""
+
+    def __init__(self, max_entries: int = 20_000, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[PairKey, Tuple[float, Optional[RLSModel]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, db, user_id: int, exercise_ids: Iterable[int]) -> Dict[int, Optional[RLSModel]]:
+        """Modèles des exercices demandés ; les absents sont lus en une requête"""
+        models = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for exercise_id in set(exercise_ids):
+                entry = self._entries.get((user_id, exercise_id))
+                if entry is None or entry[0] < now:
+                    missing.append(exercise_id)
+                else:
+                    self._entries.move_to_end((user_id, exercise_id))
+                    models[exercise_id] = entry[1]
+            self.hits += len(models)
+            self.misses += len(missing)
+
+        if missing:
+            rows = db.execute(select(UserPerformanceModel).where(
+                UserPerformanceModel.user_id == user_id,
+                UserPerformanceModel.exercise_id.in_(missing)
+            )).scalars().all()
+            loaded = {row.exercise_id: RLSModel.from_row(row) for row in rows}
+            for exercise_id in missing:
+                models[exercise_id] = loaded.get(exercise_id)
+                self.put(user_id, exercise_id, models[exercise_id])
+        return models
+
+    def put(self, user_id: int, exercise_id: int, model: Optional[RLSModel]):
+        with self._lock:
+            self._entries[(user_id, exercise_id)] = (time.monotonic() + self.ttl, model)
+            self._entries.move_to_end((user_id, exercise_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+performance_models = PerformanceModelStore()
+
+
+def _upsert_models(connection: Connection, models: Mapping[PairKey, RLSModel]):
+    if not models:
+        return
+    stmt = dialect_insert(connection, UserPerformanceModel.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "exercise_id"],
+        set_={
+            "theta": stmt.excluded.theta,
+            "covariance": stmt.excluded.covariance,
+            "samples": stmt.excluded.samples,
+            "updated_at": stmt.excluded.updated_at
+        }
+    )
+    connection.execute(stmt, [model.to_values(*key) for key, model in models.items()])
+
+
+def update_models(connection: Connection, rows: Sequence[Mapping]) -> Dict[PairKey, RLSModel]:
+    """
+    Applique les nouvelles lignes SetHistory aux modèles concernés, dans la transaction
+    de l'appelant. Retourne les modèles à publier avec publish_models() après le commit.
+    """
+    rows = [row for row in rows if row.get("actual_reps") is not None]
+    if not rows:
+        return {}
+
+    pairs = {(row["user_id"], row["exercise_id"]) for row in rows}
+    stored = connection.execute(select(UserPerformanceModel).where(
+        tuple_(UserPerformanceModel.user_id, UserPerformanceModel.exercise_id).in_(pairs)
+    )).all()
+    models = {(row.user_id, row.exercise_id): RLSModel.from_row(row) for row in stored}
+
+    for row in sorted(rows, key=lambda r: r["date_performed"] or datetime.min):
+        key = (row["user_id"], row["exercise_id"])
+        x, y = history_features(row)
+        models.setdefault(key, RLSModel()).update(x, y)
+
+    _upsert_models(connection, models)
+    return models
+
+
+def publish_models(models: Mapping[PairKey, RLSModel]):
+    """Après commit : servir les nouveaux coefficients et périmer les recommandations mémoïsées"""
+    for (user_id, exercise_id), model in models.items():
+        performance_models.put(user_id, exercise_id, model)
+        invalidate_exercise(user_id, exercise_id)
+
+
+def train_all(engine: Engine, chunk_size: int = 5000) -> int:
+    """Réentraîne tous les modèles en rejouant SetHistory dans l'ordre chronologique"""
+    columns = [
+        SetHistory.user_id, SetHistory.exercise_id, SetHistory.weight, SetHistory.fatigue_level,
+        SetHistory.effort_level, SetHistory.rest_before_seconds, SetHistory.exercise_order_in_session,
+        SetHistory.set_order_in_session, SetHistory.actual_reps
+    ]
+    query = select(*columns).order_by(
+        SetHistory.user_id, SetHistory.exercise_id, SetHistory.date_performed, SetHistory.id
+    )
+
+    trained = 0
+    pending: Dict[PairKey, RLSModel] = {}
+    current_key, current_model = None, None
+
+    with engine.begin() as writer:
+        writer.execute(delete(UserPerformanceModel))
+
+        with engine.connect() as reader:
+            result = reader.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+            for row in result.mappings():
+                key = (row["user_id"], row["exercise_id"])
+                if key != current_key:
+                    current_key, current_model = key, RLSModel()
+                    pending[key] = current_model
+                    trained += 1
+                x, y = history_features(row)
+                current_model.update(x, y)
+
+                # Les paires terminées (tri par paire) sont écrites par paquets
+                if len(pending) > chunk_size // 10:
+                    finished = {k: m for k, m in pending.items() if k != current_key}
+                    _upsert_models(writer, finished)
+                    pending = {current_key: current_model}
+
+        _upsert_models(writer, pending)
+
+    performance_models.clear()
+    logger.info(f"✅ {trained} modèles de performance entraînés")
+    return trained
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Modèles de performance par utilisateur et exercice")
+    parser.add_argument("--retrain", action="store_true", help="Réentraîner tous les modèles depuis SetHistory")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    from backend.database import engine, Base
+    from backend.migrations import run_migrations
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    if args.retrain:
+        train_all(engine)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+# ===== backend/personal_records.py - RECORDS PERSONNELS =====
+"""
+Index des records personnels par (utilisateur, exercice, type de record), mis à
+jour à l'insertion de chaque série : lecture des ≤ 4 records de la paire puis un
+upsert gardé (la valeur ne fait qu'augmenter), sans parcourir l'historique.
+
+Types : max_weight, max_reps, best_e1rm (Epley), best_volume_set (charge x reps).
+La première série d'un exercice crée les records sans être annoncée comme record
+battu.
+
+RecordCache garde par paire les records validés connus (bornes basses : en base, un
+record ne fait que monter). Une série qui ne les dépasse pas ne lit ni n'écrit rien :
+le cas courant d'une séance. Publié après commit (publish_records), oublié quand
+l'historique de l'utilisateur est supprimé ; le TTL borne l'écart avec les autres
+workers. Historique antérieur à la table :
+    python -m backend.personal_records --backfill [--chunk-size 200]
+"""
+from datetime import datetime
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import argparse
+import logging
+import threading
+import time
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.engine import Engine
+
+from backend.database import dialect_insert
+from backend.models import PersonalRecord, User, Workout, WorkoutSet
+from backend.progress_rollup import estimated_one_rep_max
+
+logger = logging.getLogger(__name__)
+
+RECORD_TYPES = ("max_weight", "max_reps", "best_e1rm", "best_volume_set")
+DEFAULT_CHUNK_SIZE = 200
+# Lignes par instruction INSERT multi-valeurs (limite de paramètres SQLite)
+UPSERT_BATCH_ROWS = 1000
+
+
+PairKey = Tuple[int, int]
+
+
+class RecordCache:
+    """Records connus par (utilisateur, exercice), LRU à TTL"""
+
+    def __init__(self, max_entries: int = 20_000, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[PairKey, Tuple[float, Dict[str, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, exercise_id: int) -> Optional[Dict[str, float]]:
+        with self._lock:
+            entry = self._entries.get((user_id, exercise_id))
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end((user_id, exercise_id))
+            self.hits += 1
+            return entry[1]
+
+    def raise_to(self, user_id: int, exercise_id: int, values: Dict[str, float]):
+        """Relève les records connus de la paire (jamais à la baisse)"""
+        key = (user_id, exercise_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            merged = dict(entry[1]) if entry is not None and entry[0] >= time.monotonic() else {}
+            for record_type, value in values.items():
+                merged[record_type] = max(value, merged.get(record_type, value))
+            self._entries[key] = (time.monotonic() + self.ttl, merged)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+record_cache = RecordCache()
+
+
+def record_candidates(weight: Optional[float], reps: Optional[int]) -> Dict[str, float]:
+    """Valeurs de la série pour chaque type de record applicable"""
+    candidates = {}
+    if reps:
+        candidates["max_reps"] = float(reps)
+    if weight:
+        candidates["max_weight"] = float(weight)
+        if reps:
+            candidates["best_e1rm"] = round(estimated_one_rep_max(weight, reps), 2)
+            candidates["best_volume_set"] = float(weight * reps)
+    return candidates
+
+
+def _upsert_records(db, rows: List[Dict]):
+    """Insère ou relève les records ; retourne (type, valeur) des lignes écrites"""
+    table = PersonalRecord.__table__
+    stmt = dialect_insert(db, table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "exercise_id", "record_type"],
+        set_={
+            "value": stmt.excluded.value,
+            "workout_set_id": stmt.excluded.workout_set_id,
+            "achieved_at": stmt.excluded.achieved_at
+        },
+        where=table.c.value < stmt.excluded.value
+    )
+    return db.execute(stmt.returning(table.c.user_id, table.c.exercise_id, table.c.record_type, table.c.value)).all()
+
+
+def update_records(
+    db,
+    user_id: int,
+    exercise_id: int,
+    weight: Optional[float],
+    reps: Optional[int],
+    workout_set_id: Optional[int],
+    achieved_at: Optional[datetime]
+) -> List[Dict]:
+    """
+    Met à jour les records de la paire avec une nouvelle série, dans la transaction de
+    l'appelant. Retourne les records battus : [{"type", "value", "previous"}].
+    Records vus à publier avec publish_records(db) après le commit.
+    """
+    candidates = record_candidates(weight, reps)
+    if not candidates:
+        return []
+
+    # Aucune valeur au-dessus des records validés connus : rien à lire ni à écrire
+    known = record_cache.get(user_id, exercise_id)
+    if known is not None and all(v <= known.get(t, float("-inf")) for t, v in candidates.items()):
+        return []
+
+    previous = dict(db.execute(
+        select(PersonalRecord.record_type, PersonalRecord.value).where(
+            PersonalRecord.user_id == user_id,
+            PersonalRecord.exercise_id == exercise_id
+        )
+    ).all())
+
+    # Après commit, les records en base valent au moins ceux lus et ceux de la série
+    pending = db.info.setdefault("pending_records", {})
+    seen = pending.setdefault((user_id, exercise_id), {})
+    for record_type, value in (*previous.items(), *candidates.items()):
+        seen[record_type] = max(value, seen.get(record_type, value))
+
+    # Rien à écrire si aucune valeur ne dépasse le record actuel
+    improved = {t: v for t, v in candidates.items() if t not in previous or v > previous[t]}
+    if not improved:
+        return []
+
+    written = _upsert_records(db, [
+        {
+            "user_id": user_id,
+            "exercise_id": exercise_id,
+            "record_type": record_type,
+            "value": value,
+            "workout_set_id": workout_set_id,
+            "achieved_at": achieved_at
+        }
+        for record_type, value in improved.items()
+    ])
+    return [
+        {"type": row.record_type, "value": float(row.value), "previous": previous[row.record_type]}
+        for row in written
+        if row.record_type in previous
+    ]
+
+
+def publish_records(db):
+    """Après commit : records vus par la transaction servis depuis le cache"""
+    for (user_id, exercise_id), values in db.info.pop("pending_records", {}).items():
+        record_cache.raise_to(user_id, exercise_id, values)
+
+
+def discard_records(db):
+    """Après rollback : oublier les records vus par la transaction annulée"""
+    db.info.pop("pending_records", None)
+
+
+def get_records(db, user_id: int) -> Dict[int, Dict[str, Dict]]:
+    """Records de l'utilisateur par exercice puis par type"""
+    records: Dict[int, Dict[str, Dict]] = {}
+    for row in db.execute(select(PersonalRecord).where(PersonalRecord.user_id == user_id)).scalars():
+        records.setdefault(row.exercise_id, {})[row.record_type] = {
+            "value": row.value,
+            "workout_set_id": row.workout_set_id,
+            "achieved_at": row.achieved_at
+        }
+    return records
+
+
+def delete_user_records(db, user_id: int):
+    db.execute(delete(PersonalRecord).where(PersonalRecord.user_id == user_id))
+
+
+def _record_expressions():
+    weight, reps = WorkoutSet.weight, WorkoutSet.reps
+    weighted = (weight.isnot(None), weight > 0)
+    return {
+        "max_weight": (weight, weighted),
+        "max_reps": (reps, (reps > 0,)),
+        "best_e1rm": (estimated_one_rep_max(weight, reps), weighted + (reps > 0,)),
+        "best_volume_set": (weight * reps, weighted + (reps > 0,))
+    }
+
+
+def backfill(engine: Engine, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, int]:
+    """Recalcule les records depuis WorkoutSet, une transaction par paquet d'utilisateurs"""
+    with engine.connect() as connection:
+        user_ids = connection.execute(select(User.id).order_by(User.id)).scalars().all()
+
+    stats = {"users": 0, "records": 0, "chunks": 0}
+    for i in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[i:i + chunk_size]
+        rows = []
+        with engine.begin() as connection:
+            for record_type, (expression, conditions) in _record_expressions().items():
+                # Meilleure série de chaque paire (la plus ancienne en cas d'égalité)
+                ranked = select(
+                    Workout.user_id, WorkoutSet.exercise_id, WorkoutSet.id, WorkoutSet.completed_at,
+                    expression.label("value"),
+                    func.row_number().over(
+                        partition_by=(Workout.user_id, WorkoutSet.exercise_id),
+                        order_by=(expression.desc(), WorkoutSet.id)
+                    ).label("rank")
+                ).join(Workout, Workout.id == WorkoutSet.workout_id).where(
+                    Workout.user_id.in_(chunk), *conditions
+                ).subquery("ranked")
+
+                for row in connection.execute(select(ranked).where(ranked.c.rank == 1)):
+                    rows.append({
+                        "user_id": row.user_id,
+                        "exercise_id": row.exercise_id,
+                        "record_type": record_type,
+                        "value": round(float(row.value), 2),
+                        "workout_set_id": row.id,
+                        "achieved_at": row.completed_at
+                    })
+            for start in range(0, len(rows), UPSERT_BATCH_ROWS):
+                _upsert_records(connection, rows[start:start + UPSERT_BATCH_ROWS])
+
+        stats["users"] += len(chunk)
+        stats["records"] += len(rows)
+        stats["chunks"] += 1
+        logger.info(f"📦 Paquet {stats['chunks']}: {len(chunk)} utilisateurs, {len(rows)} records")
+
+    logger.info(f"✅ Records personnels: {stats['records']} records pour {stats['users']} utilisateurs")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index des records personnels")
+    parser.add_argument("--backfill", action="store_true", help="Calculer les records depuis l'historique")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Utilisateurs par paquet")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    from backend.database import engine, Base
+    from backend.migrations import run_migrations
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    if args.backfill:
+        backfill(engine, chunk_size=args.chunk_size)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
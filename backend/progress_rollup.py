@@ -0,0 +1,197 @@
+# ===== backend/progress_rollup.py - AGRÉGAT QUOTIDIEN DE PROGRESSION =====
+"""
+Agrégat daily_exercise_volume : par (utilisateur, exercice, jour de fin de séance),
+volume, nombre de séries, charge et reps maximales, meilleur 1RM estimé.
+
+Chaque écriture recalcule les jours touchés depuis les séries (séance terminée,
+série ajoutée à une séance déjà terminée, séance synchronisée) et remplace leurs
+lignes : une journée compte quelques dizaines de séries, et un recalcul est
+idempotent (rejouer ou paralléliser l'écriture ne compte jamais deux fois).
+
+GET /progress lit l'agrégat, regroupé par jour, semaine (lundi) ou mois côté base :
+coût proportionnel au nombre de jours, et non plus au nombre de séries. Les groupes
+sans charge (poids du corps seul) sont renvoyés avec un volume nul.
+
+Remplissage de l'historique existant, par paquets d'utilisateurs :
+    python -m backend.progress_rollup --backfill [--chunk-size 200]
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Literal, Tuple
+import argparse
+import logging
+
+from sqlalchemy import Date, case, cast, delete, func, select
+from sqlalchemy.engine import Engine
+
+from backend.database import dialect_insert
+from backend.models import DailyExerciseVolume, User, Workout, WorkoutSet
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 200
+
+RollupKey = Tuple[int, int, date]
+ProgressBucket = Literal["day", "week", "month"]
+
+
+def estimated_one_rep_max(weight, reps):
+    """1RM estimé (Epley) : charge x (1 + reps / 30) ; accepte des expressions SQL"""
+    return weight * (1 + reps / 30.0)
+
+
+def _aggregate(db, *conditions) -> List[Dict]:
+    """Lignes d'agrégat des séances terminées filtrées par `conditions`"""
+    day = func.date(Workout.completed_at)
+    weight = func.coalesce(WorkoutSet.weight, 0)
+    reps = func.coalesce(WorkoutSet.reps, 0)
+    rows = db.execute(
+        select(
+            Workout.user_id,
+            WorkoutSet.exercise_id,
+            day.label("day"),
+            func.sum(case((WorkoutSet.weight.isnot(None), WorkoutSet.weight * WorkoutSet.reps), else_=0)).label("volume"),
+            func.count(WorkoutSet.id).label("set_count"),
+            func.max(weight).label("max_weight"),
+            func.max(reps).label("max_reps"),
+            func.max(estimated_one_rep_max(weight, reps)).label("best_e1rm")
+        ).join(WorkoutSet, WorkoutSet.workout_id == Workout.id).where(
+            Workout.status == "completed",
+            Workout.completed_at.isnot(None),
+            *conditions
+        ).group_by(Workout.user_id, WorkoutSet.exercise_id, day)
+    ).all()
+
+    now = datetime.utcnow()
+    return [
+        {
+            "user_id": row.user_id,
+            "exercise_id": row.exercise_id,
+            # date() SQLite renvoie une chaîne, PostgreSQL une date
+            "day": date.fromisoformat(str(row.day)),
+            "volume": float(row.volume or 0),
+            "set_count": row.set_count,
+            "max_weight": float(row.max_weight or 0),
+            "max_reps": int(row.max_reps or 0),
+            "best_e1rm": round(float(row.best_e1rm or 0), 2),
+            "updated_at": now
+        }
+        for row in rows
+    ]
+
+
+def _upsert(db, rows: List[Dict]):
+    if not rows:
+        return
+    stmt = dialect_insert(db, DailyExerciseVolume.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "exercise_id", "day"],
+        set_={
+            name: stmt.excluded[name]
+            for name in ("volume", "set_count", "max_weight", "max_reps", "best_e1rm", "updated_at")
+        }
+    )
+    db.execute(stmt, rows)
+
+
+def refresh_days(db, user_id: int, days: Iterable[date]):
+    """Recalcule les jours donnés d'un utilisateur, dans la transaction de l'appelant"""
+    for day in set(days):
+        start = datetime.combine(day, time.min)
+        # Lignes du jour supprimées d'abord : un exercice qui n'y figure plus (séance
+        # re-terminée un autre jour) ne doit pas y rester compté
+        db.execute(delete(DailyExerciseVolume).where(
+            DailyExerciseVolume.user_id == user_id,
+            DailyExerciseVolume.day == day
+        ))
+        _upsert(db, _aggregate(
+            db,
+            Workout.user_id == user_id,
+            Workout.completed_at >= start,
+            Workout.completed_at < start + timedelta(days=1)
+        ))
+
+
+def bucket_start(bind, bucket: ProgressBucket):
+    """Expression SQL du premier jour du groupe (jour, semaine ISO, mois) de DailyExerciseVolume.day"""
+    day = DailyExerciseVolume.day
+    if bucket == "day":
+        return day
+    dialect = bind.get_bind().dialect if hasattr(bind, "get_bind") else bind.dialect
+    if dialect.name == "postgresql":
+        return cast(func.date_trunc(bucket, day), Date)
+    if bucket == "week":
+        # Dimanche suivant (ou le jour même) - 6 jours = lundi de la semaine
+        return func.date(day, "weekday 0", "-6 days")
+    return func.strftime("%Y-%m-01", day)
+
+
+def volume_by_bucket(bind, user_id: int, since: date, bucket: ProgressBucket):
+    """Volume et séries par groupe de jours depuis `since`, dans l'ordre chronologique"""
+    start = bucket_start(bind, bucket).label("date")
+    return select(
+        start,
+        func.sum(DailyExerciseVolume.volume).label("volume"),
+        func.sum(DailyExerciseVolume.set_count).label("set_count")
+    ).where(
+        DailyExerciseVolume.user_id == user_id,
+        DailyExerciseVolume.day >= since
+    ).group_by(start).order_by(start)
+
+
+def records_since(user_id: int, since: date):
+    """Charge et reps maximales par exercice depuis `since`"""
+    return select(
+        DailyExerciseVolume.exercise_id,
+        func.max(DailyExerciseVolume.max_weight).label("max_weight"),
+        func.max(DailyExerciseVolume.max_reps).label("max_reps")
+    ).where(
+        DailyExerciseVolume.user_id == user_id,
+        DailyExerciseVolume.day >= since
+    ).group_by(DailyExerciseVolume.exercise_id)
+
+
+def delete_user_rollup(db, user_id: int):
+    db.execute(delete(DailyExerciseVolume).where(DailyExerciseVolume.user_id == user_id))
+
+
+def backfill(engine: Engine, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, int]:
+    """Recalcule l'agrégat de tous les utilisateurs, une transaction par paquet d'utilisateurs"""
+    with engine.connect() as connection:
+        user_ids = connection.execute(select(User.id).order_by(User.id)).scalars().all()
+
+    stats = {"users": 0, "rows": 0, "chunks": 0}
+    for i in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[i:i + chunk_size]
+        with engine.begin() as connection:
+            rows = _aggregate(connection, Workout.user_id.in_(chunk))
+            _upsert(connection, rows)
+        stats["users"] += len(chunk)
+        stats["rows"] += len(rows)
+        stats["chunks"] += 1
+        logger.info(f"📦 Paquet {stats['chunks']}: {len(chunk)} utilisateurs, {len(rows)} lignes")
+
+    logger.info(f"✅ Agrégat quotidien rempli: {stats['rows']} lignes pour {stats['users']} utilisateurs")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agrégat quotidien de progression par exercice")
+    parser.add_argument("--backfill", action="store_true", help="Recalculer l'agrégat depuis les séries")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Utilisateurs par paquet")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    from backend.database import engine, Base
+    from backend.migrations import run_migrations
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    if args.backfill:
+        backfill(engine, chunk_size=args.chunk_size)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 # ===== backend/schemas.py - VERSION REFACTORISÉE =====
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from pydantic import BaseModel, TypeAdapter, field_validator
+from typing import List, Optional, Dict, Any, Literal
+from datetime import datetime, timezone
+from uuid import UUID
 
 
 # ===== SCHEMAS UTILISATEUR =====
@@ -118,6 +119,40 @@ class SetCreate(BaseModel):
     set_order_in_session: Optional[int] = None
 
 
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Ramène une date avec fuseau (ex. toISOString() côté JS, "...Z") en UTC naïf, comme en base"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class WorkoutSyncSet(SetCreate):
+    completed_at: Optional[datetime] = None
+
+    _naive_completed_at = field_validator("completed_at")(to_naive_utc)
+
+
+class WorkoutSync(BaseModel):
+    """Séance complète enregistrée hors ligne et envoyée en une seule requête"""
+    client_uuid: UUID  # Généré par le client : rend la synchronisation idempotente
+    type: str  # "free" ou "program"
+    program_id: Optional[int] = None
+    status: Literal["completed", "abandoned"] = "completed"
+    started_at: datetime
+    completed_at: Optional[datetime] = None
+    total_duration_minutes: Optional[int] = None
+    session_notes: Optional[str] = None
+    overall_fatigue_start: Optional[int] = None  # 1-5
+    overall_fatigue_end: Optional[int] = None  # 1-5
+    sets: List[WorkoutSyncSet] = []
+
+    _naive_dates = field_validator("started_at", "completed_at")(to_naive_utc)
+
+
+# Validation du corps brut en une seule passe (JSON -> modèles, sans dict intermédiaire)
+workout_sync_adapter = TypeAdapter(WorkoutSync)
+
+
 class SetResponse(BaseModel):
     id: int
     workout_id: int
@@ -155,6 +190,11 @@ class RecommendationRequest(BaseModel):
     set_order_global: int = 1
 
 
+class BatchRecommendationRequest(BaseModel):
+    """Tous les slots (exercice, série, position) d'une séance planifiée"""
+    slots: List[RecommendationRequest]
+
+
 class RecommendationResponse(BaseModel):
     weight_recommendation: Optional[float]
     reps_recommendation: int
@@ -0,0 +1,229 @@
+# ===== backend/set_history_projection.py - PROJECTION SetHistory DEPUIS WorkoutSet =====
+"""
+Reconstruit SetHistory (historique ML) à partir de la source de vérité WorkoutSet.
+
+SetHistory duplique des champs de WorkoutSet et n'était alimenté que si la fatigue et
+l'effort étaient envoyés : cette projection le régénère par paquets.
+
+- Lecture par paquets de WorkoutSet joint à Workout, dans l'ordre des id (pagination
+  par clé). Chaque paquet est lu entièrement avant d'être écrit : aucun curseur n'est
+  ouvert pendant un commit, ce qui fonctionne aussi hors WAL en SQLite.
+- Ordres dérivés par fonctions fenêtre quand le client ne les a pas envoyés :
+  position de l'exercice dans la séance, rang global de la série, numéro de série.
+  Les fenêtres ne portent que sur les séances du paquet.
+- Fatigue / effort absents : valeur neutre 3 (échelle 1-5).
+- Insertion groupée par paquet, en ignorant les séries déjà projetées (index unique
+  sur workout_set_id) : sûr sur une base en production, en parallèle des écritures.
+- Point de reprise (dernier id traité) enregistré avec chaque paquet. Un id plus bas
+  peut être validé après un id plus haut (transactions concurrentes en PostgreSQL) :
+  chaque run relit donc une fenêtre d'id sous le point de reprise (--rescan-window),
+  les séries déjà projetées y sont ignorées par l'index unique.
+
+Usage :
+    python -m backend.set_history_projection              # incrémental (reprise)
+    python -m backend.set_history_projection --rebuild    # tout régénérer
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+import argparse
+import logging
+
+from sqlalchemy import func, select, delete
+from sqlalchemy.engine import Connection, Engine
+
+from backend.database import dialect_insert
+from backend.models import Workout, WorkoutSet, SetHistory, ProjectionCheckpoint
+
+logger = logging.getLogger(__name__)
+
+PROJECTION_NAME = "set_history"
+DEFAULT_CHUNK_SIZE = 1000
+
+# Nombre d'id relus sous le point de reprise (séries validées en retard)
+DEFAULT_RESCAN_WINDOW = 1000
+
+# Valeur neutre quand la fatigue ou l'effort n'ont pas été saisis
+NEUTRAL_LEVEL = 3
+
+
+def _source_query(after_id: int, chunk_size: int):
+    """WorkoutSet + Workout avec les ordres dérivés, pour les chunk_size séries d'id > after_id"""
+    sets = WorkoutSet.__table__
+
+    # Séances du paquet : les fenêtres sont partitionnées par séance, inutile de parcourir le reste
+    chunk_workouts = select(sets.c.workout_id).where(
+        sets.c.id > after_id
+    ).order_by(sets.c.id).limit(chunk_size)
+
+    # Niveau 1 : première série de chaque exercice, rang global et rang dans l'exercice
+    ranked = select(
+        sets,
+        func.min(sets.c.id).over(
+            partition_by=(sets.c.workout_id, sets.c.exercise_id)
+        ).label("first_exercise_set_id"),
+        func.row_number().over(
+            partition_by=sets.c.workout_id, order_by=sets.c.id
+        ).label("derived_set_order"),
+        func.row_number().over(
+            partition_by=(sets.c.workout_id, sets.c.exercise_id), order_by=sets.c.id
+        ).label("derived_set_number"),
+    ).where(
+        sets.c.workout_id.in_(chunk_workouts.scalar_subquery())
+    ).subquery("ranked")
+
+    # Niveau 2 : position de l'exercice = rang de sa première série dans la séance
+    ordered = select(
+        ranked,
+        func.dense_rank().over(
+            partition_by=ranked.c.workout_id, order_by=ranked.c.first_exercise_set_id
+        ).label("derived_exercise_order"),
+    ).subquery("ordered")
+
+    return select(
+        ordered,
+        Workout.user_id,
+        Workout.overall_fatigue_start,
+        Workout.started_at,
+    ).join(
+        Workout, Workout.id == ordered.c.workout_id
+    ).where(
+        ordered.c.id > after_id
+    ).order_by(ordered.c.id).limit(chunk_size)
+
+
+def project_row(row) -> Dict[str, Any]:
+    """Valeurs SetHistory d'une série source (mêmes règles que l'enregistrement en direct)"""
+    target_reps = row.target_reps or row.reps
+    return {
+        "workout_set_id": row.id,
+        "user_id": row.user_id,
+        "exercise_id": row.exercise_id,
+        "weight": row.weight or 0,
+        "reps": row.reps,
+        "actual_reps": row.reps,
+        "fatigue_level": row.fatigue_level or NEUTRAL_LEVEL,
+        "effort_level": row.effort_level or NEUTRAL_LEVEL,
+        "exercise_order_in_session": row.exercise_order_in_session or row.derived_exercise_order,
+        "set_order_in_session": row.set_order_in_session or row.derived_set_order,
+        "set_number_in_exercise": row.set_number or row.derived_set_number,
+        "rest_before_seconds": row.rest_time_seconds,
+        "session_fatigue_start": row.overall_fatigue_start,
+        "success": row.reps >= target_reps,
+        "date_performed": row.completed_at or row.started_at,
+    }
+
+
+def get_checkpoint(connection: Connection, name: str = PROJECTION_NAME) -> int:
+    last_id = connection.execute(
+        select(ProjectionCheckpoint.last_id).where(ProjectionCheckpoint.name == name)
+    ).scalar()
+    return last_id or 0
+
+
+def _save_checkpoint(connection: Connection, last_id: int, name: str = PROJECTION_NAME):
+    stmt = dialect_insert(connection, ProjectionCheckpoint.__table__).values(
+        name=name, last_id=last_id, updated_at=datetime.utcnow()
+    )
+    connection.execute(stmt.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"last_id": stmt.excluded.last_id, "updated_at": stmt.excluded.updated_at}
+    ))
+
+
+def _insert_projected(connection: Connection, rows: Iterable[Dict[str, Any]]) -> int:
+    rows = list(rows)
+    if not rows:
+        return 0
+    stmt = dialect_insert(connection, SetHistory.__table__).on_conflict_do_nothing(
+        index_elements=["workout_set_id"]
+    )
+    return connection.execute(stmt, rows).rowcount or 0
+
+
+def _count_unlinked_history(connection: Connection) -> int:
+    return connection.execute(
+        select(func.count()).select_from(SetHistory).where(SetHistory.workout_set_id.is_(None))
+    ).scalar()
+
+
+def rebuild(engine: Engine):
+    """Vide SetHistory et le point de reprise ; le prochain run() régénère tout"""
+    with engine.begin() as connection:
+        deleted = connection.execute(delete(SetHistory)).rowcount
+        _save_checkpoint(connection, 0)
+    logger.info(f"🗑️ SetHistory vidé ({deleted} lignes), reconstruction depuis l'id 0")
+
+
+def run(
+    engine: Engine,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    limit: Optional[int] = None,
+    rescan_window: int = DEFAULT_RESCAN_WINDOW
+) -> Dict[str, int]:
+    """
+    Projette les séries d'id supérieur au point de reprise (moins la fenêtre de relecture),
+    paquet par paquet. Chaque paquet est inséré et le point de reprise avancé dans la même
+    transaction : une interruption reprend au dernier paquet validé.
+    """
+    with engine.connect() as connection:
+        checkpoint = get_checkpoint(connection)
+        if checkpoint == 0 and _count_unlinked_history(connection):
+            # Lignes antérieures au lien workout_set_id : impossible de savoir quelles séries elles couvrent
+            raise RuntimeError(
+                "SetHistory contient des lignes sans workout_set_id : lancer d'abord --rebuild"
+            )
+
+    after_id = max(0, checkpoint - rescan_window)
+    stats = {"read": 0, "inserted": 0, "chunks": 0, "last_id": checkpoint}
+
+    while limit is None or stats["read"] < limit:
+        size = chunk_size if limit is None else min(chunk_size, limit - stats["read"])
+        # Paquet lu entièrement, connexion de lecture rendue avant l'écriture
+        with engine.connect() as reader:
+            chunk = reader.execute(_source_query(after_id, size)).all()
+        if not chunk:
+            break
+
+        after_id = chunk[-1].id
+        with engine.begin() as writer:
+            stats["inserted"] += _insert_projected(writer, (project_row(row) for row in chunk))
+            # Ne jamais reculer le point de reprise pendant la relecture de la fenêtre
+            if after_id > stats["last_id"]:
+                _save_checkpoint(writer, after_id)
+                stats["last_id"] = after_id
+
+        stats["read"] += len(chunk)
+        stats["chunks"] += 1
+        logger.info(f"📦 Paquet {stats['chunks']}: {len(chunk)} séries, jusqu'à l'id {after_id}")
+
+    logger.info(
+        f"✅ Projection SetHistory: {stats['read']} séries lues, {stats['inserted']} lignes insérées"
+    )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Projection SetHistory depuis WorkoutSet")
+    parser.add_argument("--rebuild", action="store_true", help="Vider SetHistory et tout régénérer")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Séries par paquet")
+    parser.add_argument("--limit", type=int, default=None, help="Nombre maximum de séries à traiter")
+    parser.add_argument(
+        "--rescan-window", type=int, default=DEFAULT_RESCAN_WINDOW,
+        help="Id relus sous le point de reprise (séries validées en retard)"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    from backend.database import engine, Base
+    from backend.migrations import run_migrations
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    if args.rebuild:
+        rebuild(engine)
+    run(engine, chunk_size=args.chunk_size, limit=args.limit, rescan_window=args.rescan_window)
+
+
+if __name__ == "__main__":
+    main()
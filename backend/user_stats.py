@@ -0,0 +1,242 @@
+# ===== backend/user_stats.py - AGRÉGAT DES STATISTIQUES UTILISATEUR =====
+"""
+Statistiques du tableau de bord (séances terminées, volume total, dernière séance,
+3 séances récentes) tenues à jour dans une ligne user_stats par utilisateur.
+
+- add_set / sync : le volume de la série est ajouté dans la transaction de la série.
+- complete_workout / sync d'une séance terminée : compteur, date et ids des séances
+  récentes mis à jour dans la transaction de la séance (ligne verrouillée).
+- Séances récentes stockées par id et relues à chaque lecture : une séance modifiée
+  ou complétée après coup n'est jamais servie périmée.
+- Pas de ligne (utilisateur antérieur à l'agrégat, historique vidé) : la première
+  mise à jour la recalcule depuis les séances, dans sa propre transaction, donc série
+  ou séance en cours comprise. Une lecture sans ligne recalcule sans rien écrire. Si une autre transaction l'a créée entre-temps
+  (insert en conflit), l'incrément est appliqué à sa ligne : aucune écriture perdue.
+
+GET /api/users/{id}/stats devient une lecture par clé primaire, sans écriture.
+Vérification de la dérive et réparation :
+    python -m backend.user_stats            # rapport
+    python -m backend.user_stats --repair   # réécrire les lignes divergentes
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional
+import argparse
+import logging
+
+from sqlalchemy import desc, func, select, update, delete
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from backend.database import dialect_insert
+from backend.models import User, UserStats, Workout, WorkoutSet
+
+logger = logging.getLogger(__name__)
+
+RECENT_WORKOUTS = 3
+# Écart de volume toléré (arrondis flottants des additions successives)
+VOLUME_TOLERANCE_KG = 0.01
+
+
+def workout_summary(workout: Mapping[str, Any]) -> Dict[str, Any]:
+    """Colonnes d'une séance, sérialisées pour la liste des séances récentes"""
+    summary = {}
+    for column in Workout.__table__.columns:
+        value = workout[column.name]
+        summary[column.name] = value.isoformat() if isinstance(value, datetime) else value
+    return summary
+
+
+def set_volume(weight: Optional[float], reps: Optional[int]) -> float:
+    return (weight or 0) * (reps or 0)
+
+
+def _create_row(db, user_id: int) -> bool:
+    """Crée la ligne depuis un recalcul ; False si une autre transaction l'a créée avant"""
+    row = compute_stats(db, user_id)
+    return db.execute(dialect_insert(db, UserStats.__table__).values(**row).on_conflict_do_nothing(
+        index_elements=["user_id"]
+    )).rowcount == 1
+
+
+def _increment_volume(db, user_id: int, volume: float) -> bool:
+    # UPDATE sur la table (pas l'entité ORM) : ni synchronisation de session ni surcoût, chemin de add_set
+    stats = UserStats.__table__
+    return db.execute(
+        update(stats).where(stats.c.user_id == user_id).values(
+            total_volume_kg=stats.c.total_volume_kg + volume,
+            updated_at=datetime.utcnow()
+        )
+    ).rowcount > 0
+
+
+def add_volume(db, user_id: int, volume: float):
+    """Ajoute le volume de nouvelles séries (déjà insérées dans la transaction)"""
+    if not volume:
+        return
+    if _increment_volume(db, user_id, volume) or _create_row(db, user_id):
+        return
+    # Ligne créée par une transaction concurrente, sans nos séries : incrémenter la sienne
+    _increment_volume(db, user_id, volume)
+
+
+def _apply_completed_workout(
+    db, user_id: int, workout: Mapping[str, Any], newly_completed: bool, volume: float
+) -> bool:
+    stats = db.execute(
+        select(UserStats.total_workouts, UserStats.last_workout_date, UserStats.recent_workouts)
+        .where(UserStats.user_id == user_id).with_for_update()
+    ).first()
+    if stats is None:
+        return False
+
+    # Séances récentes : (id, date de fin) relus pour trier, la séance courante avec sa nouvelle date
+    others = [workout_id for workout_id in stats.recent_workouts if workout_id != workout["id"]]
+    completed = dict(db.execute(
+        select(Workout.id, Workout.completed_at).where(Workout.id.in_(others))
+    ).all()) if others else {}
+    completed[workout["id"]] = workout["completed_at"]
+    recent = sorted(completed, key=lambda i: completed[i] or datetime.min, reverse=True)[:RECENT_WORKOUTS]
+
+    table = UserStats.__table__
+    db.execute(
+        update(table).where(table.c.user_id == user_id).values(
+            total_workouts=stats.total_workouts + (1 if newly_completed else 0),
+            total_volume_kg=table.c.total_volume_kg + volume,
+            last_workout_date=completed[recent[0]],
+            recent_workouts=recent,
+            updated_at=datetime.utcnow()
+        )
+    )
+    return True
+
+
+def add_completed_workout(
+    db, user_id: int, workout: Mapping[str, Any], newly_completed: bool = True, volume: float = 0.0
+):
+    """
+    Compte une séance terminée (déjà écrite dans la transaction) et la place dans les
+    séances récentes ; newly_completed=False pour une séance re-terminée (nouvelle date
+    de fin, pas de nouveau compte). volume : séries de la séance pas encore comptées.
+    """
+    if _apply_completed_workout(db, user_id, workout, newly_completed, volume) or _create_row(db, user_id):
+        return
+    _apply_completed_workout(db, user_id, workout, newly_completed, volume)
+
+
+def _recent_workouts(db, user_id: int) -> List[Mapping[str, Any]]:
+    return db.execute(
+        select(Workout.__table__).where(Workout.user_id == user_id, Workout.status == "completed")
+        .order_by(desc(Workout.completed_at)).limit(RECENT_WORKOUTS)
+    ).mappings().all()
+
+
+def compute_stats(db, user_id: int) -> Dict[str, Any]:
+    """Recalcule l'agrégat depuis les séances et les séries"""
+    completed = (Workout.user_id == user_id, Workout.status == "completed")
+
+    total_workouts = db.execute(select(func.count(Workout.id)).where(*completed)).scalar()
+    total_volume = db.execute(
+        select(func.sum(WorkoutSet.weight * WorkoutSet.reps)).join(Workout).where(
+            Workout.user_id == user_id,
+            WorkoutSet.weight.isnot(None)
+        )
+    ).scalar() or 0
+    recent = _recent_workouts(db, user_id)
+
+    return {
+        "user_id": user_id,
+        "total_workouts": total_workouts,
+        "total_volume_kg": float(total_volume),
+        "last_workout_date": recent[0]["completed_at"] if recent else None,
+        "recent_workouts": [w["id"] for w in recent],
+        "updated_at": datetime.utcnow()
+    }
+
+
+def read_user_stats(db: Session, user_id: int) -> Dict[str, Any]:
+    """Ligne d'agrégat (lecture par clé) et ses séances récentes ; sans ligne, recalcul sans écriture"""
+    row = db.execute(select(UserStats.__table__).where(UserStats.user_id == user_id)).mappings().first()
+    if row is None:
+        # Pas d'écriture sur un GET : la prochaine série ou séance terminée crée la ligne
+        row = compute_stats(db, user_id)
+
+    # Séances récentes relues par clé : jamais de copie périmée
+    workouts = {
+        w["id"]: w for w in db.execute(
+            select(Workout.__table__).where(Workout.id.in_(row["recent_workouts"]))
+        ).mappings()
+    } if row["recent_workouts"] else {}
+
+    return {
+        "total_workouts": row["total_workouts"],
+        "last_workout_date": row["last_workout_date"],
+        "total_volume_kg": round(row["total_volume_kg"], 1),
+        "recent_workouts": [workout_summary(workouts[i]) for i in row["recent_workouts"] if i in workouts]
+    }
+
+
+def reset_stats(db, user_id: int):
+    """Supprime l'agrégat (recréé par la prochaine série ou séance terminée)"""
+    db.execute(delete(UserStats).where(UserStats.user_id == user_id))
+
+
+def _drift(stored: UserStats, expected: Dict[str, Any]) -> List[str]:
+    fields = []
+    if stored.total_workouts != expected["total_workouts"]:
+        fields.append("total_workouts")
+    if abs(stored.total_volume_kg - expected["total_volume_kg"]) > VOLUME_TOLERANCE_KG:
+        fields.append("total_volume_kg")
+    if stored.last_workout_date != expected["last_workout_date"]:
+        fields.append("last_workout_date")
+    if stored.recent_workouts != expected["recent_workouts"]:
+        fields.append("recent_workouts")
+    return fields
+
+
+def check(engine: Engine, repair: bool = False) -> Dict[str, int]:
+    """Compare chaque agrégat au recalcul ; avec repair, réécrit les lignes divergentes"""
+    report = {"checked": 0, "drifted": 0, "repaired": 0}
+    with Session(engine) as db:
+        user_ids = db.execute(select(User.id).order_by(User.id)).scalars().all()
+        for user_id in user_ids:
+            stored = db.get(UserStats, user_id, with_for_update=repair)
+            if stored is None:
+                continue
+            report["checked"] += 1
+
+            expected = compute_stats(db, user_id)
+            fields = _drift(stored, expected)
+            if fields:
+                report["drifted"] += 1
+                logger.warning(f"❌ Utilisateur {user_id}: dérive sur {', '.join(fields)}")
+                if repair:
+                    for name, value in expected.items():
+                        setattr(stored, name, value)
+                    report["repaired"] += 1
+            if repair:
+                db.commit()
+            db.expunge_all()
+
+    logger.info(
+        f"✅ {report['checked']} agrégats vérifiés, {report['drifted']} divergents, {report['repaired']} réparés"
+    )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vérification de l'agrégat user_stats")
+    parser.add_argument("--repair", action="store_true", help="Réécrire les agrégats divergents")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    from backend.database import engine, Base
+    from backend.migrations import run_migrations
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    check(engine, repair=args.repair)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+# ===== backend/weight_engine.py - MOTEUR DE CHARGES RÉALISABLES =====
+"""
+Calcul unique des charges réalisables à partir d'un inventaire de disques.
+
+Tout est fait en unités entières (grammes, puis PGCD des disques) pour éviter les
+erreurs d'arrondi flottant. Les sommes atteignables sont calculées par un sous-ensemble
+borné (bounded subset-sum) sur un bitset NumPy : chaque type de disque est découpé en
+paquets 1, 2, 4, ... (découpage binaire) et chaque paquet décale le bitset une fois.
+Coût : O(types × log(quantité) × charge_max / pgcd), donc polynomial, là où
+l'énumération des combinaisons explose exponentiellement.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache, reduce
+from math import gcd
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple, Union
+import json
+
+import numpy as np
+
+GRAMS_PER_KG = 1000
+
+# Inventaire brut tel que stocké dans equipment_config :
+# {"20": 4, "10": 2} (poids -> quantité) ou [20, 10, 5] (quantité inconnue)
+RawInventory = Union[Mapping[Union[str, float, int], int], Iterable[Union[str, float, int]]]
+
+
+def to_grams(kg: Union[str, float, int]) -> int:
+    """Convertit des kg (éventuellement en chaîne JSON) en grammes entiers"""
+    return int(round(float(kg) * GRAMS_PER_KG))
+
+
+def to_kg(grams: Union[int, np.ndarray]) -> Union[float, np.ndarray]:
+    return grams / GRAMS_PER_KG
+
+
+def normalize_inventory(plates: Optional[RawInventory], default_count: int = 1) -> Dict[int, int]:
+    """
+    Normalise un inventaire en {grammes: quantité}.
+    Une liste de poids sans quantité utilise default_count pour chaque poids.
+    """
+    inventory: Dict[int, int] = {}
+    if not plates:
+        return inventory
+
+    items = plates.items() if isinstance(plates, Mapping) else ((w, default_count) for w in plates)
+    for weight, count in items:
+        grams = to_grams(weight)
+        count = int(count or 0)
+        if grams > 0 and count > 0:
+            inventory[grams] = inventory.get(grams, 0) + count
+    return inventory
+
+
+def subset_sums_grams(inventory: Mapping[int, int], max_total: Optional[int] = None) -> np.ndarray:
+    """
+    Toutes les sommes atteignables (en grammes, triées, 0 inclus) en utilisant
+    au plus `quantité` disques de chaque poids.
+    """
+    inventory = {w: c for w, c in inventory.items() if w > 0 and c > 0}
+    if not inventory:
+        return np.zeros(1, dtype=np.int64)
+
+    unit = reduce(gcd, inventory)
+    total = sum(w * c for w, c in inventory.items()) // unit
+    limit = total if max_total is None else min(total, max(0, max_total) // unit)
+
+    reachable = np.zeros(limit + 1, dtype=bool)
+    reachable[0] = True
+
+    for grams, count in inventory.items():
+        step = grams // unit
+        remaining = count
+        chunk = 1
+        # Découpage binaire : paquets 1, 2, 4, ... puis le reste (chaque paquet utilisé 0 ou 1 fois)
+        while remaining > 0:
+            take = min(chunk, remaining)
+            shift = step * take
+            if shift <= limit:
+                # NumPy détecte le chevauchement et lit l'ancien état : sémantique 0/1 respectée
+                reachable[shift:] |= reachable[:limit + 1 - shift]
+            remaining -= take
+            chunk *= 2
+
+    return np.flatnonzero(reachable).astype(np.int64) * unit
+
+
+def plate_loads(plates: Optional[RawInventory], max_load: Optional[float] = None, default_count: int = 1) -> np.ndarray:
+    """Charges de disques atteignables (kg, triées, 0 inclus)"""
+    inventory = normalize_inventory(plates, default_count)
+    max_total = to_grams(max_load) if max_load is not None else None
+    return to_kg(subset_sums_grams(inventory, max_total))
+
+
+def bar_loads(
+    bar_weight: float,
+    plates: Optional[RawInventory],
+    sides: int = 2,
+    max_load_per_side: Optional[float] = None,
+    default_count: int = 1
+) -> np.ndarray:
+    """
+    Charges totales réalisables sur une barre chargée symétriquement (kg, triées).
+
+    Chaque côté dispose de quantité // sides disques de chaque poids ; la charge
+    totale vaut barre + sides × charge d'un côté. sides=1 pour une charge non symétrique.
+    """
+    inventory = normalize_inventory(plates, default_count)
+    per_side = {w: c // sides for w, c in inventory.items() if c // sides > 0}
+    max_total = to_grams(max_load_per_side) if max_load_per_side is not None else None
+    side_sums = subset_sums_grams(per_side, max_total)
+    return to_kg(to_grams(bar_weight) + side_sums * sides)
+
+
+class PlateSolution(NamedTuple):
+    """Chargement d'un côté : disques utilisés (kg, quantité), du plus lourd au plus léger"""
+    plates: Tuple[Tuple[float, int], ...]
+    load_per_side: float
+    total_weight: float
+    exact: bool
+
+    @property
+    def plate_count(self) -> int:
+        return sum(count for _, count in self.plates)
+
+    def as_dicts(self) -> List[Dict[str, float]]:
+        return [{"weight": weight, "count": count} for weight, count in self.plates]
+
+
+InventoryKey = Tuple[Tuple[int, int], ...]
+
+
+def _inventory_key(plates: Optional[RawInventory], sides: int) -> InventoryKey:
+    """Inventaire par côté, hashable et canonique (clé de mémoïsation)"""
+    inventory = normalize_inventory(plates)
+    return tuple(sorted(
+        ((grams, count // sides) for grams, count in inventory.items() if count // sides > 0),
+        reverse=True
+    ))
+
+
+@lru_cache(maxsize=256)
+def _min_plate_table(inventory: InventoryKey, limit: int):
+    """
+    Programmation dynamique « nombre minimal de disques » (rendu de monnaie borné).
+    cost[v] = disques minimum pour charger v unités sur un côté ; choice[i][v] = quantité
+    du disque i retenue pour atteindre v, pour reconstruire la solution.
+    """
+    unit = reduce(gcd, (grams for grams, _ in inventory))
+    unreachable = np.iinfo(np.int32).max // 2
+
+    cost = np.full(limit + 1, unreachable, dtype=np.int32)
+    cost[0] = 0
+    choices = []
+
+    for grams, count in inventory:
+        step = grams // unit
+        best = cost.copy()
+        choice = np.zeros(limit + 1, dtype=np.int16)
+        for k in range(1, count + 1):
+            shift = step * k
+            if shift > limit:
+                break
+            candidate = cost[:limit + 1 - shift] + k
+            better = candidate < best[shift:]
+            best[shift:][better] = candidate[better]
+            choice[shift:][better] = k
+        cost = best
+        choices.append(choice)
+
+    return unit, cost, tuple(choices), unreachable
+
+
+def _table_limit(inventory: InventoryKey, per_side_grams: int) -> int:
+    """Taille de table (en unités) arrondie à la puissance de 2 supérieure : partagée par les cibles voisines"""
+    unit = reduce(gcd, (grams for grams, _ in inventory))
+    total = sum(grams * count for grams, count in inventory) // unit
+    return min(total, 1 << (per_side_grams // unit).bit_length())
+
+
+def _reconstruct(
+    inventory: InventoryKey,
+    bar_grams: int,
+    target_grams: int,
+    sides: int,
+    limit: Optional[int] = None
+) -> PlateSolution:
+    """Solution exacte si la charge est réalisable, sinon la plus lourde charge inférieure"""
+    per_side_target = max(0, target_grams - bar_grams) // sides
+
+    if not inventory or per_side_target == 0:
+        return PlateSolution((), 0.0, to_kg(bar_grams), target_grams == bar_grams)
+
+    if limit is None:
+        limit = _table_limit(inventory, per_side_target)
+    unit, cost, choices, unreachable = _min_plate_table(inventory, limit)
+
+    v = min(per_side_target // unit, limit)
+    exact = v * unit == per_side_target and cost[v] < unreachable
+    while cost[v] >= unreachable:
+        v -= 1
+
+    load_units = v
+    used = []
+    for (grams, _), choice in zip(reversed(inventory), reversed(choices)):
+        k = int(choice[v])
+        if k:
+            used.append((to_kg(grams), k))
+            v -= k * (grams // unit)
+
+    load_per_side = load_units * unit
+    return PlateSolution(
+        plates=tuple(sorted(used, reverse=True)),
+        load_per_side=to_kg(load_per_side),
+        total_weight=to_kg(bar_grams + load_per_side * sides),
+        exact=exact and (target_grams - bar_grams) % sides == 0
+    )
+
+
+@lru_cache(maxsize=4096)
+def _solve_memoized(inventory: InventoryKey, bar_grams: int, target_grams: int, sides: int) -> PlateSolution:
+    return _reconstruct(inventory, bar_grams, target_grams, sides)
+
+
+def solve_min_plates(
+    plates: Optional[RawInventory],
+    bar_weight: float,
+    target_weight: float,
+    sides: int = 2
+) -> PlateSolution:
+    """
+    Chargement exact utilisant le moins de disques par côté pour atteindre target_weight
+    (barre comprise). Mémoïsé par (inventaire, barre, cible).
+    """
+    return _solve_memoized(_inventory_key(plates, sides), to_grams(bar_weight), to_grams(target_weight), sides)
+
+
+def solve_min_plates_batch(
+    plates: Optional[RawInventory],
+    bar_weight: float,
+    target_weights: Iterable[float],
+    sides: int = 2
+) -> List[PlateSolution]:
+    """
+    Résout toutes les charges d'une séance en une fois : la table de programmation
+    dynamique est construite une seule fois pour la cible la plus lourde.
+    """
+    inventory = _inventory_key(plates, sides)
+    bar_grams = to_grams(bar_weight)
+    targets = [to_grams(t) for t in target_weights]
+    if not targets:
+        return []
+
+    if not inventory:
+        return [_reconstruct(inventory, bar_grams, t, sides) for t in targets]
+
+    # Une seule table, dimensionnée pour la cible la plus lourde, sert à reconstruire chaque charge
+    limit = _table_limit(inventory, max(0, max(targets) - bar_grams) // sides)
+    return [_reconstruct(inventory, bar_grams, t, sides, limit) for t in targets]
+
+
+def equipment_key(equipment_config: Optional[Mapping[str, Any]]) -> str:
+    """Clé stable d'une configuration d'équipement (pour mettre en cache ce qui en dérive)"""
+    return json.dumps(equipment_config or {}, sort_keys=True, separators=(",", ":"))
+
+
+class WeightLadder:
+    """
+    Échelle triée et dédupliquée des charges disponibles, stockée dans un array('d')
+    compact. Les requêtes (plus proche, cran au-dessus / au-dessous, k crans) se font
+    par bisection en O(log n) au lieu d'un min() linéaire sur une liste Python.
+    """
+
+    __slots__ = ("_weights",)
+
+    def __init__(self, weights: Iterable[float] = ()):
+        self._weights = array("d", sorted(set(float(w) for w in weights)))
+
+    def __len__(self) -> int:
+        return len(self._weights)
+
+    def __bool__(self) -> bool:
+        return len(self._weights) > 0
+
+    def __iter__(self):
+        return iter(self._weights)
+
+    def __getitem__(self, index: int) -> float:
+        return self._weights[index]
+
+    def tolist(self) -> List[float]:
+        return self._weights.tolist()
+
+    def _nearest_index(self, target: float) -> int:
+        weights = self._weights
+        i = bisect_left(weights, target)
+        if i == 0:
+            return 0
+        if i == len(weights):
+            return i - 1
+        # À égalité de distance, garder la charge la plus légère
+        return i - 1 if target - weights[i - 1] <= weights[i] - target else i
+
+    def nearest(self, target: float) -> float:
+        """Charge disponible la plus proche de la cible (la cible si l'échelle est vide)"""
+        if not self._weights:
+            return target
+        return self._weights[self._nearest_index(target)]
+
+    def next_up(self, weight: float) -> Optional[float]:
+        """Première charge strictement plus lourde, None au sommet de l'échelle"""
+        i = bisect_right(self._weights, weight)
+        return self._weights[i] if i < len(self._weights) else None
+
+    def next_down(self, weight: float) -> Optional[float]:
+        """Première charge strictement plus légère, None en bas de l'échelle"""
+        i = bisect_left(self._weights, weight)
+        return self._weights[i - 1] if i > 0 else None
+
+    def step(self, weight: float, steps: int) -> float:
+        """
+        Avance de `steps` crans depuis la charge la plus proche de `weight`
+        (négatif pour descendre), borné aux extrémités de l'échelle.
+        """
+        if not self._weights:
+            return weight
+        i = self._nearest_index(weight) + steps
+        return self._weights[max(0, min(len(self._weights) - 1, i))]
+
+
+def dumbbell_ladder(equipment_config: Optional[Mapping[str, Any]]) -> WeightLadder:
+    """Charges réalisables sur une haltère (fixes + barre courte chargée), une échelle par configuration"""
+    return _build_dumbbell_ladder(equipment_key(equipment_config))
+
+
+@lru_cache(maxsize=512)
+def _build_dumbbell_ladder(equipment_config_key: str) -> WeightLadder:
+    config = json.loads(equipment_config_key)
+    weights: List[float] = []
+
+    # Haltères fixes
+    dumbbell_config = config.get("dumbbells", {})
+    if dumbbell_config.get("available", False) and dumbbell_config.get("weights"):
+        weights.extend(dumbbell_config["weights"])
+
+    # Barres courtes + disques : la moitié des disques par haltère (pour faire une paire)
+    barres_courtes = config.get("barres", {}).get("courte", {})
+    disques_config = config.get("disques", {})
+    if (barres_courtes.get("available", False) and
+            barres_courtes.get("count", 0) >= 2 and
+            disques_config.get("available", False)):
+        plates_per_dumbbell = {
+            weight_str: count // 2
+            for weight_str, count in disques_config.get("weights", {}).items()
+        }
+        weights.extend(bar_loads(barres_courtes.get("weight", 2.5), plates_per_dumbbell, sides=1).tolist())
+
+    return WeightLadder(weights)
+
+
+# Quantité supposée par poids quand la config ne liste que les poids de disques (4 par côté)
+PLATES_PER_WEIGHT = 8
+
+
+def get_weight_ladder(user) -> WeightLadder:
+    """Échelle des poids disponibles (équipement et poids de corps de `user`), une par configuration"""
+    return weight_ladder_for_key(equipment_key(user.equipment_config), user.weight)
+
+
+@lru_cache(maxsize=512)
+def weight_ladder_for_key(equipment_config_key: str, bodyweight: float) -> WeightLadder:
+    """Même échelle, depuis une clé equipment_key() déjà calculée"""
+    return WeightLadder(compute_available_weights(json.loads(equipment_config_key), bodyweight))
+
+
+def compute_available_weights(equipment: Dict[str, Any], bodyweight: float) -> List[float]:
+    """Énumère les charges réalisables avec l'équipement donné"""
+    available_weights = []
+
+    # 1. POIDS DU CORPS
+    available_weights.append(bodyweight)
+
+    # 2. HALTÈRES FIXES
+    if equipment.get("dumbbells", {}).get("available"):
+        dumbbell_weights = equipment["dumbbells"].get("weights", [])
+        # Poids individuels
+        available_weights.extend(dumbbell_weights)
+        # Paires d'haltères (pour exercices bilatéraux)
+        available_weights.extend([w * 2 for w in dumbbell_weights])
+
+    # 3. BARRE + DISQUES
+    if equipment.get("barbell", {}).get("available") and equipment.get("plates", {}).get("available"):
+        barbell_weight = equipment["barbell"].get("weight", 20)
+        plates = equipment["plates"].get("weights", [])
+
+        # Toutes les charges symétriques réalisables (jusqu'à 4 disques de chaque poids par côté)
+        available_weights.extend(
+            bar_loads(barbell_weight, plates, default_count=PLATES_PER_WEIGHT).tolist()
+        )
+
+    # 4. KETTLEBELLS
+    if equipment.get("kettlebells", {}).get("available"):
+        kb_weights = equipment["kettlebells"].get("weights", [])
+        # Poids individuels
+        available_weights.extend(kb_weights)
+        # Paires de kettlebells
+        available_weights.extend([w * 2 for w in kb_weights])
+
+    # 5. ÉLASTIQUES (tensions équivalentes)
+    if equipment.get("resistance_bands", {}).get("available"):
+        band_tensions = equipment["resistance_bands"].get("tensions", [])
+        available_weights.extend(band_tensions)
+
+        # Si combinables, ajouter les sommes possibles
+        if equipment["resistance_bands"].get("combinable", False):
+            available_weights.extend(generate_band_combinations(band_tensions))
+
+    # 6. BARRES DE TRACTION/DIPS (poids du corps + lest)
+    for equipment_type in ["pull_up_bar", "dip_bar"]:
+        if equipment.get(equipment_type, {}).get("available"):
+            available_weights.append(bodyweight)  # Poids du corps
+
+            if equipment[equipment_type].get("can_add_weight", False):
+                additional_weights = equipment[equipment_type].get("additional_weights", [])
+                for weight in additional_weights:
+                    available_weights.append(bodyweight + weight)
+
+    # 7. MACHINES (gammes de poids spécifiques)
+    machine_types = ["cable_machine", "leg_press", "lat_pulldown", "chest_press"]
+    for machine_type in machine_types:
+        if equipment.get(machine_type, {}).get("available"):
+            max_weight = equipment[machine_type].get("max_weight", 100)
+            increment = equipment[machine_type].get("increment", 5)
+
+            # Générer tous les poids possibles de 0 à max par incréments
+            machine_weights = [i * increment for i in range(0, int(max_weight / increment) + 1)]
+            available_weights.extend(machine_weights)
+
+    # Trier, dédupliquer et arrondir
+    available_weights = sorted(list(set([round(w, 1) for w in available_weights if w > 0])))
+
+    return available_weights
+
+
+def generate_band_combinations(tensions: List[float]) -> List[float]:
+    """Génère les combinaisons possibles d'élastiques"""
+    if not tensions:
+        return []
+
+    combinations = set()
+
+    # Combinaisons de 2 élastiques maximum (réaliste)
+    for i, tension1 in enumerate(tensions):
+        for j, tension2 in enumerate(tensions[i:], i):
+            if i == j:
+                continue  # Éviter la duplication simple
+            combinations.add(tension1 + tension2)
+
+    return list(combinations)
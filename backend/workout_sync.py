@@ -0,0 +1,174 @@
+# ===== backend/workout_sync.py - SYNCHRONISATION DES SÉANCES HORS LIGNE =====
+"""
+Ingestion d'une séance complète (en-tête, fatigue, toutes les séries) envoyée en une
+seule requête par la PWA quand le réseau revient.
+
+Toutes les lignes sont écrites dans une seule transaction : un insert de la séance,
+puis un executemany pour les WorkoutSet. Les SetHistory et leurs modèles de
+performance sont écrits ensuite en un lot par le writer d'historique. L'identifiant
+client (client_uuid, index unique) rend l'envoi idempotent : un renvoi de la même
+séance retourne la séance déjà enregistrée sans rien réécrire.
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+import logging
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.ml_cache import history_cache, invalidate_exercise
+from backend.ml_recommendations import build_history_values
+from backend.user_stats import add_volume, add_completed_workout, set_volume
+from backend.progress_rollup import refresh_days
+from backend.personal_records import update_records, publish_records, discard_records
+from backend.models import Workout, WorkoutSet
+from backend.schemas import SetCreate, WorkoutSync
+from backend.write_behind import set_history_writer
+
+logger = logging.getLogger(__name__)
+
+
+class WorkoutSyncConflict(Exception):
+    """Le client_uuid appartient déjà à la séance d'un autre utilisateur"""
+
+
+def build_set_values(workout_id: int, set_data: SetCreate) -> Dict[str, Any]:
+    """Valeurs d'une ligne WorkoutSet, prêtes pour un insert Core"""
+    return {
+        "workout_id": workout_id,
+        "exercise_id": set_data.exercise_id,
+        "set_number": set_data.set_number,
+        "reps": set_data.reps,
+        "weight": set_data.weight,
+        "duration_seconds": set_data.duration_seconds,
+        "rest_time_seconds": set_data.rest_time_seconds,
+        "target_reps": set_data.target_reps,
+        "target_weight": set_data.target_weight,
+        "fatigue_level": set_data.fatigue_level,
+        "effort_level": set_data.effort_level,
+        "ml_weight_suggestion": set_data.ml_weight_suggestion,
+        "ml_reps_suggestion": set_data.ml_reps_suggestion,
+        "ml_confidence": set_data.ml_confidence,
+        "user_followed_ml_weight": set_data.user_followed_ml_weight,
+        "user_followed_ml_reps": set_data.user_followed_ml_reps,
+        "exercise_order_in_session": set_data.exercise_order_in_session,
+        "set_order_in_session": set_data.set_order_in_session
+    }
+
+
+def build_performance_data(set_data: SetCreate, session_fatigue_start: Optional[int]) -> Optional[Dict]:
+    """Données ML d'une série, None si la fatigue ou l'effort n'ont pas été saisis"""
+    if not (set_data.fatigue_level and set_data.effort_level):
+        return None
+    return {
+        "weight": set_data.weight or 0,
+        "actual_reps": set_data.reps,
+        "target_reps": set_data.target_reps or set_data.reps,
+        "fatigue_level": set_data.fatigue_level,
+        "effort_level": set_data.effort_level,
+        "exercise_order": set_data.exercise_order_in_session or 1,
+        "set_order_global": set_data.set_order_in_session or 1,
+        "set_number": set_data.set_number,
+        "rest_before_seconds": set_data.rest_time_seconds,
+        "session_fatigue_start": session_fatigue_start
+    }
+
+
+def _existing_sync(db: Session, user_id: int, client_uuid: str) -> Optional[Dict[str, Any]]:
+    existing = db.query(Workout.id, Workout.user_id).filter(Workout.client_uuid == client_uuid).first()
+    if existing is None:
+        return None
+    if existing.user_id != user_id:
+        raise WorkoutSyncConflict(client_uuid)
+    return {"workout_id": existing.id, "created": False, "sets_ingested": 0}
+
+
+def ingest_workout(db: Session, user_id: int, payload: WorkoutSync) -> Dict[str, Any]:
+    """Enregistre la séance et ses séries en une transaction (sans effet si déjà synchronisée)"""
+    client_uuid = str(payload.client_uuid)
+
+    existing = _existing_sync(db, user_id, client_uuid)
+    if existing:
+        return existing
+
+    completed_at = payload.completed_at
+    if completed_at is None and payload.status == "completed":
+        completed_at = max((s.completed_at for s in payload.sets if s.completed_at), default=datetime.utcnow())
+
+    total_duration_minutes = payload.total_duration_minutes
+    if total_duration_minutes is None and completed_at:
+        total_duration_minutes = int((completed_at - payload.started_at).total_seconds() / 60)
+
+    try:
+        workout = db.execute(
+            insert(Workout).values(
+                user_id=user_id,
+                type=payload.type,
+                program_id=payload.program_id,
+                status=payload.status,
+                started_at=payload.started_at,
+                completed_at=completed_at,
+                total_duration_minutes=total_duration_minutes,
+                session_notes=payload.session_notes,
+                overall_fatigue_start=payload.overall_fatigue_start,
+                overall_fatigue_end=payload.overall_fatigue_end,
+                client_uuid=client_uuid
+            ).returning(*Workout.__table__.columns)
+        ).mappings().one()
+        workout_id = workout["id"]
+
+        # Horodatage de chaque série hors ligne, à défaut celui de la séance
+        performed_at = [s.completed_at or completed_at or payload.started_at for s in payload.sets]
+        set_rows = [
+            {**build_set_values(workout_id, set_data), "completed_at": when}
+            for set_data, when in zip(payload.sets, performed_at)
+        ]
+
+        # executemany : une instruction préparée pour toutes les lignes, ids retournés dans l'ordre
+        set_ids = []
+        if set_rows:
+            set_ids = db.execute(
+                insert(WorkoutSet).returning(WorkoutSet.id, sort_by_parameter_order=True),
+                set_rows
+            ).scalars().all()
+
+        history_rows = []
+        for set_data, when, set_id in zip(payload.sets, performed_at, set_ids):
+            performance_data = build_performance_data(set_data, payload.overall_fatigue_start)
+            if performance_data:
+                history_rows.append({
+                    **build_history_values(user_id, set_data.exercise_id, performance_data, when),
+                    "workout_set_id": set_id
+                })
+
+        volume = sum(set_volume(row["weight"], row["reps"]) for row in set_rows)
+        for row, set_id in zip(set_rows, set_ids):
+            update_records(db, user_id, row["exercise_id"], row["weight"], row["reps"], set_id, row["completed_at"])
+        if payload.status == "completed":
+            # Un seul appel : si la ligne est créée, le recalcul compte déjà séance et volume
+            add_completed_workout(db, user_id, workout, volume=volume)
+            refresh_days(db, user_id, [completed_at.date()])
+        else:
+            add_volume(db, user_id, volume)
+        db.commit()
+    except IntegrityError:
+        # Envoi concurrent de la même séance : l'autre requête l'a enregistrée
+        db.rollback()
+        discard_records(db)
+        existing = _existing_sync(db, user_id, client_uuid)
+        if existing is None:
+            raise
+        return existing
+    publish_records(db)
+
+    # Historique ML et modèles en un lot, écrits avant d'invalider le cache (qui rechargera ces lignes)
+    set_history_writer.write(history_rows)
+
+    # Séries antérieures aux entrées en cache : recharger plutôt que réordonner
+    for exercise_id in {row["exercise_id"] for row in history_rows}:
+        history_cache.invalidate(user_id, exercise_id)
+        invalidate_exercise(user_id, exercise_id)
+
+    logger.info(f"✅ Séance {client_uuid} synchronisée: {len(set_rows)} séries")
+    return {"workout_id": workout_id, "created": True, "sets_ingested": len(set_rows)}
@@ -0,0 +1,211 @@
+# ===== backend/write_behind.py - ÉCRITURE DIFFÉRÉE DE L'HISTORIQUE ML =====
+"""
+File d'écriture différée (write-behind) pour les lignes SetHistory.
+
+La ligne d'historique ML n'est lue par personne au moment où la série est
+enregistrée (le cache d'historique est mis à jour directement) : la requête
+n'attend donc pas son insert. Un thread unique insère les lignes en attente par
+lots (executemany, un commit par lot) toutes les N ms, ou dès que M lignes sont
+en attente. C'est le seul chemin d'écriture de SetHistory en direct : les modèles de
+performance (RLS) sont mis à jour dans la transaction du lot, jamais dans celle
+d'une requête. Les lignes ne quittent la file que sous le verrou d'écriture : flush()
+garantit donc qu'au retour tout ce qui a été mis en file est en base.
+
+- File bornée : si elle est pleine, l'appelant attend brièvement puis écrit sa
+  ligne lui-même (contre-pression plutôt que perte ou mémoire illimitée).
+- Arrêt : stop() vide la file avant de rendre la main (lifespan FastAPI).
+- Lot refusé : nouvel essai ligne par ligne, seules les lignes fautives sont
+  abandonnées (et leur historique en cache invalidé pour rester aligné sur la base).
+- Une ligne en file est perdue si le processus est tué brutalement : acceptable
+  pour des données d'apprentissage, jamais utilisé pour les WorkoutSet.
+"""
+from typing import Any, Dict, List, Optional
+import logging
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy.engine import Engine
+
+from backend.database import engine, dialect_insert
+from backend.ml_cache import history_cache, invalidate_exercise
+from backend.models import SetHistory
+from backend.performance_model import update_models, publish_models
+
+logger = logging.getLogger(__name__)
+
+
+class SetHistoryWriter:
+    """Thread de commit groupé des lignes SetHistory"""
+
+    def __init__(
+        self,
+        engine: Engine,
+        max_batch_rows: int = 200,
+        flush_interval_ms: int = 250,
+        max_queue_rows: int = 10_000,
+        enqueue_timeout_ms: int = 50
+    ):
+        self.engine = engine
+        self.max_batch_rows = max_batch_rows
+        self.flush_interval = flush_interval_ms / 1000
+        self.enqueue_timeout = enqueue_timeout_ms / 1000
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue_rows)
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.sync_fallbacks = 0
+        self.failed_rows = 0
+        self.max_depth = 0
+        self.last_batch_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="set-history-writer", daemon=True)
+        self._thread.start()
+        logger.info("✅ Écriture différée de l'historique ML démarrée")
+
+    def stop(self, timeout: float = 10.0):
+        """Arrête le thread après avoir écrit toutes les lignes en attente"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self.flush()
+        logger.info(f"✅ Écriture différée arrêtée ({self.written} lignes écrites)")
+
+    def enqueue(self, values: Dict[str, Any]) -> bool:
+        """
+        Met une ligne en file ; retourne False si elle a été écrite de façon synchrone
+        (thread arrêté ou file pleine au-delà du délai d'attente)
+        """
+        if self.running:
+            try:
+                self._queue.put(values, timeout=self.enqueue_timeout)
+                self.enqueued += 1
+                depth = self._queue.qsize()
+                self.max_depth = max(self.max_depth, depth)
+                if depth >= self.max_batch_rows:
+                    self._wakeup.set()
+                return True
+            except queue.Full:
+                pass
+
+        self.sync_fallbacks += 1
+        self.write([values])
+        return False
+
+    def write(self, rows: List[Dict[str, Any]]):
+        """Écrit des lignes tout de suite, hors file (avec la mise à jour de leurs modèles)"""
+        if not rows:
+            return
+        with self._write_lock:
+            self._write(rows)
+
+    def flush(self):
+        """Écrit immédiatement tout ce qui est en file (attend le lot en cours s'il y en a un)"""
+        with self._write_lock:
+            while True:
+                batch = self._drain(self.max_batch_rows)
+                if not batch:
+                    return
+                self._write(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_depth,
+            "queue_capacity": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "sync_fallbacks": self.sync_fallbacks,
+            "failed_rows": self.failed_rows,
+            "last_batch_ms": round(self.last_batch_ms, 3)
+        }
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        # Réveil toutes les N ms, ou plus tôt quand M lignes sont en attente
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        # Appelé sous verrou d'écriture
+        started = time.perf_counter()
+        try:
+            models = self._write_rows(batch)
+            written = len(batch)
+        except Exception as e:
+            # Une seule ligne fautive ne doit pas faire perdre celles des autres utilisateurs
+            logger.warning(f"⚠️ Lot de {len(batch)} lignes d'historique refusé ({e}), nouvel essai ligne par ligne")
+            models, written = self._write_one_by_one(batch)
+        publish_models(models)
+        self.written += written
+        self.batches += 1
+        self.last_batch_ms = (time.perf_counter() - started) * 1000
+
+    def _write_rows(self, rows: List[Dict[str, Any]]) -> Dict:
+        with self.engine.begin() as connection:
+            # La projection a pu créer la ligne entre-temps (même workout_set_id) : l'ignorer
+            stmt = dialect_insert(connection, SetHistory.__table__).on_conflict_do_nothing(
+                index_elements=["workout_set_id"]
+            )
+            connection.execute(stmt, rows)
+            # Modèles de performance mis à jour dans la même transaction que leurs lignes
+            return update_models(connection, rows)
+
+    def _write_one_by_one(self, batch: List[Dict[str, Any]]):
+        models, written = {}, 0
+        for values in batch:
+            try:
+                models.update(self._write_rows([values]))
+                written += 1
+            except Exception as e:
+                self.failed_rows += 1
+                logger.error(f"❌ Ligne d'historique de la série {values.get('workout_set_id')} abandonnée: {e}")
+                # Le cache d'historique a déjà reçu cette ligne : le réaligner sur la base
+                history_cache.invalidate(values["user_id"], values["exercise_id"])
+                invalidate_exercise(values["user_id"], values["exercise_id"])
+        return models, written
+
+
+def _create_writer() -> SetHistoryWriter:
+    return SetHistoryWriter(
+        engine,
+        max_batch_rows=int(os.getenv("SET_HISTORY_BATCH_ROWS", "200")),
+        flush_interval_ms=int(os.getenv("SET_HISTORY_FLUSH_MS", "250")),
+        max_queue_rows=int(os.getenv("SET_HISTORY_QUEUE_ROWS", "10000")),
+        enqueue_timeout_ms=int(os.getenv("SET_HISTORY_ENQUEUE_TIMEOUT_MS", "50"))
+    )
+
+
+# Activé par défaut ; SET_HISTORY_WRITE_BEHIND=0 pour écrire l'historique juste après le commit de la série
+WRITE_BEHIND_ENABLED = os.getenv("SET_HISTORY_WRITE_BEHIND", "1") == "1"
+
+set_history_writer = _create_writer()
@@ -0,0 +1,83 @@
+# ===== benchmarks/_common.py =====
+"""
+Utilitaires partagés par les scripts de benchmark.
+Chaque benchmark travaille sur des bases SQLite temporaires, jamais sur fitness_coach.db.
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = tempfile.mkdtemp(prefix="fitness_bench_")
+
+# Rediriger la base par défaut AVANT d'importer le backend (main.py crée les tables à l'import)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(BENCH_DIR, 'default.db')}")
+sys.path.insert(0, ROOT_DIR)
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from backend.database import create_db_engine  # noqa: E402
+from backend.models import Base, User, Exercise, Workout  # noqa: E402
+
+
+def temp_sqlite_url(name: str) -> str:
+    """URL d'une base SQLite neuve dans le répertoire temporaire du benchmark"""
+    path = os.path.join(BENCH_DIR, f"{name}.db")
+    if os.path.exists(path):
+        os.remove(path)
+    return f"sqlite:///{path}"
+
+
+def make_database(name: str, profile: str = "tuned"):
+    """Crée une base temporaire avec le schéma complet, retourne (engine, SessionFactory)"""
+    engine = create_db_engine(temp_sqlite_url(name), profile)
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def seed_users(session_factory, user_count: int = 1, exercise_count: int = 5):
+    """Crée des utilisateurs avec une séance active chacun et quelques exercices"""
+    db = session_factory()
+    try:
+        exercises = [
+            Exercise(
+                name=f"Exercice {i}",
+                muscle_groups=["pectoraux"],
+                equipment_required=["dumbbells"],
+                difficulty="beginner",
+                exercise_type="compound",
+            )
+            for i in range(exercise_count)
+        ]
+        db.add_all(exercises)
+
+        workouts = []
+        for i in range(user_count):
+            user = User(
+                name=f"Bench {i}",
+                birth_date=datetime(1990, 1, 1),
+                height=180,
+                weight=80,
+                experience_level="intermediate",
+                equipment_config={"dumbbells": {"available": True, "weights": [5, 10, 15, 20]}},
+            )
+            db.add(user)
+            db.flush()
+            workout = Workout(user_id=user.id, type="free", overall_fatigue_start=2)
+            db.add(workout)
+            workouts.append(workout)
+
+        db.commit()
+        return [w.id for w in workouts], [e.id for e in exercises]
+    finally:
+        db.close()
+
+
+def percentile(sorted_values, pct: float) -> float:
+    """Percentile simple sur une liste déjà triée"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark : latence d'enregistrement d'une série (POST /api/workouts/{id}/sets)
+
+"avant" rejoue l'ancien chemin ORM : add/commit/refresh de la WorkoutSet puis
+un second commit pour la ligne SetHistory. "après" appelle main.add_set : une
+transaction Core (série, volume des stats, records si la série peut en battre un),
+la ligne SetHistory et le modèle de performance étant écrits par le writer
+différé (défaut en production). "après sync" : SET_HISTORY_WRITE_BEHIND=0, la
+ligne SetHistory et le modèle sont écrits dans une seconde transaction avant la réponse.
+
+Le writer écrit dans la base du chemin mesuré (sa contention est comprise).
+
+Usage: python benchmarks/bench_add_set_latency.py --sets 2000 --profile tuned
+"""
+
+import argparse
+import time
+
+import _common  # noqa: F401  (configure DATABASE_URL et sys.path)
+from _common import make_database, seed_users, percentile
+
+from backend.main import add_set
+from backend.write_behind import set_history_writer
+from backend.models import Workout, WorkoutSet, SetHistory
+from backend.schemas import SetCreate
+
+
+def legacy_add_set(workout_id: int, set_data: SetCreate, db):
+    """Ancien chemin : deux commits et un refresh par série"""
+    workout = db.query(Workout).filter(Workout.id == workout_id).first()
+
+    db_set = WorkoutSet(workout_id=workout_id, **set_data.model_dump())
+    db.add(db_set)
+    db.commit()
+    db.refresh(db_set)
+
+    db.add(SetHistory(
+        user_id=workout.user_id,
+        exercise_id=set_data.exercise_id,
+        weight=set_data.weight or 0,
+        reps=set_data.reps,
+        fatigue_level=set_data.fatigue_level,
+        effort_level=set_data.effort_level,
+        exercise_order_in_session=set_data.exercise_order_in_session or 1,
+        set_order_in_session=set_data.set_order_in_session or 1,
+        set_number_in_exercise=set_data.set_number,
+        rest_before_seconds=set_data.rest_time_seconds,
+        session_fatigue_start=workout.overall_fatigue_start,
+        success=set_data.reps >= (set_data.target_reps or set_data.reps),
+        actual_reps=set_data.reps,
+    ))
+    db.commit()
+    return db_set
+
+
+def run_path(label: str, handler, profile: str, sets: int, write_behind: bool = False) -> dict:
+    engine, session_factory = make_database(f"add_set_{label}", profile)
+    workout_ids, exercise_ids = seed_users(session_factory)
+    set_history_writer.engine = engine
+    if write_behind:
+        set_history_writer.start()
+
+    latencies = []
+    for set_number in range(1, sets + 1):
+        set_data = SetCreate(
+            exercise_id=exercise_ids[set_number % len(exercise_ids)],
+            set_number=set_number,
+            reps=10,
+            weight=20.0,
+            target_reps=10,
+            fatigue_level=3,
+            effort_level=3,
+            exercise_order_in_session=1,
+            set_order_in_session=set_number,
+        )
+        db = session_factory()
+        try:
+            started = time.perf_counter()
+            handler(workout_ids[0], set_data, db)
+            latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            db.close()
+    set_history_writer.stop()
+    engine.dispose()
+
+    latencies.sort()
+    return {
+        "label": label,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "mean": sum(latencies) / len(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sets", type=int, default=2000, help="Séries enregistrées par chemin")
+    parser.add_argument("--profile", default="tuned", choices=["baseline", "tuned"], help="Profil SQLite")
+    args = parser.parse_args()
+
+    results = [
+        run_path("avant", legacy_add_set, args.profile, args.sets),
+        run_path("après", add_set, args.profile, args.sets, write_behind=True),
+        run_path("après sync", add_set, args.profile, args.sets),
+    ]
+
+    print(f"profil {args.profile}, {args.sets} séries\n")
+    print(f"{'chemin':<12} {'p50 (ms)':>10} {'p99 (ms)':>10} {'moy. (ms)':>10}")
+    for r in results:
+        print(f"{r['label']:<12} {r['p50']:>10.3f} {r['p99']:>10.3f} {r['mean']:>10.3f}")
+
+    print()
+    for r in results[1:]:
+        print(f"Gain {r['label']}: p50 x{results[0]['p50'] / r['p50']:.2f}, p99 x{results[0]['p99'] / r['p99']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
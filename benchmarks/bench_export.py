@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark : export de l'historique complet d'un utilisateur (GET /api/users/{id}/export)
+
+"ORM" reproduit l'export naïf : toutes les séances et leur relation sets chargées
+en mémoire, puis sérialisées. "flux" consomme history_export.stream_export
+(yield_per, un morceau par paquet). Mesure le débit (séries/s) et le pic de
+mémoire Python (tracemalloc) de chaque chemin.
+
+Usage: python benchmarks/bench_export.py --sets 100000 --format csv
+"""
+
+import argparse
+import csv
+import io
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import _common  # noqa: F401  (configure DATABASE_URL et sys.path)
+from _common import make_database, seed_users
+
+from sqlalchemy import insert
+from sqlalchemy.orm import selectinload
+
+from backend.history_export import EXPORT_FIELDS, stream_export
+from backend.models import Workout, WorkoutSet
+
+SETS_PER_WORKOUT = 20
+
+
+def seed_history(session_factory, user_id: int, exercise_ids, sets: int):
+    """Séances terminées de SETS_PER_WORKOUT séries, insérées par executemany"""
+    db = session_factory()
+    try:
+        start = datetime(2020, 1, 1)
+        workout_count = sets // SETS_PER_WORKOUT
+        workout_ids = db.execute(
+            insert(Workout).returning(Workout.id, sort_by_parameter_order=True),
+            [
+                {
+                    "user_id": user_id, "type": "free", "status": "completed",
+                    "started_at": start + timedelta(days=i), "completed_at": start + timedelta(days=i, hours=1)
+                }
+                for i in range(workout_count)
+            ]
+        ).scalars().all()
+        db.execute(insert(WorkoutSet), [
+            {
+                "workout_id": workout_id, "exercise_id": exercise_ids[n % len(exercise_ids)],
+                "set_number": n % 4 + 1, "reps": 10, "weight": 20.0 + n % 5, "target_reps": 10,
+                "fatigue_level": 3, "effort_level": 3
+            }
+            for workout_id in workout_ids
+            for n in range(SETS_PER_WORKOUT)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def orm_export(session_factory, user_id: int) -> int:
+    """Export naïf : tout l'historique en objets ORM, puis un seul CSV en mémoire"""
+    db = session_factory()
+    try:
+        workouts = db.query(Workout).options(
+            selectinload(Workout.sets).selectinload(WorkoutSet.exercise)
+        ).filter(Workout.user_id == user_id).order_by(Workout.started_at).all()
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        for workout in workouts:
+            for s in workout.sets:
+                writer.writerow([
+                    workout.id, workout.type, workout.status, workout.started_at, workout.completed_at,
+                    s.id, s.exercise_id, s.exercise.name, s.set_number, s.reps, s.weight,
+                    s.duration_seconds, s.rest_time_seconds, s.target_reps, s.target_weight,
+                    s.fatigue_level, s.effort_level, s.completed_at
+                ])
+        return len(buffer.getvalue().encode("utf-8"))
+    finally:
+        db.close()
+
+
+def streamed_export(session_factory, user_id: int, fmt: str) -> int:
+    return sum(len(chunk) for chunk in stream_export(user_id, fmt, session_factory))
+
+
+def measure(label: str, export, rows: int) -> dict:
+    # Débit mesuré sans tracemalloc (qui ralentit chaque allocation), pic mémoire dans un second passage
+    started = time.perf_counter()
+    size = export()
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    export()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"label": label, "rows_per_s": rows / elapsed, "seconds": elapsed, "peak_mb": peak / 2**20, "mb": size / 2**20}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sets", type=int, default=100_000, help="Séries dans l'historique")
+    parser.add_argument("--format", default="csv", choices=["csv", "ndjson"], help="Format du flux")
+    parser.add_argument("--profile", default="tuned", choices=["baseline", "tuned"], help="Profil SQLite")
+    args = parser.parse_args()
+
+    engine, session_factory = make_database("export", args.profile)
+    _, exercise_ids = seed_users(session_factory)
+    user_id = 1
+    seed_history(session_factory, user_id, exercise_ids, args.sets)
+    rows = args.sets // SETS_PER_WORKOUT * SETS_PER_WORKOUT
+
+    results = [
+        measure("ORM", lambda: orm_export(session_factory, user_id), rows),
+        measure(f"flux {args.format}", lambda: streamed_export(session_factory, user_id, args.format), rows),
+    ]
+    engine.dispose()
+
+    print(f"profil {args.profile}, {rows} séries\n")
+    print(f"{'chemin':<12} {'séries/s':>10} {'durée (s)':>10} {'pic mém. (Mo)':>14} {'export (Mo)':>12}")
+    for r in results:
+        print(f"{r['label']:<12} {r['rows_per_s']:>10.0f} {r['seconds']:>10.2f} {r['peak_mb']:>14.1f} {r['mb']:>12.1f}")
+
+    print(f"\nPic mémoire: /{results[0]['peak_mb'] / results[1]['peak_mb']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Benchmark : plans d'exécution avant/après les index composites (migration 1)
+
+Crée une base sans les index, y insère ~1M de séries (workout_sets + set_history),
+puis affiche pour chaque requête critique le plan EXPLAIN et la durée moyenne,
+avant et après run_migrations().
+
+Usage: python benchmarks/bench_query_plans.py --sets 1000000
+       python benchmarks/bench_query_plans.py --url postgresql://... (EXPLAIN PostgreSQL)
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import _common  # noqa: F401  (configure DATABASE_URL et sys.path)
+from _common import temp_sqlite_url
+
+from sqlalchemy import select, func, desc, and_, insert, text
+
+from backend.database import create_db_engine
+from backend.migrations import run_migrations, schema_migrations, migration_metadata
+from backend.models import Base, User, Exercise, Workout, WorkoutSet, SetHistory
+
+USERS = 200
+EXERCISES = 60
+SETS_PER_WORKOUT = 20
+BATCH = 20000
+
+
+def drop_hot_path_indexes(engine):
+    """Reproduit une base déployée avant la migration 1"""
+    with engine.begin() as conn:
+        for model in (Workout, WorkoutSet, SetHistory):
+            for index in model.__table__.indexes:
+                # Garder uniquement l'index historique sur la clé primaire
+                if index.name != f"ix_{model.__tablename__}_id":
+                    index.drop(bind=conn, checkfirst=True)
+        conn.execute(schema_migrations.delete())
+
+
+def seed(engine, total_sets: int):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{
+            "name": f"Bench {i}", "birth_date": datetime(1990, 1, 1), "height": 180, "weight": 80,
+            "experience_level": "intermediate", "equipment_config": {}
+        } for i in range(USERS)])
+        conn.execute(insert(Exercise), [{
+            "name": f"Exercice {i}", "muscle_groups": ["dos"], "equipment_required": ["dumbbells"],
+            "difficulty": "beginner"
+        } for i in range(EXERCISES)])
+
+        workout_count = total_sets // SETS_PER_WORKOUT
+        workouts = []
+        for i in range(workout_count):
+            started = now - timedelta(days=rng.randint(0, 720), minutes=rng.randint(0, 600))
+            workouts.append({
+                "user_id": 1 + i % USERS, "type": "free",
+                "status": "active" if i >= workout_count - USERS else "completed",
+                "started_at": started, "completed_at": started + timedelta(minutes=60),
+            })
+        for start in range(0, len(workouts), BATCH):
+            conn.execute(insert(Workout), workouts[start:start + BATCH])
+
+    with engine.begin() as conn:
+        sets, history = [], []
+        for i in range(total_sets):
+            workout_index = i // SETS_PER_WORKOUT
+            user_id = 1 + workout_index % USERS
+            exercise_id = 1 + rng.randrange(EXERCISES)
+            set_number = 1 + i % 4
+            order = 1 + (i % SETS_PER_WORKOUT) // 4
+            weight = float(rng.randint(10, 120))
+            performed = now - timedelta(minutes=total_sets - i)
+            sets.append({
+                "workout_id": workout_index + 1, "exercise_id": exercise_id, "set_number": set_number,
+                "reps": 10, "weight": weight, "completed_at": performed,
+            })
+            history.append({
+                "user_id": user_id, "exercise_id": exercise_id, "weight": weight, "reps": 10,
+                "fatigue_level": 3, "effort_level": 3, "exercise_order_in_session": order,
+                "set_order_in_session": 1 + i % SETS_PER_WORKOUT, "set_number_in_exercise": set_number,
+                "success": True, "actual_reps": 10, "date_performed": performed,
+            })
+            if len(sets) >= BATCH:
+                conn.execute(insert(WorkoutSet), sets)
+                conn.execute(insert(SetHistory), history)
+                sets, history = [], []
+        if sets:
+            conn.execute(insert(WorkoutSet), sets)
+            conn.execute(insert(SetHistory), history)
+
+
+def hot_queries():
+    user_id, exercise_id = 7, 11
+    return {
+        "séance active": select(Workout).where(Workout.user_id == user_id, Workout.status == "active").limit(1),
+        "dernière séance": select(Workout).where(
+            Workout.user_id == user_id, Workout.status == "completed"
+        ).order_by(desc(Workout.completed_at)).limit(1),
+        "volume total": select(func.sum(WorkoutSet.weight * WorkoutSet.reps)).join(Workout).where(
+            Workout.user_id == user_id, WorkoutSet.weight.isnot(None)
+        ),
+        "séries par exercice": select(func.count(WorkoutSet.id)).where(WorkoutSet.exercise_id == exercise_id),
+        "historique ML": select(SetHistory).where(and_(
+            SetHistory.user_id == user_id,
+            SetHistory.exercise_id == exercise_id,
+            SetHistory.set_number_in_exercise == 2,
+            SetHistory.exercise_order_in_session.between(1, 3),
+        )).order_by(desc(SetHistory.date_performed)).limit(30),
+    }
+
+
+def measure(engine, label: str, repeat: int):
+    explain = "EXPLAIN QUERY PLAN" if engine.dialect.name == "sqlite" else "EXPLAIN"
+    print(f"\n===== {label} =====")
+    timings = {}
+    with engine.connect() as conn:
+        for name, query in hot_queries().items():
+            sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+            plan = conn.execute(text(f"{explain} {sql}")).fetchall()
+            started = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(query).fetchall()
+            timings[name] = (time.perf_counter() - started) / repeat * 1000
+            print(f"- {name}: {timings[name]:.3f} ms")
+            for row in plan:
+                print(f"    {row[-1]}")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sets", type=int, default=1_000_000, help="Nombre de séries générées")
+    parser.add_argument("--repeat", type=int, default=20, help="Exécutions par requête")
+    parser.add_argument("--url", default=None, help="Base cible (défaut: SQLite temporaire)")
+    args = parser.parse_args()
+
+    engine = create_db_engine(args.url or temp_sqlite_url("query_plans"))
+    Base.metadata.create_all(bind=engine)
+    migration_metadata.create_all(bind=engine)
+    drop_hot_path_indexes(engine)
+
+    started = time.perf_counter()
+    seed(engine, args.sets)
+    print(f"Jeu de données: {args.sets} séries en {time.perf_counter() - started:.1f}s")
+
+    before = measure(engine, "AVANT migration", args.repeat)
+    run_migrations(engine)
+    after = measure(engine, "APRÈS migration", args.repeat)
+
+    print("\n===== Résumé =====")
+    for name in before:
+        speedup = before[name] / after[name] if after[name] else float("inf")
+        print(f"{name:<22} {before[name]:>10.3f} ms -> {after[name]:>8.3f} ms  (x{speedup:.0f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark : écrivains concurrents sur POST /api/workouts/{id}/sets
+
+Compare le profil SQLite "baseline" (journal rollback, pas de busy_timeout)
+au profil "tuned" (WAL, synchronous=NORMAL, busy_timeout...).
+Chaque thread simule un membre qui enregistre ses séries en boucle. Le writer
+différé de l'historique ML écrit dans la base du profil mesuré, et la durée
+inclut l'écriture de ses dernières lignes.
+
+Usage: python benchmarks/bench_set_logging.py --writers 8 --sets 200
+"""
+
+import argparse
+import threading
+import time
+
+import _common  # noqa: F401  (configure DATABASE_URL et sys.path)
+from _common import make_database, seed_users
+
+from backend.main import add_set
+from backend.schemas import SetCreate
+from backend.write_behind import set_history_writer
+
+
+def run_profile(profile: str, writers: int, sets_per_writer: int) -> dict:
+    engine, session_factory = make_database(f"set_logging_{profile}", profile)
+    workout_ids, exercise_ids = seed_users(session_factory, user_count=writers)
+
+    errors = []
+    barrier = threading.Barrier(writers)
+    set_history_writer.engine = engine
+    failed_before = set_history_writer.failed_rows
+    set_history_writer.start()
+
+    def writer(index: int):
+        workout_id = workout_ids[index]
+        barrier.wait()
+        for set_number in range(1, sets_per_writer + 1):
+            db = session_factory()
+            try:
+                add_set(workout_id, SetCreate(
+                    exercise_id=exercise_ids[set_number % len(exercise_ids)],
+                    set_number=set_number,
+                    reps=10,
+                    weight=20.0,
+                    target_reps=10,
+                    fatigue_level=3,
+                    effort_level=3,
+                    exercise_order_in_session=1,
+                    set_order_in_session=set_number,
+                ), db)
+            except Exception as e:  # "database is locked" en mode baseline
+                errors.append(str(e))
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    set_history_writer.stop()
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+
+    attempted = writers * sets_per_writer
+    succeeded = attempted - len(errors)
+    return {
+        "profile": profile,
+        "attempted": attempted,
+        "succeeded": succeeded,
+        "errors": len(errors),
+        "history_failed": set_history_writer.failed_rows - failed_before,
+        "seconds": elapsed,
+        "sets_per_second": succeeded / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8, help="Nombre de membres simultanés")
+    parser.add_argument("--sets", type=int, default=200, help="Séries enregistrées par membre")
+    args = parser.parse_args()
+
+    print(f"{'profil':<10} {'séries OK':>10} {'erreurs':>8} {'hist. perdu':>12} {'durée (s)':>10} {'séries/s':>10}")
+    results = [run_profile(profile, args.writers, args.sets) for profile in ("baseline", "tuned")]
+    for r in results:
+        print(
+            f"{r['profile']:<10} {r['succeeded']:>10} {r['errors']:>8} {r['history_failed']:>12} "
+            f"{r['seconds']:>10.2f} {r['sets_per_second']:>10.1f}"
+        )
+
+    if results[0]["sets_per_second"]:
+        print(f"\nGain de débit: x{results[1]['sets_per_second'] / results[0]['sets_per_second']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark : moteur de charges (subset-sum borné) vs ancienne énumération
+
+L'ancienne version de main.generate_plate_combinations ajoutait 0 à 4 disques de
+chaque poids à chaque combinaison existante : le nombre d'états croît comme 5^n
+tant que les sommes ne se recouvrent pas. Le moteur de backend.weight_engine
+reste polynomial quelle que soit la taille de l'inventaire.
+
+Usage: python benchmarks/bench_weight_engine.py --max-types 60
+"""
+
+import argparse
+import random
+import time
+
+import _common  # noqa: F401  (configure sys.path)
+
+from backend.weight_engine import bar_loads
+
+LEGACY_LIMIT_SECONDS = 5.0
+
+
+def legacy_plate_combinations(plates):
+    """Copie de l'ancienne implémentation (référence uniquement)"""
+    combinations = set([0])
+    for plate in plates:
+        new_combinations = set()
+        for existing in combinations:
+            for count in range(5):
+                new_combinations.add(existing + plate * count)
+        combinations.update(new_combinations)
+    return list(combinations)
+
+
+def home_gym_inventory(types: int, rng: random.Random):
+    """Inventaire réaliste : disques standards puis poids atypiques (fractionnaires, anciens disques)"""
+    standard = [0.5, 1.25, 2.5, 5, 10, 15, 20, 25]
+    weights = standard[:types]
+    while len(weights) < types:
+        weights.append(round(rng.uniform(0.25, 30) * 4) / 4 + rng.choice([0, 0.125]))
+    return {w: rng.choice([2, 4, 6, 8]) for w in weights}
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-types", type=int, default=60, help="Nombre maximal de poids de disques différents")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    legacy_enabled = True
+    print(f"{'types':>6} {'disques':>8} {'charges':>8} {'moteur (ms)':>12} {'ancien (ms)':>12}")
+
+    types = 2
+    while types <= args.max_types:
+        inventory = home_gym_inventory(types, rng)
+        loads, engine_ms = timed(bar_loads, 20, inventory)
+
+        legacy_cell = "-"
+        if legacy_enabled:
+            _, legacy_ms = timed(legacy_plate_combinations, list(inventory))
+            legacy_cell = f"{legacy_ms:.1f}"
+            # Au-delà, la croissance 5^n rend la mesure impraticable
+            if legacy_ms * 5 > LEGACY_LIMIT_SECONDS * 1000:
+                legacy_enabled = False
+
+        print(f"{types:>6} {sum(inventory.values()):>8} {len(loads):>8} {engine_ms:>12.2f} {legacy_cell:>12}")
+        types = types + 1 if types < 12 else types + 8
+
+
+if __name__ == "__main__":
+    main()
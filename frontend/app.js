@@ -782,13 +782,17 @@ async function completeSet(setNumber) {
             rest_seconds: 60
         };
         
-        await apiPost(`/api/workouts/${currentWorkout.id}/sets`, setData);
+        const savedSet = await apiPost(`/api/workouts/${currentWorkout.id}/sets`, setData);
         
         // Désactiver les inputs de cette série
         document.getElementById(`reps_${setNumber}`).disabled = true;
         document.getElementById(`weight_${setNumber}`).disabled = true;
         
-        showToast(`Série ${setNumber} enregistrée !`, 'success');
+        if (savedSet.new_records && savedSet.new_records.length > 0) {
+            showToast(`Série ${setNumber} enregistrée : nouveau record ! 🏆`, 'success');
+        } else {
+            showToast(`Série ${setNumber} enregistrée !`, 'success');
+        }
         
         // Démarrer la période de repos
         startRestPeriod();